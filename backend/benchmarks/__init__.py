@@ -0,0 +1,50 @@
+"""
+Benchmarks of the hot paths of the app.
+
+Run them from the backend directory with the environment of the app, e.g.
+
+    python -m benchmarks.like_counters --help
+
+Every benchmark works in a fresh test database which is dropped afterwards.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speshalgram.settings.dev')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    old_name = connection.settings_dict['NAME']
+    # queries are neither logged nor collected without DEBUG
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timeit(func, repeat=1):
+    """
+    returns the best time of func() in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
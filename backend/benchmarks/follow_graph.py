@@ -0,0 +1,152 @@
+"""
+Build time, memory footprint and lookup latency of the follow graph index
+on a synthetic graph with a skewed number of followers, compared with
+the subscription lookup in the db.
+"""
+import argparse
+import random
+import time
+
+from benchmarks import setup, test_database, timeit
+
+
+def generate_edges(nusers, nedges, seed):
+    """
+    yields (followed id, follower id, status) edges sorted by the ids,
+    the numbers of followers follow a power law
+    """
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.2) for _ in range(nusers)]
+    scale = nedges / sum(weights)
+
+    for followed_id, weight in enumerate(weights, start=1):
+        nfollowers = min(nusers - 1, round(weight * scale))
+        followers = rng.sample(range(1, nusers + 1), nfollowers + 1)
+        followers = sorted(
+            follower_id
+            for follower_id in followers
+            if follower_id != followed_id
+        )[:nfollowers]
+
+        for follower_id in followers:
+            status = 'a' if rng.random() < 0.9 else 'p'
+            yield followed_id, follower_id, status
+
+
+def measure_lookups(func, pairs):
+    """
+    returns the mean time of func(follower id, followed id) in microseconds
+    """
+    elapsed = timeit(lambda: [func(*pair) for pair in pairs], repeat=3)
+    return elapsed / len(pairs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--edges', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=500_000)
+    parser.add_argument('--lookups', type=int, default=100_000)
+    parser.add_argument(
+        '--db-edges',
+        type=int,
+        default=100_000,
+        help='size of the graph to compare with the db, 0 to skip'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+
+    from speshalgram.accounts.graph import FollowGraph
+
+    start = time.perf_counter()
+    follow_graph = FollowGraph.from_edges(
+        generate_edges(args.users, args.edges, args.seed)
+    )
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    pairs = [
+        (rng.randint(1, args.users), rng.randint(1, args.users))
+        for _ in range(args.lookups)
+    ]
+
+    nedges = follow_graph.nedges()
+    nbytes = follow_graph.nbytes()
+    print(f'{nedges} edges of {args.users} users')
+    print(f'build:            {build_time:8.1f}s')
+    print(
+        f'memory:           {nbytes / 2 ** 20:8.1f}MiB '
+        f'({nbytes / nedges:.1f} bytes per edge)'
+    )
+    lookups = {
+        'is_following': follow_graph.is_following,
+        'follower_count': lambda follower_id, followed_id: (
+            follow_graph.follower_count(followed_id)
+        ),
+    }
+    for name, func in lookups.items():
+        print(f'{name + ":":18}{measure_lookups(func, pairs):8.2f}us')
+
+    if not args.db_edges:
+        return
+
+    from django.db import connection
+
+    from speshalgram.accounts.models import Subscription, User
+
+    nusers = args.db_edges // (args.edges // args.users)
+    with test_database():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {User._meta.db_table} (
+                    id, password, is_superuser, username, first_name,
+                    last_name, email, is_staff, is_active, date_joined,
+                    avatar, is_opened, is_celebrity, follower_count,
+                    following_count
+                )
+                SELECT
+                    i, '', false, 'user' || i, '', '', '', false, true,
+                    now(), 'default_avatar.png', true, false, 0, 0
+                FROM generate_series(1, %s) AS i
+                ''',
+                [nusers]
+            )
+
+        Subscription.objects.bulk_create(
+            (
+                Subscription(
+                    follows_to_id=followed_id,
+                    follower_id=follower_id,
+                    status=status
+                )
+                for followed_id, follower_id, status
+                in generate_edges(nusers, args.db_edges, args.seed)
+            ),
+            batch_size=10000
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        db_pairs = [
+            (rng.randint(1, nusers), rng.randint(1, nusers))
+            for _ in range(min(args.lookups, 10000))
+        ]
+
+        def db_is_following(follower_id, followed_id):
+            return Subscription.objects.filter(
+                follower_id=follower_id,
+                follows_to_id=followed_id,
+                status=Subscription.ACCEPTED
+            ).exists()
+
+        print(f'db with {Subscription.objects.count()} subscriptions')
+        print(
+            f'{"db is_following:":18}'
+            f'{measure_lookups(db_is_following, db_pairs):8.2f}us'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Render and parse time of DRF's JSON renderer and parser compared with
+the orjson ones (see speshalgram.renderers) on a full feed page and on
+a followers export.
+"""
+import argparse
+import io
+
+from benchmarks import setup, timeit
+from benchmarks.serializers import make_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--followers', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from speshalgram.accounts.serializers import ShortUserSerializer
+    from speshalgram.parsers import FastJSONParser
+    from speshalgram.posts.serializers import PostSerializer
+    from speshalgram.renderers import FastJSONRenderer
+
+    request = Request(APIRequestFactory().get('/'))
+    request.user = AnonymousUser()
+    context = {'request': request}
+
+    feed_page = {
+        'next': 'http://localhost/api/posts/feed/?cursor=cD0yMDIx',
+        'previous': None,
+        'results': PostSerializer(
+            make_pages(settings.POSTS_PER_PAGE)['posts'],
+            many=True,
+            context=context
+        ).data,
+    }
+    followers = ShortUserSerializer(
+        make_pages(args.followers)['users'],
+        many=True,
+        context=context
+    ).data
+    payloads = [
+        (f'feed page of {settings.POSTS_PER_PAGE}', feed_page),
+        (f'{args.followers} followers', followers),
+    ]
+
+    print(f'{"us":24}{"drf":>10}{"orjson":>10}')
+    for name, data in payloads:
+        content = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == content
+
+        for action, drf, fast in (
+            (
+                'render',
+                lambda: JSONRenderer().render(data),
+                lambda: FastJSONRenderer().render(data),
+            ),
+            (
+                'parse',
+                lambda: JSONParser().parse(io.BytesIO(content)),
+                lambda: FastJSONParser().parse(io.BytesIO(content)),
+            ),
+        ):
+            drf_time, fast_time = (
+                timeit(
+                    lambda: [func() for _ in range(args.repeat)],
+                    repeat=3
+                ) / args.repeat * 1e6
+                for func in (drf, fast)
+            )
+            print(
+                f'{action + " " + name:24}{drf_time:10.0f}{fast_time:10.0f}'
+                f'{drf_time / fast_time:8.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
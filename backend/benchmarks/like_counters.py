@@ -0,0 +1,107 @@
+"""
+Throughput of likes of a single post liked from many processes at once,
+with the like counter kept in the post row and spread among shards.
+"""
+import argparse
+import multiprocessing
+import time
+
+from benchmarks import setup, test_database, timeit
+
+
+def like(post_id, user_ids, latency):
+    from django.db import connection, transaction
+
+    from speshalgram.posts import counters
+    from speshalgram.posts.models import Like
+
+    for user_id in user_ids:
+        # the same transaction as LikeAPIView.put has
+        with transaction.atomic():
+            Like.objects.create(owner_id=user_id, post_id=post_id)
+            # round trip between the app and the db
+            # while the counter row is locked
+            time.sleep(latency)
+            counters.get_like_count(post_id)
+
+    connection.close()
+
+
+def like_concurrently(post_id, user_ids, nworkers, latency):
+    from django.db import connection
+
+    # forked workers must open their own connections
+    connection.close()
+
+    workers = [
+        multiprocessing.Process(
+            target=like,
+            args=(post_id, user_ids[i::nworkers], latency)
+        )
+        for i in range(nworkers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--likes', type=int, default=4000)
+    parser.add_argument(
+        '--shards', type=int, nargs='+', default=[1, 2, 4, 8, 16]
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=2,
+        help='simulated app to db round trip time, ms'
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from speshalgram.accounts.models import User
+    from speshalgram.posts import counters
+    from speshalgram.posts.models import Like, Post
+
+    with test_database():
+        owner = User.objects.create(username='owner')
+        post = Post.objects.create(owner=owner, picture='test.gif')
+        User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(args.likes)
+        )
+        user_ids = list(
+            User.objects.exclude(id=owner.id).values_list('id', flat=True)
+        )
+
+        print(
+            f'{args.likes} likes of a single post from {args.workers} workers, '
+            f'{args.latency}ms db latency'
+        )
+        for shards in args.shards:
+            Like.objects.all().delete()
+            counters.roll_up_like_shards()
+            Post.objects.filter(id=post.id).update(like_count=0, like_shards=shards)
+
+            elapsed = timeit(
+                lambda: like_concurrently(
+                    post.id, 
+                    user_ids, 
+                    args.workers, 
+                    args.latency / 1000
+                )
+            )
+
+            assert counters.get_like_count(post.id) == args.likes
+            print(
+                f'shards: {shards:3}  '
+                f'time: {elapsed:7.3f}s  '
+                f'throughput: {args.likes / elapsed:8.1f} likes/s'
+            )
+
+
+if __name__ == '__main__':
+    main()
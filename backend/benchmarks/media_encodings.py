@@ -0,0 +1,187 @@
+"""
+Bytes sent for the renditions of a fixed corpus of images in every
+encoding (see speshalgram.media.renditions) and the bytes served to
+a client accepting all of them, compared with the original uploads.
+
+The corpus is generated from a fixed seed: photos (smooth shapes with
+sensor noise), a screenshot (flat colors and text) and a sticker with
+transparency. --corpus takes a directory of images instead.
+"""
+import argparse
+import io
+import pathlib
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks import setup
+
+
+def make_photo(rng, size):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randrange(size[0] // 20, size[0] // 4)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=tuple(rng.randrange(256) for _ in range(3))
+        )
+    image = image.filter(ImageFilter.GaussianBlur(size[0] // 100))
+
+    noise = Image.frombytes(
+        'RGB',
+        size,
+        rng.randbytes(size[0] * size[1] * 3)
+    )
+    return Image.blend(image, noise, 0.04)
+
+
+def make_screenshot(rng, size):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for top in range(0, size[1], 120):
+        draw.rectangle(
+            (20, top + 10, size[0] - 20, top + 110),
+            fill=tuple(rng.randrange(200, 256) for _ in range(3))
+        )
+        for line in range(3):
+            draw.text(
+                (40, top + 20 + line * 30),
+                ' '.join(
+                    ''.join(
+                        rng.choice('abcdefghijklmnopqrstuvwxyz')
+                        for _ in range(rng.randrange(2, 9))
+                    )
+                    for _ in range(8)
+                ),
+                fill=(20, 20, 20)
+            )
+    return image
+
+
+def make_sticker(rng, size):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randrange(size[0] // 10, size[0] // 3)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=(*(rng.randrange(256) for _ in range(3)), 255)
+        )
+    return image
+
+
+def make_corpus(seed):
+    rng = random.Random(seed)
+    images = {
+        'portrait.jpg': (make_photo(rng, (3024, 4032)), 'JPEG'),
+        'landscape.jpg': (make_photo(rng, (4032, 3024)), 'JPEG'),
+        'square.jpg': (make_photo(rng, (1080, 1080)), 'JPEG'),
+        'screenshot.png': (make_screenshot(rng, (1170, 2532)), 'PNG'),
+        'sticker.png': (make_sticker(rng, (1024, 1024)), 'PNG'),
+    }
+
+    corpus = {}
+    for name, (image, image_format) in images.items():
+        buffer = io.BytesIO()
+        # as phones save them
+        image.save(buffer, image_format, quality=95)
+        corpus[name] = buffer.getvalue()
+    return corpus
+
+
+def read_corpus(path):
+    return {
+        file.name: file.read_bytes()
+        for file in sorted(pathlib.Path(path).iterdir())
+        if file.is_file()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', help='directory of the images')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--kind', default='picture')
+    args = parser.parse_args()
+
+    setup()
+
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import FileSystemStorage
+
+    from speshalgram.media import renditions
+
+    corpus = read_corpus(args.corpus) if args.corpus else make_corpus(
+        args.seed
+    )
+    encodings = renditions.get_encodings()
+    suffixes = ['', *encodings]
+    print(f'encodings: {", ".join(encodings) or "none"}')
+
+    columns = ['upload', 'rendition', *encodings, 'served']
+    print(f'{"":28}' + ''.join(f'{column:>10}' for column in columns))
+
+    # rendition -> column -> bytes, the clients fetched the uploads
+    # before the renditions
+    totals = defaultdict(lambda: dict.fromkeys(columns, 0))
+    elapsed = 0
+    with tempfile.TemporaryDirectory() as location:
+        storage = FileSystemStorage(location=location)
+
+        for name, content in corpus.items():
+            name = storage.save(name, ContentFile(content))
+
+            start = time.perf_counter()
+            names = renditions.render(storage, name, args.kind)
+            elapsed += time.perf_counter() - start
+
+            for rendition, rendition_name in names.items():
+                sizes = {
+                    suffix: storage.size(rendition_name + suffix)
+                    for suffix in suffixes
+                    if storage.exists(rendition_name + suffix)
+                }
+                row = {
+                    'upload': len(content),
+                    'rendition': sizes[''],
+                    # the encodings which aren't smaller aren't stored
+                    **{
+                        suffix: sizes.get(suffix, sizes[''])
+                        for suffix in encodings
+                    },
+                    # the first one stored is served, see media.views
+                    'served': next(
+                        sizes[suffix] for suffix in [*encodings, '']
+                        if suffix in sizes
+                    ),
+                }
+                for column, size in row.items():
+                    totals[rendition][column] += size
+
+                print(
+                    f'{name + " " + rendition:28}'
+                    + ''.join(f'{size:10}' for size in row.values())
+                )
+
+    print(f'\nrendered in {elapsed:.1f}s\n')
+    print(f'{"":12}{"served":>10}{"of upload":>12}{"of rendition":>14}')
+    for rendition, row in totals.items():
+        print(
+            f'{rendition:12}{row["served"]:10}'
+            f'{row["served"] / row["upload"]:12.1%}'
+            f'{row["served"] / row["rendition"]:14.1%}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Latency of the preview comments of one page of posts with a growing number
+of comments in the whole system: the window over the whole comments table
+(how they were prefetched before) against the per-post LATERAL join.
+"""
+import argparse
+
+from benchmarks import setup, test_database, timeit
+
+WINDOW_SQL = '''
+SELECT id
+FROM (
+    SELECT
+        id,
+        row_number() OVER (
+            PARTITION BY post_id
+            ORDER BY date_created DESC, id DESC
+        ) AS row_number,
+        post_id
+    FROM posts_comment
+) c
+WHERE row_number <= %s AND post_id = ANY(%s)
+'''
+
+
+def window(post_ids, number):
+    from speshalgram.posts.models import Comment
+
+    # the same query the django_cte prefetch made, the page filter
+    # is applied to the result of the window
+    return list(Comment.objects.raw(WINDOW_SQL, [number, post_ids]))
+
+
+def lateral(post_ids, number):
+    from speshalgram.posts.models import Comment
+
+    return list(Comment.objects.filter_latest_of_posts(post_ids, number))
+
+
+def add_comments(owner_id, post_ids, number):
+    """
+    spreads `number` comments among the posts
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            INSERT INTO posts_comment 
+                (owner_id, post_id, text, date_created, date_updated)
+            SELECT
+                %s,
+                (%s::integer[])[1 + i %% array_length(%s::integer[], 1)],
+                'comment',
+                now() - i * interval '1 second',
+                now()
+            FROM generate_series(1, %s) AS i
+            ''',
+            [owner_id, post_ids, post_ids, number]
+        )
+        cursor.execute('ANALYZE posts_comment')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument(
+        '--comments', type=int, nargs='+', default=[10000, 100000, 1000000]
+    )
+    parser.add_argument('--page-size', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+
+    from speshalgram.accounts.models import User
+    from speshalgram.posts.models import Post
+
+    with test_database():
+        owner = User.objects.create(username='owner')
+        Post.objects.bulk_create(
+            Post(owner=owner, picture='test.gif') for _ in range(args.posts)
+        )
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        page = post_ids[:args.page_size]
+
+        print(
+            f'preview comments of {args.page_size} posts, '
+            f'{args.posts} posts in total'
+        )
+        total = 0
+        for comments in args.comments:
+            add_comments(owner.id, post_ids, comments - total)
+            total = comments
+
+            times = [
+                timeit(
+                    lambda: strategy(page, settings.NUM_OF_PREVIEW_COMMENTS),
+                    args.repeat
+                )
+                for strategy in (window, lateral)
+            ]
+            print(
+                f'comments: {comments:9}  '
+                f'window: {times[0] * 1000:9.2f}ms  '
+                f'lateral: {times[1] * 1000:7.2f}ms'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Serialization time of pages with the compiled representation compared with
+DRF's, see speshalgram.serializers.
+"""
+import argparse
+from unittest import mock
+
+from benchmarks import setup, timeit
+
+
+def make_pages(size):
+    from speshalgram.accounts.models import User
+    from speshalgram.posts.models import Comment, Post
+
+    users = [
+        User(
+            id=user_id,
+            username=f'user{user_id}',
+            first_name='First',
+            last_name='Last',
+            description='description ' * 10,
+            follower_count=user_id * 10,
+            following_count=user_id,
+        )
+        for user_id in range(1, size + 1)
+    ]
+    for user in users:
+        user.followed_by_me_status = 'a'
+
+    posts = []
+    for post_id, owner in enumerate(users, start=1):
+        post = Post(
+            id=post_id,
+            owner=owner,
+            picture=f'posts/{post_id}.jpg',
+            description='description ' * 10,
+            like_count=post_id,
+            preview_comments=[
+                {
+                    'id': comment_id,
+                    'owner': {
+                        'id': owner.id,
+                        'username': owner.username,
+                        'first_name': owner.first_name,
+                        'last_name': owner.last_name,
+                        'avatar': 'default_avatar.png',
+                    },
+                    'text': 'comment',
+                }
+                for comment_id in range(3)
+            ]
+        )
+        post.is_liked_by_me = post_id % 2 == 0
+        posts.append(post)
+
+    comments = [
+        Comment(id=comment_id, owner=owner, post=posts[0], text='comment')
+        for comment_id, owner in enumerate(users, start=1)
+    ]
+
+    return {'posts': posts, 'comments': comments, 'users': users}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework import serializers
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from speshalgram.accounts.serializers import UserSerializer
+    from speshalgram.posts.serializers import (
+        CommentSerializer,
+        PostSerializer,
+    )
+    from speshalgram.serializers import CompiledRepresentationMixin
+
+    request = Request(APIRequestFactory().get('/'))
+    request.user = AnonymousUser()
+    pages = make_pages(args.page_size)
+    cases = [
+        ('PostSerializer', PostSerializer, pages['posts']),
+        ('CommentSerializer', CommentSerializer, pages['comments']),
+        ('UserSerializer', UserSerializer, pages['users']),
+    ]
+
+    def serialize(serializer_class, page):
+        def run():
+            for _ in range(args.repeat):
+                serializer_class(
+                    page,
+                    many=True,
+                    context={'request': request}
+                ).data
+        return timeit(run, repeat=3) / args.repeat * 1e6
+
+    print(f'us per page of {args.page_size}{"drf":>14}{"compiled":>10}')
+    for name, serializer_class, page in cases:
+        compiled = serialize(serializer_class, page)
+        with mock.patch.object(
+            CompiledRepresentationMixin,
+            'to_representation',
+            serializers.Serializer.to_representation
+        ):
+            drf = serialize(serializer_class, page)
+
+        print(
+            f'{name:20}{drf:10.0f}{compiled:10.0f}'
+            f'{drf / compiled:8.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Throughput and hit rate of the shared memory cache compared with
+LocMemCache on user cards.
+
+A single process measures the operations, then several worker processes
+read cards of users chosen with a skewed popularity and cache the missing
+ones, a miss costs --miss-cost microseconds more for fetching the user.
+Both caches get the same memory: LocMemCache of every worker holds its share
+of the entries the shared cache holds.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import setup, timeit
+
+
+def make_card(user_id):
+    return {
+        'id': user_id,
+        'username': f'user{user_id}',
+        'first_name': 'First',
+        'last_name': 'Last',
+        'avatar': f'http://localhost/media/avatars/user{user_id}.png',
+    }
+
+
+def make_caches(path, size, locmem_entries):
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from speshalgram.shared_cache import SharedMemoryCache
+
+    return {
+        'locmem': LocMemCache(
+            'benchmark',
+            {'OPTIONS': {'MAX_ENTRIES': locmem_entries}}
+        ),
+        'shared': SharedMemoryCache(path, {'OPTIONS': {'SIZE': size}}),
+    }
+
+
+def measure_operations(cache, nkeys):
+    """
+    returns microseconds per set, get of a cached key and get of a missing one
+    """
+    keys = [f'card:{user_id}' for user_id in range(nkeys)]
+    cards = [make_card(user_id) for user_id in range(nkeys)]
+    missing = [f'missing:{user_id}' for user_id in range(nkeys)]
+
+    def set_all():
+        for key, card in zip(keys, cards):
+            cache.set(key, card)
+
+    results = [timeit(set_all, repeat=3)]
+    for lookup in (keys, missing):
+        results.append(
+            timeit(lambda: [cache.get(key) for key in lookup], repeat=3)
+        )
+
+    return [elapsed / nkeys * 1e6 for elapsed in results]
+
+
+def read_cards(name, args, path, locmem_entries, user_ids, results):
+    cache = make_caches(path, args.size, locmem_entries)[name]
+    miss_cost = args.miss_cost / 1e6
+
+    hits = 0
+    start = time.perf_counter()
+    for user_id in user_ids:
+        key = f'card:{user_id}'
+        if cache.get(key) is None:
+            time.sleep(miss_cost)
+            cache.set(key, make_card(user_id))
+        else:
+            hits += 1
+    results.put((hits, time.perf_counter() - start))
+
+
+def measure_workers(name, args, path, locmem_entries):
+    """
+    returns the hit rate and the reads per second of all the workers
+    """
+    rng = random.Random(args.seed)
+    weights = list(itertools.accumulate(
+        1 / rank ** 0.9 for rank in range(1, args.users + 1)
+    ))
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    workers = []
+    for _ in range(args.workers):
+        user_ids = rng.choices(
+            range(args.users),
+            cum_weights=weights,
+            k=args.reads
+        )
+        workers.append(context.Process(
+            target=read_cards,
+            args=(name, args, path, locmem_entries, user_ids, results)
+        ))
+
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    hits = sum(hits for hits, _ in outcomes)
+    elapsed = max(elapsed for _, elapsed in outcomes)
+    nreads = args.reads * args.workers
+    return hits / nreads, nreads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=8 * 2 ** 20)
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--reads', type=int, default=50_000)
+    parser.add_argument('--miss-cost', type=float, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+
+    from speshalgram.shared_cache import DEFAULT_SLOTS, get_segment
+
+    path = os.path.join(tempfile.mkdtemp(), 'cache')
+    try:
+        segment = get_segment(path, args.size, DEFAULT_SLOTS)
+        capacity = segment.nsets * DEFAULT_SLOTS[0][1]
+        print(f'shared cache holds up to {capacity} cards')
+
+        caches = make_caches(path, args.size, capacity)
+        print(f'{"us per op":10}{"set":>10}{"get hit":>10}{"get miss":>10}')
+        for name, cache in caches.items():
+            timings = measure_operations(cache, args.keys)
+            print(f'{name:10}' + ''.join(f'{t:10.2f}' for t in timings))
+
+        print(
+            f'{args.workers} workers, {args.users} users, '
+            f'{args.reads} reads each'
+        )
+        for name in caches:
+            caches[name].clear()
+            hit_rate, throughput = measure_workers(
+                name,
+                args,
+                path,
+                capacity // args.workers
+            )
+            print(
+                f'{name:10}hit rate {hit_rate:6.1%}, '
+                f'{throughput / 1000:8.1f}k reads/s'
+            )
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
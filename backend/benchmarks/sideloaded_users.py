@@ -0,0 +1,66 @@
+"""
+Size and serialization time of a page of posts with the users in place compared
+with the normalized one (?shape=normalized, see SideloadedUsersMixin).
+"""
+import argparse
+
+from benchmarks import setup, timeit
+from benchmarks.serializers import make_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--authors', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from speshalgram.posts.serializers import PostSerializer
+    from speshalgram.renderers import FastJSONRenderer
+
+    request = Request(APIRequestFactory().get('/'))
+    request.user = AnonymousUser()
+
+    # the posts and the preview comments of a few authors
+    pages = make_pages(args.posts)
+    authors = pages['users'][:args.authors]
+    posts = pages['posts']
+    for index, post in enumerate(posts):
+        post.owner = authors[index % len(authors)]
+        for comment in post.preview_comments:
+            comment['owner'] = {
+                **comment['owner'],
+                'username': post.owner.username,
+            }
+
+    def serialize(normalized):
+        context = {'request': request}
+        if normalized:
+            context['sideloaded_users'] = {}
+        page = {
+            'next': None,
+            'previous': None,
+            'results': PostSerializer(posts, many=True, context=context).data,
+        }
+        if normalized:
+            page['users'] = context['sideloaded_users']
+        return page
+
+    print(f'{"":12}{"bytes":>10}{"us":>10}')
+    for name, normalized in (('in place', False), ('normalized', True)):
+        size = len(FastJSONRenderer().render(serialize(normalized)))
+        elapsed = timeit(
+            lambda: [serialize(normalized) for _ in range(args.repeat)],
+            repeat=3
+        ) / args.repeat * 1e6
+        print(f'{name:12}{size:10}{elapsed:10.0f}')
+
+
+if __name__ == '__main__':
+    main()
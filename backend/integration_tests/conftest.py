@@ -3,9 +3,12 @@ from uuid import uuid4
 
 import pytest
 from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage, Storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 
+from speshalgram.accounts import visibility
 from speshalgram.accounts.models import Subscription, User
 from speshalgram.posts.models import Comment, Like, Post
 
@@ -19,6 +22,35 @@ def mock_filestorage():
         yield
 
 
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    # the files are saved for real
+    with mock.patch.object(FileSystemStorage, 'save', Storage.save):
+        yield tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_visibility_cache():
+    visibility.cache.clear()
+    yield
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_cache_location(tmp_path_factory):
+    # the cache of the servers running on the host is left alone,
+    # the backend maps the file once it is first used
+    settings.CACHES['shared']['LOCATION'] = str(
+        tmp_path_factory.mktemp('shared_cache') / 'cache'
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_cache(shared_cache_location):
+    caches['shared'].clear()
+    yield
+
+
 @pytest.fixture
 def client():
     return APIClient()
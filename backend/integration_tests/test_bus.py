@@ -0,0 +1,100 @@
+import json
+import queue
+
+import pytest
+from django.db import transaction
+
+from speshalgram import bus
+from speshalgram.accounts import graph, visibility
+from speshalgram.accounts.models import Subscription
+
+
+@pytest.fixture
+def received(monkeypatch):
+    messages = queue.Queue()
+    monkeypatch.setattr(bus, '_handlers', bus.defaultdict(list))
+    bus.subscribe('test', lambda **data: messages.put(data))
+    return messages
+
+
+@pytest.fixture
+def listener(settings, received):
+    settings.INVALIDATION_BUS = True
+
+    # the messages of the test process itself are received too
+    listener = bus.Listener(origin='test', timeout=0.1)
+    listener.start()
+    assert listener.listening.wait(10)
+    yield listener
+    listener.stop()
+    listener.join()
+
+
+def message(topic, origin='other', **data):
+    return json.dumps({'o': origin, 't': topic, 'd': data})
+
+
+def test_dispatch(received):
+    origin = bus.get_origin()
+    bus.dispatch(message('test', value=1), origin)
+    bus.dispatch(message('test', origin=origin, value=2), origin)
+    bus.dispatch(message('unknown', value=3), origin)
+
+    assert received.get_nowait() == {'value': 1}
+    assert received.empty()
+
+
+def test_dispatch_subscription_change():
+    visibility.cache.set((1, 2), True)
+    follow_graph = graph.FollowGraph.from_edges([
+        (2, 1, Subscription.ACCEPTED),
+    ])
+    graph._graph = follow_graph
+
+    try:
+        bus.dispatch(message(
+            'subscription',
+            follower_id=1,
+            follows_to_id=2,
+            old_status=Subscription.ACCEPTED,
+            new_status=None
+        ))
+    finally:
+        graph._graph = None
+
+    assert visibility.cache.get((1, 2)) is None
+    assert not follow_graph.is_following(1, 2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_committed_messages_are_delivered(listener, received):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            bus.publish('test', value=1)
+            raise RuntimeError
+
+    with transaction.atomic():
+        bus.publish('test', value=2)
+        assert received.empty()
+
+    assert received.get(timeout=10) == {'value': 2}
+    assert received.empty()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_subscription_change_is_published(listener, user1, user2):
+    changes = queue.Queue()
+    bus.subscribe('subscription', lambda **data: changes.put(data))
+
+    Subscription.objects.create(
+        follower=user1,
+        follows_to=user2,
+        status=Subscription.ACCEPTED
+    )
+
+    assert changes.get(timeout=10) == {
+        'follower_id': user1.id,
+        'follows_to_id': user2.id,
+        'old_status': None,
+        'new_status': Subscription.ACCEPTED,
+    }
@@ -0,0 +1,61 @@
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from speshalgram.accounts import cards
+from speshalgram.accounts.serializers import ShortUserSerializer
+
+
+@pytest.mark.django_db
+def test_cards_are_cached_and_invalidated(client, user2, user2_posts):
+    client.force_authenticate(user2)
+    url = reverse('post-list') + f'?username={user2.username}'
+
+    with mock.patch.object(
+        cards,
+        'get_cards',
+        wraps=cards.get_cards
+    ) as get_cards:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+
+    # one multi-get for the owners of the page
+    get_cards.assert_called_once()
+    assert len(get_cards.call_args.args[0]) == len(user2_posts)
+
+    card = cards.get_cache().get(
+        cards.get_key(user2.id),
+        version=cards.CARD_VERSION
+    )
+    assert card['username'] == user2.username
+    assert response.data['results'][0]['owner']['avatar'].startswith(
+        'http://testserver/'
+    )
+
+    response = client.patch(reverse('user-me'), {'first_name': 'renamed'})
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get(url)
+    assert response.data['results'][0]['owner']['first_name'] == 'renamed'
+
+
+@pytest.mark.django_db
+def test_card_fields(user1):
+    user1.first_name = 'first'
+    user1.save()
+
+    cards.get_cards([user1])
+    assert ShortUserSerializer(user1).data == cards.render(user1)
+    assert dict(ShortUserSerializer(user1).data) == {
+        'username': user1.username,
+        'first_name': 'first',
+        'last_name': '',
+        'avatar': user1.avatar.url,
+        'avatar_renditions': {
+            'thumbnail': '/media/default_avatar.thumbnail.png',
+            'feed': '/media/default_avatar.feed.png',
+            'full': '/media/default_avatar.full.png',
+        },
+    }
@@ -0,0 +1,159 @@
+import io
+from unittest import mock
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+from PIL import Image
+
+from speshalgram.jobs import queue
+from speshalgram.media import renditions
+from speshalgram.media.models import Blob
+from speshalgram.posts.models import Post
+
+
+def make_upload(name, color=(200, 100, 50)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def run_jobs():
+    while True:
+        job = queue.claim()
+        if job is None:
+            return
+        assert queue.run(job)
+
+
+@pytest.mark.django_db
+def test_identical_uploads_are_stored_once(media_root, user1):
+    posts = [
+        Post.objects.create(owner=user1, picture=make_upload(name))
+        for name in ('photo.PNG', 'copy.png')
+    ]
+    other = Post.objects.create(
+        owner=user1,
+        picture=make_upload('photo.png', color=(0, 0, 0))
+    )
+
+    name = posts[0].picture.name
+    assert name.startswith('pictures/')
+    assert name.endswith('.png')
+    assert posts[1].picture.name == name
+    assert posts[0].picture.url == posts[1].picture.url
+    assert other.picture.name != name
+    assert len(list(media_root.rglob('*.png'))) == 2
+    assert Blob.objects.get(name=name).refcount == 2
+
+    # rendered by the job of the first upload only
+    with mock.patch.object(
+        renditions, 'render', wraps=renditions.render
+    ) as render:
+        run_jobs()
+    assert render.call_count == 2
+    for post in [*posts, other]:
+        post.refresh_from_db()
+        assert post.picture_status == Post.READY
+
+
+@pytest.mark.django_db
+def test_unreferenced_files_are_collected(media_root, user1):
+    posts = [
+        Post.objects.create(owner=user1, picture=make_upload('photo.png'))
+        for _ in range(2)
+    ]
+    run_jobs()
+    name = posts[0].picture.name
+    derived_names = [
+        rendition_name + suffix
+        for rendition_name in renditions.get_names(name, 'picture').values()
+        for suffix in ('', '.webp')
+    ]
+    assert all((media_root / path).exists() for path in derived_names)
+
+    posts[0].delete()
+    assert Blob.objects.get(name=name).refcount == 1
+    assert queue.claim() is None
+
+    posts[1].delete()
+    run_jobs()
+    assert not Blob.objects.filter(name=name).exists()
+    assert not (media_root / name).exists()
+    assert not any((media_root / path).exists() for path in derived_names)
+
+
+@pytest.mark.django_db
+def test_referenced_again_before_collected(media_root, user1):
+    post = Post.objects.create(owner=user1, picture=make_upload('photo.png'))
+    name = post.picture.name
+    post.delete()
+
+    post = Post.objects.create(owner=user1, picture=make_upload('photo.png'))
+    run_jobs()
+    assert post.picture.name == name
+    assert Blob.objects.get(name=name).refcount == 1
+    assert (media_root / name).exists()
+
+
+@pytest.mark.django_db
+def test_replaced_avatar_is_released(media_root, create_user):
+    users = [
+        create_user(avatar=make_upload('avatar.png')) for _ in range(2)
+    ]
+    name = users[0].avatar.name
+    assert name.startswith('avatars/')
+    assert Blob.objects.get(name=name).refcount == 2
+
+    users[0].avatar = make_upload('avatar.png', color=(0, 0, 0))
+    users[0].save()
+    assert Blob.objects.get(name=name).refcount == 1
+    assert Blob.objects.get(name=users[0].avatar.name).refcount == 1
+
+    # saves without uploads don't touch the references
+    users[1].description = 'text'
+    users[1].save()
+    assert Blob.objects.get(name=name).refcount == 1
+
+    # the default avatar has no blob
+    run_jobs()
+    create_user().delete()
+    assert queue.claim() is None
+
+
+@pytest.mark.django_db
+def test_reference_is_rolled_back_with_model(media_root, user1):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            post = Post.objects.create(
+                owner=user1,
+                picture=make_upload('photo.png')
+            )
+            raise RuntimeError
+
+    assert not Blob.objects.filter(name=post.picture.name).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saved_in_transaction_only(media_root):
+    with pytest.raises(TransactionManagementError):
+        default_storage.save('pictures/a.png', ContentFile(b'png'))
+
+    assert not Blob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_save_derived(media_root):
+    name = default_storage.save('pictures/a.png', ContentFile(b'png'))
+
+    assert default_storage.save_derived(
+        name + '.webp', ContentFile(b'webp')
+    ) == name + '.webp'
+    assert default_storage.save_derived(
+        name + '.webp', ContentFile(b'new')
+    ) == name + '.webp'
+    assert (media_root / (name + '.webp')).read_bytes() == b'new'
+    assert Blob.objects.get(name=name).size == 3
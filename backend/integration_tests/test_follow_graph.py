@@ -0,0 +1,99 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from rest_framework import status
+
+from speshalgram.accounts import graph
+from speshalgram.accounts.models import Subscription
+
+ACCEPTED, PENDING, REJECTED = (
+    Subscription.ACCEPTED,
+    Subscription.PENDING,
+    Subscription.REJECTED,
+)
+
+
+class TestFollowGraph:
+
+    @pytest.fixture
+    def follow_graph(self):
+        return graph.FollowGraph.from_edges([
+            (1, 2, ACCEPTED),
+            (1, 3, PENDING),
+            (1, 4, ACCEPTED),
+            (2, 1, REJECTED),
+            (3, 2, ACCEPTED),
+        ])
+
+    def test_from_edges(self, follow_graph):
+        assert follow_graph.is_following(2, 1)
+        assert not follow_graph.is_following(3, 1)
+        assert follow_graph.is_following(3, 1, PENDING)
+        assert not follow_graph.is_following(1, 2)
+
+        assert list(follow_graph.get_followers(1)) == [2, 4]
+        assert list(follow_graph.get_follows(2)) == [1, 3]
+        assert follow_graph.follower_count(1) == 2
+        assert follow_graph.following_count(2) == 2
+        assert follow_graph.nedges() == 4
+        assert follow_graph.nbytes() > 0
+
+    def test_add_and_remove(self, follow_graph):
+        follow_graph.remove(3, 1, PENDING)
+        follow_graph.add(3, 1, ACCEPTED)
+        follow_graph.add(3, 1, ACCEPTED)
+
+        assert list(follow_graph.get_followers(1)) == [2, 3, 4]
+        assert list(follow_graph.get_followers(1, PENDING)) == []
+
+        follow_graph.remove(2, 3, ACCEPTED)
+        assert list(follow_graph.get_followers(3)) == []
+        assert follow_graph.following_count(2) == 1
+
+
+@pytest.fixture
+def loaded_graph():
+    yield graph.load()
+    graph._graph = None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_graph_follows_subscriptions(
+    client,
+    user1,
+    user2_closed,
+    u2_accepted_follower,
+    loaded_graph
+):
+    assert loaded_graph.is_following(u2_accepted_follower.id, user2_closed.id)
+
+    client.force_authenticate(user1)
+    client.put(reverse('user-subscribe', args=[user2_closed.username]))
+    assert loaded_graph.is_following(user1.id, user2_closed.id, PENDING)
+
+    url = reverse('post-list') + f'?username={user2_closed.username}'
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+    client.force_authenticate(user2_closed)
+    client.put(reverse('user-accept', args=[user1.username]))
+    assert loaded_graph.is_following(user1.id, user2_closed.id)
+    assert not loaded_graph.is_following(user1.id, user2_closed.id, PENDING)
+
+    client.force_authenticate(user1)
+    assert client.get(url).status_code == status.HTTP_200_OK
+
+    client.delete(reverse('user-subscribe', args=[user2_closed.username]))
+    assert not loaded_graph.is_following(user1.id, user2_closed.id)
+    assert loaded_graph.follower_count(user2_closed.id) == 1
+
+
+@pytest.mark.parametrize(('bus', 'configured'), [(True, True), (False, False)])
+def test_index_requires_bus(settings, bus, configured):
+    settings.FOLLOW_GRAPH_INDEX = True
+    settings.INVALIDATION_BUS = bus
+
+    if configured:
+        graph.check_settings()
+    else:
+        with pytest.raises(ImproperlyConfigured):
+            graph.check_settings()
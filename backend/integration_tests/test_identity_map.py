@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.http import Http404
+from django.test.utils import CaptureQueriesContext
+
+from speshalgram.accounts.models import User
+from speshalgram.utils import IdentityMap
+
+
+@pytest.mark.django_db
+def test_fetched_once(user1):
+    identity_map = IdentityMap()
+
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(2):
+            assert identity_map.get_or_404(
+                User.objects.all(),
+                username=user1.username
+            ) == user1
+
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_restricted_querysets_are_fetched(user1):
+    identity_map = IdentityMap()
+    identity_map.get_or_404(User.objects.all(), username=user1.username)
+
+    with pytest.raises(Http404):
+        identity_map.get_or_404(
+            User.objects.filter(is_opened=False),
+            username=user1.username
+        )
+
+    with CaptureQueriesContext(connection) as queries:
+        identity_map.get_or_404(
+            User.objects.select_for_update(),
+            username=user1.username
+        )
+    assert 'FOR UPDATE' in queries[-1]['sql']
@@ -0,0 +1,173 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from speshalgram.jobs import queue
+from speshalgram.jobs.models import Job
+
+
+@pytest.fixture
+def calls():
+    calls = []
+    dead = []
+
+    def add(value):
+        calls.append(value)
+        if value == 'fail':
+            raise ValueError(value)
+
+    with mock.patch.dict(queue._tasks, {
+        'test.add': (add, lambda value: dead.append(value)),
+    }):
+        yield calls, dead
+
+
+@pytest.mark.django_db
+def test_run(calls):
+    calls, _ = calls
+    queue.enqueue('test.add', value=1)
+    queue.enqueue('test.add', value=2, delay=60)
+
+    job = queue.claim()
+    assert job.status == Job.RUNNING
+    assert job.attempts == 1
+    assert queue.run(job)
+
+    assert calls == [1]
+    # the second one isn't due yet
+    assert queue.claim() is None
+    assert Job.objects.get().payload == {'value': 2}
+
+
+@pytest.mark.django_db
+def test_retries_and_dead(settings, calls):
+    calls, dead = calls
+    settings.JOBS_RETRY_BACKOFF = 10
+    queue.enqueue('test.add', value='fail', max_attempts=3)
+
+    for attempt in range(1, 4):
+        job = queue.claim()
+        assert job.attempts == attempt
+        assert not queue.run(job)
+
+        job.refresh_from_db()
+        assert 'ValueError: fail' in job.last_error
+        if attempt < 3:
+            assert job.status == Job.PENDING
+            assert job.run_at > timezone.now() + timedelta(
+                seconds=10 * 2 ** (attempt - 1) - 5
+            )
+            Job.objects.update(run_at=timezone.now())
+
+    assert job.status == Job.DEAD
+    assert queue.claim() is None
+    assert calls == ['fail'] * 3
+    assert dead == ['fail']
+
+
+@pytest.mark.django_db
+def test_expired_lease_is_claimed_again(calls):
+    calls, _ = calls
+    queue.enqueue('test.add', value=1)
+
+    job = queue.claim()
+    assert queue.claim() is None
+
+    Job.objects.update(run_at=timezone.now())
+    claimed_again = queue.claim()
+    assert claimed_again.attempts == 2
+
+    # the first claim lost the lease, the job is kept for the second one
+    assert queue.run(job)
+    assert Job.objects.filter(id=job.id).exists()
+    assert queue.run(claimed_again)
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_expired_last_lease_is_dead(calls):
+    calls, dead = calls
+    job = queue.enqueue('test.add', max_attempts=2, value='killed')
+    for _ in range(2):
+        assert queue.claim().id == job.id
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+    queue.enqueue('test.add', value=1)
+
+    # the worker was killed by the last attempt, the next job is claimed
+    assert queue.claim().payload == {'value': 1}
+    job.refresh_from_db()
+    assert job.status == Job.DEAD
+    assert job.last_error == 'the lease of attempt 2 ran out'
+    assert dead == ['killed']
+    assert calls == []
+
+
+@pytest.mark.django_db
+def test_failing_on_dead_is_logged(calls):
+    calls, _ = calls
+    queue.enqueue('test.add', max_attempts=1, value='fail')
+
+    with mock.patch.dict(queue._tasks, {
+        'test.add': (queue._tasks['test.add'][0], mock.Mock(
+            side_effect=ValueError('on_dead')
+        )),
+    }):
+        assert not queue.run(queue.claim())
+
+    assert Job.objects.get().status == Job.DEAD
+
+
+@pytest.mark.django_db(transaction=True)
+def test_locked_jobs_are_skipped(calls):
+    queue.enqueue('test.add', value=1)
+    queue.enqueue('test.add', value=2)
+
+    claimed = []
+    locked = threading.Event()
+    release = threading.Event()
+
+    def lock_first():
+        # holds the lock of the first job as a claim in progress does
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('BEGIN')
+                cursor.execute(
+                    'SELECT id FROM jobs_job ORDER BY id LIMIT 1 FOR UPDATE'
+                )
+                locked.set()
+                release.wait(5)
+                cursor.execute('ROLLBACK')
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=lock_first)
+    thread.start()
+    locked.wait(5)
+    try:
+        claimed.append(queue.claim())
+    finally:
+        release.set()
+        thread.join()
+
+    assert claimed[0].payload == {'value': 2}
+
+
+# the command closes the connections between the jobs
+@pytest.mark.django_db(transaction=True)
+def test_run_jobs_command(calls):
+    calls, _ = calls
+    queue.enqueue('test.add', value=1)
+    queue.enqueue('test.add', value='fail')
+    stdout = StringIO()
+
+    call_command('run_jobs', '--burst', stdout=stdout)
+
+    assert calls == [1, 'fail']
+    assert 'done in attempt 1' in stdout.getvalue()
+    assert 'failed in attempt 1' in stdout.getvalue()
@@ -0,0 +1,80 @@
+import datetime
+import decimal
+import io
+import json
+import uuid
+from collections import OrderedDict
+
+import pytest
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from speshalgram import parsers, renderers
+from speshalgram.parsers import FastJSONParser
+from speshalgram.renderers import FastJSONRenderer
+
+DATA = OrderedDict([
+    ('aware', datetime.datetime(
+        2021, 3, 4, 5, 6, 7, 8910,
+        tzinfo=timezone.utc
+    )),
+    ('offset', datetime.datetime(
+        2021, 3, 4, 5, 6, 7,
+        tzinfo=datetime.timezone(datetime.timedelta(hours=3))
+    )),
+    ('naive', datetime.datetime(2021, 3, 4, 5, 6, 7, 8910)),
+    ('date', datetime.date(2021, 3, 4)),
+    ('time', datetime.time(5, 6, 7, 8910)),
+    ('timedelta', datetime.timedelta(days=1, seconds=3)),
+    ('decimal', decimal.Decimal('12.50')),
+    ('lazy', gettext_lazy('This field is required.')),
+    ('uuid', uuid.UUID(int=1)),
+    ('text', 'юникод \u2028 \u2029 "quoted"'),
+    ('numbers', (1, -2, 3.5, True, None)),
+    (1, {'nested': [OrderedDict(b=1, a=2)]}),
+])
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def fallback(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(renderers, 'orjson', None)
+        monkeypatch.setattr(parsers, 'orjson', None)
+
+
+@pytest.mark.parametrize('data', [DATA, [DATA] * 3, {'big': 2 ** 70}, None])
+@pytest.mark.parametrize('media_type', [None, 'application/json; indent=4'])
+def test_rendered_the_same(fallback, data, media_type):
+    assert FastJSONRenderer().render(data, media_type) == (
+        JSONRenderer().render(data, media_type)
+    )
+
+
+def test_exponents_are_spelled_differently(fallback):
+    data = [1e-7, 1e16, 1.5e300]
+    rendered = FastJSONRenderer().render(data)
+
+    assert json.loads(rendered) == json.loads(JSONRenderer().render(data))
+
+
+@pytest.mark.parametrize('content', [
+    b'{"a": [1, 2.5, "\\u2028", null, true], "b": {"c": "\xd1\x8e"}}',
+    b'[]',
+])
+def test_parsed_the_same(fallback, content):
+    assert FastJSONParser().parse(io.BytesIO(content)) == (
+        JSONParser().parse(io.BytesIO(content))
+    )
+
+
+@pytest.mark.parametrize('content', [b'{"a": NaN}', b'{"a": ', b'\xff'])
+def test_parse_errors_are_the_same(fallback, content):
+    with pytest.raises(ParseError) as fast_error:
+        FastJSONParser().parse(io.BytesIO(content))
+    with pytest.raises(ParseError) as error:
+        JSONParser().parse(io.BytesIO(content))
+
+    assert str(fast_error.value) == str(error.value)
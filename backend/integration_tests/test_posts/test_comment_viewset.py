@@ -1,11 +1,16 @@
+import threading
 from unittest import mock
 
 import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
+from speshalgram.posts import comments
+from speshalgram.posts.models import Comment, Post
+
 
-# TODO add query count
 @pytest.mark.comments
 @pytest.mark.django_db
 class TestCommentViewSet:
@@ -230,3 +235,150 @@ class TestCommentViewSet:
                 for ret_comment, comment in zip(response.json(), comments):
                     assert ret_comment.keys() == self.COMMENTS_FIELDS
                     assert ret_comment['id'] == comment.id
+
+    def test_preview_comments_snapshot(
+        self,
+        client,
+        settings,
+        user1,
+        user2,
+        user2_posts
+    ):
+        post = user2_posts[0]['post']
+        comments = user2_posts[0]['comments']
+
+        def assert_snapshot():
+            post.refresh_from_db()
+            assert [
+                (comment['id'], comment['owner']['username'])
+                for comment in post.preview_comments
+            ] == [
+                (comment.id, comment.owner.username)
+                for comment in comments[-settings.NUM_OF_PREVIEW_COMMENTS:]
+            ]
+
+        assert_snapshot()
+
+        client.force_authenticate(user1)
+        response = client.post(
+            reverse('comment-list') + f'?post_id={post.id}',
+            data={'text': 'text'}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        comments.append(Comment.objects.get(id=response.json()['id']))
+        assert_snapshot()
+
+        user1.username = 'renamed'
+        user1.save()
+        comments[-1].owner.refresh_from_db()
+        assert_snapshot()
+
+        response = client.delete(
+            reverse('comment-detail', args=[comments[-1].id])
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        comments.pop()
+        assert_snapshot()
+
+    def test_query_budget(
+        self,
+        client,
+        django_assert_num_queries,
+        user2_closed,
+        user2_posts,
+        u2_accepted_follower
+    ):
+        url = (
+            reverse('comment-list') 
+            + f'?post_id={user2_posts[0]["post"].id}'
+        )
+        client.force_authenticate(u2_accepted_follower)
+
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        # the post is fetched once, locked and updated by the snapshot,
+        # the subscription is cached by the list already
+        with django_assert_num_queries(9):
+            response = client.post(url, data={'text': 'text'})
+        assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_comments(create_user):
+    owner = create_user()
+    post = Post.objects.create(owner=owner, picture='test.gif')
+    refresh = comments.refresh
+    # both comments are inserted before either snapshot is rebuilt
+    inserted = threading.Barrier(2, timeout=5)
+    errors = []
+
+    def refresh_after_both(*args, **kwargs):
+        inserted.wait()
+        refresh(*args, **kwargs)
+
+    def comment(text):
+        try:
+            with transaction.atomic():
+                # the foreign key of the comment locks the post on insert
+                with connection.cursor() as cursor:
+                    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                Comment.objects.create(post=post, owner=owner, text=text)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    with mock.patch.object(comments, 'refresh', refresh_after_both):
+        threads = [
+            threading.Thread(target=comment, args=(text,))
+            for text in ('first', 'second')
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    post.refresh_from_db()
+    assert {
+        comment['text'] for comment in post.preview_comments
+    } == {'first', 'second'}
+
+
+@pytest.mark.django_db
+def test_cascades(create_user):
+    owner, commenter = create_user(), create_user()
+    posts = [
+        Post.objects.create(owner=owner, picture='test.gif')
+        for _ in range(2)
+    ]
+    commenter_post = Post.objects.create(owner=commenter, picture='test.gif')
+    for post in [*posts, commenter_post]:
+        for user in (owner, commenter, commenter):
+            Comment.objects.create(post=post, owner=user, text='text')
+
+    post_id = posts[1].id
+    with CaptureQueriesContext(connection) as queries:
+        posts[1].delete()
+    # the comments are deleted at once, the snapshot isn't rebuilt
+    assert not any('FOR NO KEY UPDATE' in q['sql'] for q in queries)
+    assert [
+        q['sql'] for q in queries
+        if q['sql'].startswith('DELETE FROM "posts_comment"')
+    ] == [
+        'DELETE FROM "posts_comment" WHERE "posts_comment"."post_id" IN '
+        f'({post_id})'
+    ]
+
+    with CaptureQueriesContext(connection) as queries:
+        commenter.delete()
+    # rebuilt once for the post of the other user
+    assert sum('FOR NO KEY UPDATE' in q['sql'] for q in queries) == 1
+    posts[0].refresh_from_db()
+    assert [
+        comment['owner']['id'] for comment in posts[0].preview_comments
+    ] == [owner.id]
+    assert not Comment.objects.exclude(post=posts[0]).exists()
+
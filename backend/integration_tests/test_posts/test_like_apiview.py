@@ -1,11 +1,16 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
-from speshalgram.posts.models import Like
+from speshalgram.posts import counters
+from speshalgram.posts.models import Like, LikeCounterShard, Post
 
 
-# TODO add query count
 @pytest.mark.likes
 @pytest.mark.django_db
 class TestLikeAPIView:
@@ -15,6 +20,7 @@ class TestLikeAPIView:
         'first_name',
         'last_name',
         'avatar',
+        'avatar_renditions',
     }
 
     @pytest.mark.parametrize(
@@ -249,3 +255,157 @@ class TestLikeAPIView:
             response = client.delete(url)      
             assert response.status_code == expected_status
             assert Like.objects.filter(post=post).count() == nlikes
+
+    def test_like_count(self, client, user1, user2, user2_posts):
+        post = user2_posts[0]['post']
+        nlikes = len(user2_posts[0]['likes'])
+        url = reverse('likes') + f'?post_id={post.id}'
+
+        post.refresh_from_db()
+        assert post.like_count == nlikes
+
+        client.force_authenticate(user1)
+
+        for i in range(2):
+            response = client.put(url)
+            assert response.json() == {'nlikes': nlikes + 1}
+            post.refresh_from_db()
+            assert post.like_count == nlikes + 1
+
+        for i in range(2):
+            response = client.delete(url)
+            assert response.json() == {'nlikes': nlikes}
+            post.refresh_from_db()
+            assert post.like_count == nlikes
+
+    def test_sharded_like_count(
+        self, 
+        client, 
+        create_user, 
+        user2, 
+        user2_posts
+    ):
+        post = user2_posts[0]['post']
+        nlikes = len(user2_posts[0]['likes'])
+        url = reverse('likes') + f'?post_id={post.id}'
+
+        Post.objects.filter(id=post.id).update(like_shards=4)
+
+        users = [create_user() for _ in range(5)]
+        for i, user in enumerate(users, start=1):
+            client.force_authenticate(user)
+            response = client.put(url)
+            assert response.json() == {'nlikes': nlikes + i}
+
+        client.force_authenticate(users[0])
+        response = client.delete(url)
+        assert response.json() == {'nlikes': nlikes + len(users) - 1}
+
+        post.refresh_from_db()
+        assert post.like_count == nlikes
+        assert LikeCounterShard.objects.filter(post=post).count() > 1
+
+        response = client.get(reverse('post-detail', args=[post.id]))
+        assert response.json()['nlikes'] == nlikes + len(users) - 1
+
+        # tuned down, the shards aren't rolled up yet
+        Post.objects.filter(id=post.id).update(like_shards=1)
+        assert counters.get_like_count(post.id) == nlikes + len(users) - 1
+
+        # the rate is far below the sharding one
+        call_command('tune_like_counters', stdout=StringIO())
+
+        post.refresh_from_db()
+        assert post.like_shards == 1
+        assert post.like_count == nlikes + len(users) - 1
+        assert not LikeCounterShard.objects.filter(post=post).exists()
+
+    def test_delete_sharded_post(self, client, create_user, user2, user2_posts):
+        post = user2_posts[0]['post']
+        url = reverse('likes') + f'?post_id={post.id}'
+        Post.objects.filter(id=post.id).update(like_shards=4)
+
+        for user in [create_user() for _ in range(3)]:
+            client.force_authenticate(user)
+            client.put(url)
+        assert LikeCounterShard.objects.filter(post=post).exists()
+
+        client.force_authenticate(user2)
+        response = client.delete(reverse('post-detail', args=[post.id]))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        # the foreign keys are checked at commit
+        connection.check_constraints()
+        assert not LikeCounterShard.objects.filter(post=post).exists()
+        assert not Like.objects.filter(post=post).exists()
+
+    def test_delete_user(self, client, create_user, user2, user2_posts):
+        posts = [user2_posts[0]['post'], user2_posts[1]['post']]
+        Post.objects.filter(id=posts[1].id).update(like_shards=4)
+        users = [create_user() for _ in range(3)]
+        for user in users:
+            client.force_authenticate(user)
+            for post in posts:
+                client.put(reverse('likes') + f'?post_id={post.id}')
+        nlikes = [counters.get_like_count(post.id) for post in posts]
+        user_id = users[0].id
+
+        with CaptureQueriesContext(connection) as queries:
+            users[0].delete()
+
+        # the likes are deleted at once
+        assert [
+            query['sql'] for query in queries
+            if query['sql'].startswith('DELETE FROM "posts_like"')
+        ] == [
+            'DELETE FROM "posts_like" WHERE "posts_like"."owner_id" IN '
+            f'({user_id})'
+        ]
+        connection.check_constraints()
+        assert [counters.get_like_count(post.id) for post in posts] == [
+            count - 1 for count in nlikes
+        ]
+
+    def test_like_missing_post(self, client, user1):
+        client.force_authenticate(user1)
+
+        response = client.put(reverse('likes') + '?post_id=0')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.put(reverse('likes') + '?post_id=text')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_like_round_trips(
+        self, 
+        client, 
+        django_assert_num_queries, 
+        user1, 
+        user2, 
+        user2_posts
+    ):
+        post = user2_posts[0]['post']
+        url = reverse('likes') + f'?post_id={post.id}'
+
+        client.force_authenticate(user1)
+
+        with django_assert_num_queries(1):
+            client.put(url)
+
+        with django_assert_num_queries(1):
+            client.delete(url)
+
+    def test_query_budget(
+        self,
+        client,
+        django_assert_num_queries,
+        user2_closed,
+        user2_posts,
+        u2_accepted_follower
+    ):
+        client.force_authenticate(u2_accepted_follower)
+
+        with django_assert_num_queries(3):
+            response = client.get(
+                reverse('likes') + f'?post_id={user2_posts[0]["post"].id}'
+            )
+        assert response.status_code == status.HTTP_200_OK
@@ -1,15 +1,19 @@
+from io import StringIO
 from unittest import mock
 
 import pytest
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
-from speshalgram.posts.models import Post
+from speshalgram.accounts.models import Subscription
+from speshalgram.posts.models import Comment, Like, Post, TimelineEntry
 
 
-# TODO add query count
 @pytest.mark.posts
 @pytest.mark.django_db
 class TestPostViewSet:
@@ -18,6 +22,8 @@ class TestPostViewSet:
         'id',
         'owner',
         'picture',
+        'picture_status',
+        'picture_renditions',
         'description',
         'nlikes',
         'preview_comments',
@@ -210,6 +216,244 @@ class TestPostViewSet:
 
             assert response.status_code == status.HTTP_200_OK
             assert len(response.json()) == 0
+
+    def test_feed_follows_subscription_status(
+        self,
+        client,
+        user2_closed,
+        u2_pending_follower,
+        user2_closed_posts
+    ):
+        def get_feed_ids():
+            client.force_authenticate(u2_pending_follower)
+            response = client.get(reverse('post-feed'))
+            assert response.status_code == status.HTTP_200_OK
+            return [post['id'] for post in response.json()['results']]
+
+        assert get_feed_ids() == []
+
+        client.force_authenticate(user2_closed)
+        client.put(
+            reverse('user-accept', args=[u2_pending_follower.username])
+        )
+
+        assert get_feed_ids() == [
+            post['post'].id
+            for post in sorted(
+                user2_closed_posts,
+                key=lambda p: (p['post'].date_created, p['post'].id),
+                reverse=True
+            )
+        ], 'posts must be backfilled after subscription is accepted'
+
+        client.force_authenticate(user2_closed)
+        client.delete(
+            reverse('user-accept', args=[u2_pending_follower.username])
+        )
+
+        assert get_feed_ids() == [], (
+            'posts must be pruned after subscription is rejected'
+        )
+
+    def test_feed_pagination(
+        self,
+        client,
+        user2,
+        u2_accepted_follower,
+        test_gif
+    ):
+        posts = [
+            Post.objects.create(
+                owner=user2,
+                picture=SimpleUploadedFile(
+                    'test.gif', 
+                    test_gif, 
+                    content_type='image/gif'
+                )
+            )
+            for _ in range(settings.POSTS_PER_PAGE * 2 + 1)
+        ]
+        expected_ids = [
+            post.id
+            for post in sorted(
+                posts, 
+                key=lambda p: (p.date_created, p.id), 
+                reverse=True
+            )
+        ]
+
+        client.force_authenticate(u2_accepted_follower)
+
+        returned_ids = []
+        url = reverse('post-feed')
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            returned_ids += [post['id'] for post in response.json()['results']]
+            url = response.json()['next']
+        
+        assert returned_ids == expected_ids
+
+    def test_feed_page_preview_comments(
+        self,
+        client,
+        user2,
+        user3,
+        u2_accepted_follower,
+        test_gif
+    ):
+        posts = [
+            Post.objects.create(
+                owner=user2,
+                picture=SimpleUploadedFile(
+                    'test.gif', 
+                    test_gif, 
+                    content_type='image/gif'
+                )
+            )
+            for _ in range(settings.POSTS_PER_PAGE * 2)
+        ]
+        comments = {
+            post.id: [
+                Comment.objects.create(owner=user3, post=post, text='text')
+                for _ in range(settings.NUM_OF_PREVIEW_COMMENTS + 1)
+            ]
+            for post in posts
+        }
+
+        client.force_authenticate(u2_accepted_follower)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('post-feed'))
+
+        assert response.status_code == status.HTTP_200_OK
+
+        # preview comments are kept in the posts
+        comments_table = Comment._meta.db_table
+        assert not any(comments_table in query['sql'] for query in queries)
+
+        returned_posts = response.json()['results']
+        assert len(returned_posts) == settings.POSTS_PER_PAGE
+        for returned_post in returned_posts:
+            expected_comments = comments[returned_post['id']][
+                -settings.NUM_OF_PREVIEW_COMMENTS:
+            ]
+            assert [
+                comment['id'] for comment in returned_post['preview_comments']
+            ] == [comment.id for comment in expected_comments]
+
+    @pytest.mark.parametrize(
+        ('user', 'nlookups'),
+        (
+            (None, 0),
+            ('u2_accepted_follower_who_liked_his_posts', 1),
+        )
+    )
+    def test_liked_by_me_lookups(
+        self,
+        user,
+        nlookups,
+        client,
+        user2,
+        user2_posts,
+        u2_accepted_follower_who_liked_his_posts
+    ):
+        user = vars().get(user)
+        client.force_authenticate(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('post-list') + f'?username={user2.username}'
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sum(
+            f'"{Like._meta.db_table}"' in query['sql'] for query in queries
+        ) == nlookups
+
+        for returned_post in response.json()['results']:
+            assert returned_post['is_liked_by_me'] == (user is not None)
+
+    def test_feed_with_celebrities(
+        self,
+        client,
+        settings,
+        user1,
+        user2,
+        u2_accepted_follower,
+        u2_accepted_follower_who_liked_his_posts,
+        test_gif
+    ):
+        Subscription.objects.create(
+            follower=u2_accepted_follower,
+            follows_to=user1,
+            status=Subscription.ACCEPTED
+        )
+        posts = [
+            Post.objects.create(
+                owner=owner,
+                picture=SimpleUploadedFile(
+                    'test.gif', 
+                    test_gif, 
+                    content_type='image/gif'
+                )
+            )
+            for _ in range(settings.POSTS_PER_PAGE + 1)
+            for owner in (user1, user2)
+        ]
+        expected_ids = [
+            post.id
+            for post in sorted(
+                posts, 
+                key=lambda p: (p.date_created, p.id), 
+                reverse=True
+            )
+        ]
+
+        settings.FEED_PUSH_MAX_FOLLOWERS = 1
+        call_command('update_celebrities', stdout=StringIO())
+        user2.refresh_from_db()
+        assert user2.is_celebrity
+        assert not TimelineEntry.objects.filter(post__owner=user2).exists()
+
+        # the posts pushed concurrently with the switch
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(
+                user=u2_accepted_follower,
+                post=post,
+                post_date_created=post.date_created
+            )
+            for post in posts if post.owner_id == user2.id
+        )
+
+        client.force_authenticate(u2_accepted_follower)
+
+        pages = []
+        url = reverse('post-feed')
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            pages.append(response.json())
+            url = response.json()['next']
+        
+        assert [
+            post['id'] for page in pages for post in page['results']
+        ] == expected_ids, 'pulled posts must be merged into the timeline'
+
+        response = client.get(pages[-1]['previous'])
+        assert response.json()['results'] == pages[-2]['results']
+
+        settings.FEED_PUSH_MAX_FOLLOWERS = 10
+        call_command('update_celebrities', stdout=StringIO())
+        user2.refresh_from_db()
+        assert not user2.is_celebrity
+
+        with mock.patch(
+            'speshalgram.posts.views.PostViewSet.pagination_class',
+            None
+        ):
+            response = client.get(reverse('post-feed'))
+            assert [post['id'] for post in response.json()] == expected_ids
     
     @pytest.mark.parametrize(
         ('user',),
@@ -367,3 +611,25 @@ class TestPostViewSet:
             'only post creator can update it'
         )
         assert Post.objects.filter(owner=user2).count() == len(user2_posts) - 1
+
+    def test_query_budget(
+        self,
+        client,
+        django_assert_num_queries,
+        user2_closed,
+        user2_posts,
+        u2_accepted_follower_who_liked_his_posts
+    ):
+        post = user2_posts[0]['post']
+        urls = (
+            (reverse('post-list') + f'?username={user2_closed.username}', 4),
+            (reverse('post-feed'), 3),
+            # the subscription is cached by the list already
+            (reverse('post-detail', args=[post.id]), 2),
+        )
+
+        client.force_authenticate(u2_accepted_follower_who_liked_his_posts)
+        for url, nqueries in urls:
+            with django_assert_num_queries(nqueries):
+                response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
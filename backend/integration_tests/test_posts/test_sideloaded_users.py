@@ -0,0 +1,87 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+
+def denormalize(page):
+    """
+    returns the results of the normalized page with the cards of the users
+    put back in place of their usernames
+    """
+    users = page['users']
+    results = []
+    for item in page['results']:
+        item = {**item, 'owner': users[item['owner']]}
+        if 'preview_comments' in item:
+            item['preview_comments'] = [
+                {**comment, 'owner': users[comment['owner']]}
+                for comment in item['preview_comments']
+            ]
+        results.append(item)
+
+    return results
+
+
+@pytest.mark.django_db
+class TestSideloadedUsers:
+
+    def assert_normalized(self, client, url):
+        response = client.get(url)
+        normalized = client.get(
+            url + ('&' if '?' in url else '?') + 'shape=normalized'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert normalized.status_code == status.HTTP_200_OK
+
+        page = normalized.json()
+        assert page.keys() == {'next', 'previous', 'results', 'users'}
+        assert denormalize(page) == response.json()['results']
+
+        return page
+
+    def test_posts_list(self, client, user2, user3, user2_posts):
+        page = self.assert_normalized(
+            client,
+            reverse('post-list') + f'?username={user2.username}'
+        )
+
+        assert page['users'].keys() == {user2.username, user3.username}
+        assert {post['owner'] for post in page['results']} == {
+            user2.username
+        }
+
+    def test_feed(
+        self,
+        client,
+        user2,
+        user2_posts,
+        u2_accepted_follower_who_liked_his_posts
+    ):
+        client.force_authenticate(u2_accepted_follower_who_liked_his_posts)
+
+        page = self.assert_normalized(client, reverse('post-feed'))
+
+        assert len(page['results']) == len(user2_posts)
+
+    def test_comments_list(self, client, user3, user2_posts):
+        post = user2_posts[0]['post']
+
+        page = self.assert_normalized(
+            client,
+            reverse('comment-list') + f'?post_id={post.id}'
+        )
+
+        assert page['users'] == {
+            user3.username: client.get(
+                reverse('comment-list') + f'?post_id={post.id}'
+            ).json()['results'][0]['owner']
+        }
+
+    def test_unknown_shape(self, client, user2, user2_posts):
+        response = client.get(
+            reverse('post-list') + f'?username={user2.username}&shape=flat'
+        )
+
+        assert 'users' not in response.json()
+        assert isinstance(response.json()['results'][0]['owner'], dict)
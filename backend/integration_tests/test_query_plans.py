@@ -0,0 +1,138 @@
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from speshalgram.accounts.models import Subscription
+from speshalgram.posts.models import Comment, Like, Post
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        # the tables are tiny, so scanning and sorting them would win,
+        # disabled they are still used unless there is an index to read
+        # the rows in the required order
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_sort = off')
+        cursor.execute(f'EXPLAIN {sql}')
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+
+    @pytest.fixture
+    def seeded(self, create_user, test_gif):
+        users = [create_user() for _ in range(4)]
+        owner, follower, *others = users
+
+        for user in [follower, *others]:
+            Subscription.objects.create(
+                follower=user,
+                follows_to=owner,
+                status=Subscription.ACCEPTED
+            )
+            Subscription.objects.create(
+                follower=owner,
+                follows_to=user,
+                status=Subscription.ACCEPTED
+            )
+
+        for _ in range(settings.POSTS_PER_PAGE + 1):
+            post = Post.objects.create(
+                owner=owner,
+                picture=SimpleUploadedFile(
+                    'test.gif',
+                    test_gif,
+                    content_type='image/gif'
+                )
+            )
+            for user in users:
+                Comment.objects.create(owner=user, post=post, text='text')
+                Like.objects.create(owner=user, post=post)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        return {'owner': owner, 'follower': follower, 'post': post}
+
+    @pytest.mark.parametrize(
+        ('url_name', 'args', 'query_params', 'table', 'index'),
+        (
+            (
+                'post-list',
+                [],
+                '?username={owner.username}',
+                'posts_post',
+                'post_owner_date_idx'
+            ),
+            (
+                'post-feed',
+                [],
+                '',
+                'posts_timelineentry',
+                'timeline_entry_page_idx'
+            ),
+            (
+                'comment-list',
+                [],
+                '?post_id={post.id}',
+                'posts_comment',
+                'comment_post_date_idx'
+            ),
+            (
+                'likes',
+                [],
+                '?post_id={post.id}',
+                'posts_like',
+                'like_post_owner_idx'
+            ),
+            (
+                'user-followers',
+                ['owner'],
+                '',
+                'accounts_subscription',
+                'subscription_followers_idx'
+            ),
+            (
+                'user-follows',
+                ['owner'],
+                '',
+                'accounts_subscription',
+                'subscription_follows_idx'
+            ),
+        )
+    )
+    def test_page_is_read_by_index(
+        self,
+        url_name,
+        args,
+        query_params,
+        table,
+        index,
+        client,
+        seeded
+    ):
+        client.force_authenticate(seeded['follower'])
+
+        url = reverse(
+            url_name,
+            args=[seeded[arg].username for arg in args]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url + query_params.format(**seeded))
+        assert response.status_code == status.HTTP_200_OK
+
+        page_queries = [
+            query['sql'] for query in queries
+            if f'"{table}"' in query['sql'] and 'ORDER BY' in query['sql']
+        ]
+        assert page_queries
+
+        for sql in page_queries:
+            plan = explain(sql)
+            assert index in plan, plan
+            assert 'Sort' not in plan, plan
@@ -0,0 +1,282 @@
+import io
+from unittest import mock
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import reverse
+from PIL import Image, ImageFilter
+from rest_framework import status
+
+from speshalgram.accounts import cards
+from speshalgram.accounts.models import User
+from speshalgram.jobs import queue
+from speshalgram.jobs.models import Job
+from speshalgram.media import renditions, views
+from speshalgram.posts import comments, timeline
+from speshalgram.posts.models import Comment, Post
+
+
+@pytest.fixture
+def storage(media_root):
+    return FileSystemStorage(location=str(media_root))
+
+
+def make_image(size, image_format='JPEG', mode='RGB', **params):
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+def test_names():
+    assert renditions.get_name('1/photo.JPG', 'feed') == '1/photo.feed.jpg'
+    assert renditions.get_name('1/anim.gif', 'feed') == '1/anim.feed.png'
+    assert renditions.get_names('default_avatar.png', 'avatar') == {
+        'thumbnail': 'default_avatar.thumbnail.png',
+        'feed': 'default_avatar.feed.png',
+        'full': 'default_avatar.full.png',
+    }
+
+
+def test_render(storage):
+    name = storage.save('1/photo.jpg', ContentFile(make_image((2000, 1000))))
+
+    names = renditions.render(storage, name, 'picture')
+
+    sizes = {}
+    for rendition, rendition_name in names.items():
+        with Image.open(storage.path(rendition_name)) as image:
+            assert image.format == 'JPEG'
+            sizes[rendition] = image.size
+    assert sizes == {
+        'thumbnail': (320, 160),
+        'feed': (640, 320),
+        'full': (1080, 540),
+    }
+
+    # rendered again under the same names
+    assert renditions.render(storage, name, 'picture') == names
+    assert {
+        file for file in storage.listdir('1')[1]
+        if not file.endswith(tuple(renditions.ENCODINGS))
+    } == {path.split('/')[1] for path in [name, *names.values()]}
+
+
+def test_small_images_are_not_upscaled(storage):
+    name = storage.save(
+        '1/small.gif',
+        ContentFile(make_image((100, 50), 'GIF', 'P'))
+    )
+
+    names = renditions.render(storage, name, 'picture')
+
+    with Image.open(storage.path(names['full'])) as image:
+        assert (image.format, image.size) == ('PNG', (100, 50))
+
+
+def test_orientation_is_applied(storage):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise
+    name = storage.save(
+        '1/rotated.jpg',
+        ContentFile(make_image((400, 200), exif=exif.tobytes()))
+    )
+
+    names = renditions.render(storage, name, 'avatar')
+
+    with Image.open(storage.path(names['full'])) as image:
+        assert image.size == (200, 400)
+        assert not image.getexif()
+
+
+@pytest.mark.django_db
+def test_rendered_on_upload(media_root, user1):
+    post = Post.objects.create(
+        owner=user1,
+        picture=SimpleUploadedFile('photo.png', make_image((800, 800), 'PNG'))
+    )
+    post.refresh_from_db()
+    assert post.picture_status == Post.PROCESSING
+
+    assert queue.run(queue.claim())
+    post.refresh_from_db()
+    assert post.picture_status == Post.READY
+    for name in renditions.get_names(post.picture.name, 'picture').values():
+        assert (media_root / name).exists()
+
+    user1.description = 'text'
+    user1.save()
+    post.save()
+    assert queue.claim() is None
+
+
+@pytest.mark.django_db
+def test_upload_is_atomic(client, user1):
+    client.force_authenticate(user1)
+
+    with mock.patch.object(
+        timeline, 'push_post', side_effect=RuntimeError('crash')
+    ):
+        with pytest.raises(RuntimeError):
+            client.post(reverse('post-list'), data={
+                'picture': SimpleUploadedFile(
+                    'photo.png',
+                    make_image((80, 80), 'PNG')
+                ),
+            })
+
+    # neither the post nor its render is left
+    assert not Post.objects.exists()
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_status_is_maintained(media_root, user1):
+    post = Post.objects.create(
+        owner=user1,
+        picture=SimpleUploadedFile('photo.png', make_image((80, 80), 'PNG'))
+    )
+    stale = Post.objects.get(id=post.id)
+    assert queue.run(queue.claim())
+
+    stale.description = 'text'
+    stale.save()
+    post.refresh_from_db()
+    assert post.picture_status == Post.READY
+
+    # a new picture of the existing post is rendered again
+    post.picture = SimpleUploadedFile('new.png', make_image((90, 90), 'PNG'))
+    post.save()
+    post.refresh_from_db()
+    assert post.picture_status == Post.PROCESSING
+
+
+@pytest.mark.django_db
+def test_avatar_renditions_once_rendered(media_root, client, user1, user2):
+    post = Post.objects.create(owner=user2, picture='test.gif')
+    Comment.objects.create(post=post, owner=user1, text='text')
+
+    def get_renditions():
+        post.refresh_from_db()
+        card = cards.get_cards([User.objects.get(id=user1.id)])[user1.id]
+        owner = comments.to_representation(post.preview_comments)[0]['owner']
+        return card['avatar_renditions'], owner['avatar_renditions']
+
+    assert None not in get_renditions()
+
+    client.force_authenticate(user1)
+    avatar = SimpleUploadedFile('avatar.png', make_image((80, 80), 'PNG'))
+    response = client.patch(
+        reverse('user-me'),
+        data={'avatar': avatar},
+        format='multipart'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    user1.refresh_from_db()
+    assert user1.avatar_status == User.PROCESSING
+    # the card is cached until the render
+    assert get_renditions() == (None, None)
+
+    assert queue.run(queue.claim())
+    user1.refresh_from_db()
+    assert user1.avatar_status == User.READY
+    expected = cards.get_avatar_renditions(user1.avatar.name)
+    assert get_renditions() == (expected, expected)
+
+
+@pytest.mark.django_db
+def test_failed_rendering(settings, user1):
+    settings.JOBS_MAX_ATTEMPTS = 1
+    # the upload isn't saved for real, see conftest
+    post = Post.objects.create(
+        owner=user1,
+        picture=SimpleUploadedFile('photo.png', make_image((80, 80), 'PNG'))
+    )
+
+    assert not queue.run(queue.claim())
+    post.refresh_from_db()
+    assert post.picture_status == Post.FAILED
+
+
+def make_photo(size):
+    image = Image.effect_noise(size, 60).filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+@pytest.mark.skipif(
+    '.webp' not in renditions.get_encodings(),
+    reason='Pillow is built without WebP'
+)
+def test_smaller_encodings_are_stored(storage):
+    name = storage.save('1/photo.jpg', ContentFile(make_photo((800, 600))))
+
+    names = renditions.render(storage, name, 'picture')
+
+    for rendition_name in names.values():
+        assert storage.size(rendition_name + '.webp') < (
+            storage.size(rendition_name)
+        )
+
+    # isn't kept once it is larger
+    encode = renditions.encode
+    with mock.patch.object(
+        renditions,
+        'encode',
+        side_effect=lambda image, image_format: (
+            b'x' * 10 ** 6 if image_format == 'WEBP'
+            else encode(image, image_format)
+        )
+    ):
+        renditions.render(storage, name, 'picture')
+
+    assert not any(
+        storage.exists(rendition_name + '.webp')
+        for rendition_name in names.values()
+    )
+
+
+@pytest.mark.parametrize(('accept', 'expected'), [
+    ('image/avif,image/webp,*/*', {'image/avif', 'image/webp', '*/*'}),
+    ('image/webp;q=0, IMAGE/PNG; q=0.5', {'image/png'}),
+    ('image/webp;q=x', set()),
+    ('', {''}),
+])
+def test_accepted_types(accept, expected):
+    assert views.get_accepted_types(accept) == expected
+
+
+@pytest.mark.parametrize(('accept', 'suffix', 'content_type'), [
+    ('image/avif,image/webp,*/*', '.webp', 'image/webp'),
+    # no AVIF, the WebP is served still
+    ('image/webp,*/*', '.webp', 'image/webp'),
+    ('image/webp;q=0,*/*', '', 'image/jpeg'),
+    ('*/*', '', 'image/jpeg'),
+])
+def test_serve(media_root, accept, suffix, content_type):
+    (media_root / '1').mkdir()
+    (media_root / '1' / 'photo.feed.jpg').write_bytes(b'jpeg')
+    (media_root / '1' / 'photo.feed.jpg.webp').write_bytes(b'webp')
+
+    response = views.serve(
+        RequestFactory().get('/', HTTP_ACCEPT=accept),
+        '1/photo.feed.jpg'
+    )
+
+    assert b''.join(response.streaming_content) == (
+        b'webp' if suffix else b'jpeg'
+    )
+    assert response['Content-Type'] == content_type
+    assert response['Vary'] == 'Accept'
+
+
+def test_serve_missing(media_root):
+    with pytest.raises(Http404):
+        views.serve(
+            RequestFactory().get('/', HTTP_ACCEPT='image/webp'),
+            '1/photo.jpg'
+        )
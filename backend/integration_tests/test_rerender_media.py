@@ -0,0 +1,115 @@
+import io
+import json
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+
+from speshalgram.media import renditions
+from speshalgram.media.management.commands.rerender_media import Command
+from speshalgram.posts.models import Post
+
+
+def make_upload(name, size=(400, 300), color=(200, 100, 50)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def rendered(media_root, name, kind):
+    return all(
+        (media_root / rendition_name).exists()
+        for rendition_name in renditions.get_names(name, kind).values()
+    )
+
+
+@pytest.mark.django_db
+def test_rerender_media(media_root, tmp_path, create_user):
+    (media_root / 'default_avatar.png').write_bytes(
+        make_upload('default_avatar.png').read()
+    )
+    owner = create_user()
+    # distinct pictures, the identical uploads would share the file
+    posts = [
+        Post.objects.create(
+            owner=owner,
+            picture=make_upload('photo.png', color=(i, 100, 50))
+        )
+        for i in range(5)
+    ]
+    users = [create_user(avatar=make_upload('avatar.png')) for _ in range(2)]
+    # the file of the post is lost
+    (media_root / posts[2].picture.name).unlink()
+
+    checkpoint = tmp_path / 'checkpoint.json'
+    stdout, stderr = StringIO(), StringIO()
+    call_command(
+        'rerender_media',
+        '--workers=2',
+        '--chunk-size=2',
+        f'--checkpoint={checkpoint}',
+        stdout=stdout,
+        stderr=stderr
+    )
+
+    for post in posts:
+        post.refresh_from_db()
+    assert [post.picture_status for post in posts] == [
+        Post.READY, Post.READY, Post.PROCESSING, Post.READY, Post.READY
+    ]
+    assert all(
+        rendered(media_root, post.picture.name, 'picture')
+        for post in posts if post is not posts[2]
+    )
+    assert all(
+        rendered(media_root, user.avatar.name, 'avatar')
+        for user in [owner, *users]
+    )
+    assert posts[2].picture.name in stderr.getvalue()
+    assert 'posts.post.picture: 5/5 images' in stdout.getvalue()
+    assert '1 failed' in stdout.getvalue()
+    assert 'images/s' in stdout.getvalue()
+    assert json.loads(checkpoint.read_text()) == {
+        'posts.post.picture': posts[-1].id,
+        'accounts.user.avatar': users[-1].id,
+    }
+
+    # resumed after the checkpoint
+    stdout = StringIO()
+    call_command(
+        'rerender_media',
+        '--field=posts.post.picture',
+        f'--checkpoint={checkpoint}',
+        stdout=stdout
+    )
+    assert stdout.getvalue() == (
+        f'posts.post.picture: 0 images after id {posts[-1].id}\n'
+    )
+
+
+@pytest.mark.django_db
+def test_replaced_pictures_are_not_marked_ready(media_root, user1):
+    post = Post.objects.create(owner=user1, picture=make_upload('photo.png'))
+    get_chunks = Command.get_chunks
+
+    def replace_after_reading(self, *args):
+        for chunk in get_chunks(self, *args):
+            yield chunk
+            # replaced while the chunk is rendered
+            post.picture = make_upload('new.png', color=(0, 0, 0))
+            post.save()
+
+    with mock.patch.object(Command, 'get_chunks', replace_after_reading):
+        call_command(
+            'rerender_media',
+            '--field=posts.post.picture',
+            '--workers=1',
+            f'--checkpoint={media_root / "checkpoint.json"}',
+            stdout=StringIO()
+        )
+
+    post.refresh_from_db()
+    assert post.picture_status == Post.PROCESSING
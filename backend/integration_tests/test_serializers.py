@@ -0,0 +1,92 @@
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from speshalgram.accounts.serializers import UserSerializer
+from speshalgram.posts.models import Post
+from speshalgram.posts.serializers import CommentSerializer, PostSerializer
+from speshalgram.serializers import CompiledRepresentationMixin
+
+
+def drf_representation():
+    return mock.patch.object(
+        CompiledRepresentationMixin,
+        'to_representation',
+        serializers.Serializer.to_representation
+    )
+
+
+@pytest.mark.django_db
+class TestCompiledRepresentation:
+
+    @pytest.mark.parametrize(
+        ('url_name', 'args', 'query_params'),
+        (
+            ('post-list', [], '?username={user2.username}'),
+            ('post-feed', [], ''),
+            ('post-detail', ['{post.id}'], ''),
+            ('comment-list', [], '?post_id={post.id}'),
+            ('user-detail', ['{user2.username}'], ''),
+            ('user-detail', ['{follower.username}'], ''),
+        )
+    )
+    def test_responses_are_the_same(
+        self,
+        url_name,
+        args,
+        query_params,
+        client,
+        user2,
+        user2_posts,
+        u2_accepted_follower_who_liked_his_posts
+    ):
+        seeded = {
+            'user2': user2,
+            'post': user2_posts[0]['post'],
+            'follower': u2_accepted_follower_who_liked_his_posts,
+        }
+        url = reverse(
+            url_name,
+            args=[arg.format(**seeded) for arg in args]
+        ) + query_params.format(**seeded)
+        client.force_authenticate(u2_accepted_follower_who_liked_his_posts)
+
+        compiled = client.get(url)
+        with drf_representation():
+            drf = client.get(url)
+
+        assert compiled.status_code == drf.status_code == 200
+        assert compiled.content == drf.content
+
+    def test_omitted_and_missing_values(self, user1, user2_posts):
+        request = APIRequestFactory().get('/')
+        request.user = user1
+        post = Post.objects.select_related('owner').get(
+            id=user2_posts[0]['post'].id
+        )
+        post.description = None
+        user1.followed_by_me_status = None
+
+        # is_liked_by_me isn't set on the post, so it is omitted
+        cases = [
+            (PostSerializer, post),
+            (CommentSerializer, user2_posts[0]['comments'][0]),
+            (UserSerializer, user1),
+        ]
+        for serializer_class, instance in cases:
+            def render():
+                return JSONRenderer().render(
+                    serializer_class(
+                        [instance],
+                        many=True,
+                        context={'request': request}
+                    ).data
+                )
+
+            compiled = render()
+            with drf_representation():
+                assert compiled == render()
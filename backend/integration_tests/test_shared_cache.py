@@ -0,0 +1,117 @@
+import multiprocessing
+from unittest import mock
+
+import pytest
+
+from speshalgram import shared_cache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def _make_cache(**options):
+        return shared_cache.SharedMemoryCache(
+            str(tmp_path / 'cache'),
+            {'OPTIONS': {'SIZE': 64 * 1024, **options}}
+        )
+
+    yield _make_cache
+    shared_cache._segments.clear()
+
+
+@pytest.fixture
+def cache(make_cache):
+    return make_cache()
+
+
+def test_get_set_delete(cache):
+    assert cache.get('card') is None
+    assert cache.get('card', 'default') == 'default'
+
+    cache.set('card', {'username': 'user'})
+    assert cache.get('card') == {'username': 'user'}
+    assert cache.has_key('card')
+
+    cache.set('card', {'username': 'user' * 100})
+    assert cache.get('card') == {'username': 'user' * 100}
+
+    assert cache.delete('card')
+    assert not cache.delete('card')
+    assert cache.get('card') is None
+
+
+def test_add_and_touch(cache):
+    assert cache.add('key', 1)
+    assert not cache.add('key', 2)
+    assert cache.get('key') == 1
+
+    with mock.patch('time.time', return_value=2 ** 40):
+        assert not cache.touch('key')
+        assert cache.get('key') is None
+        assert cache.add('key', 3)
+
+    assert cache.touch('key', None)
+    with mock.patch('time.time', return_value=2 ** 41):
+        assert cache.get('key') == 3
+
+
+def test_get_many_and_clear(cache):
+    cache.set_many({'a': 1, 'b': 2})
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+
+    cache.clear()
+    assert cache.get_many(['a', 'b']) == {}
+
+
+def test_too_big_values_are_not_cached(cache):
+    cache.set('key', 'small')
+    cache.set('key', 'x' * 10000)
+    assert cache.get('key') is None
+
+
+def test_referenced_entries_survive_eviction(make_cache):
+    # the header of the file and a set of two slots
+    cache = make_cache(SIZE=4096 + 32 + 512, SLOTS=[(256, 2)])
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_set_of_dead_writer_is_cleared(cache):
+    cache.set('key', 1)
+    segment = cache.segment
+    set_offset = segment.set_offset(cache._locate('key', None)[2])
+
+    # the writer died while writing
+    segment.set_version(set_offset, segment.get_version(set_offset) + 1)
+    assert cache.get('key') is None
+    assert segment.get_version(set_offset) % 2 == 0
+
+    cache.set('key', 2)
+    assert cache.get('key') == 2
+
+
+def set_in_child(location, key, value):
+    cache = shared_cache.SharedMemoryCache(
+        location,
+        {'OPTIONS': {'SIZE': 64 * 1024}}
+    )
+    cache.set(key, value)
+
+
+def test_entries_are_shared_by_processes(tmp_path, cache):
+    location = str(tmp_path / 'cache')
+    process = multiprocessing.get_context('spawn').Process(
+        target=set_in_child,
+        args=(location, 'key', 'from child')
+    )
+    process.start()
+    process.join(30)
+
+    assert process.exitcode == 0
+    assert cache.get('key') == 'from child'
@@ -0,0 +1,154 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+
+def get(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+
+    return response, ' '.join(query['sql'] for query in queries)
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+
+    def test_posts_list_fields(self, client, user2, user2_posts):
+        client.force_authenticate(user2)
+
+        response, sql = get(
+            client,
+            reverse('post-list') + f'?username={user2.username}&fields=id,'
+            'picture'
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        results = response.json()['results']
+        assert len(results) == len(user2_posts)
+        assert all(post.keys() == {'id', 'picture'} for post in results)
+
+        # owner, the like counters, the snapshots and the likes of the user
+        assert '"posts_post"."preview_comments"' not in sql
+        assert 'posts_likecountershard' not in sql
+        assert 'posts_like"' not in sql
+        assert 'JOIN "accounts_user"' not in sql
+
+    def test_posts_list_exclude(self, client, user2, user2_posts):
+        url = reverse('post-list') + f'?username={user2.username}'
+        full = client.get(url).json()['results']
+
+        response = client.get(url + '&exclude=owner,preview_comments')
+
+        assert response.json()['results'] == [
+            {
+                name: value for name, value in post.items()
+                if name not in {'owner', 'preview_comments'}
+            }
+            for post in full
+        ]
+
+    def test_feed_fields(
+        self,
+        client,
+        user2_posts,
+        u2_accepted_follower_who_liked_his_posts
+    ):
+        client.force_authenticate(u2_accepted_follower_who_liked_his_posts)
+
+        response = client.get(reverse('post-feed') + '?fields=id,nlikes')
+
+        assert response.json()['results'] == [
+            {'id': post['post'].id, 'nlikes': len(post['likes'])}
+            for post in reversed(user2_posts)
+        ]
+
+    def test_post_detail_hides_comments(self, client, user2_posts):
+        post = user2_posts[0]['post']
+
+        response = client.get(
+            reverse('post-detail', args=[post.id]) + '?exclude=owner'
+        )
+
+        assert response.json().keys() == {
+            'id',
+            'picture',
+            'picture_status',
+            'picture_renditions',
+            'description',
+            'nlikes',
+            'is_liked_by_me',
+        }
+
+    def test_user_detail(self, client, user1, user2):
+        client.force_authenticate(user1)
+
+        response, sql = get(
+            client,
+            reverse('user-detail', args=[user2.username])
+            + '?fields=username,nfollowers'
+        )
+
+        assert response.json() == {
+            'username': user2.username,
+            'nfollowers': 0,
+        }
+        assert 'accounts_subscription' not in sql
+
+    def test_comments_list(self, client, user2_posts):
+        post = user2_posts[1]['post']
+
+        response, sql = get(
+            client,
+            reverse('comment-list') + f'?post_id={post.id}&fields=text'
+        )
+
+        assert response.json()['results'] == [{'text': 'c2'}, {'text': 'c1'}]
+        comments_sql = sql.split('FROM "posts_comment"')[1]
+        assert 'JOIN "accounts_user"' not in comments_sql
+
+    def test_likes(self, client, user2_posts):
+        post = user2_posts[1]['post']
+
+        response = client.get(
+            reverse('likes') + f'?post_id={post.id}&fields=username'
+        )
+
+        assert response.json()['results'] == [
+            {'username': like.owner.username}
+            for like in sorted(
+                user2_posts[1]['likes'],
+                key=lambda like: like.owner_id
+            )
+        ]
+
+    def test_unknown_fields(self, client, user2, user2_posts):
+        response = client.get(
+            reverse('post-list')
+            + f'?username={user2.username}&fields=id,nope&exclude=nah'
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'detail': 'unknown fields: nah, nope'}
+
+    def test_unknown_fields_of_empty_page(self, client, user1):
+        response, sql = get(
+            client,
+            reverse('post-list') + f'?username={user1.username}&fields=bogus'
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'detail': 'unknown fields: bogus'}
+        assert 'posts_post' not in sql
+
+    def test_writes_render_all_fields(self, client, user1):
+        client.force_authenticate(user1)
+
+        response = client.patch(
+            reverse('user-me') + '?fields=username',
+            data={'description': 'text'}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['description'] == 'text'
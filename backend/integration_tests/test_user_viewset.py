@@ -13,7 +13,11 @@ class AnyStr(str):
         return isinstance(other, str)
 
 
-# TODO add query count
+class AnyRenditions(dict):
+    def __eq__(self, other):
+        return other.keys() == {'thumbnail', 'feed', 'full'}
+
+
 @pytest.mark.users
 @pytest.mark.django_db
 class TestUserViewSet:
@@ -158,6 +162,7 @@ class TestUserViewSet:
             {
                 'username': f.username,
                 'avatar': AnyStr(),
+                'avatar_renditions': AnyRenditions(),
                 'first_name': f.first_name,
                 'last_name': f.last_name,
             }
@@ -252,6 +257,7 @@ class TestUserViewSet:
             {
                 'username': f.username,
                 'avatar': AnyStr(),
+                'avatar_renditions': AnyRenditions(),
                 'first_name': f.first_name,
                 'last_name': f.last_name,
             }
@@ -284,6 +290,7 @@ class TestUserViewSet:
             {
                 'username': f.username,
                 'avatar': AnyStr(),
+                'avatar_renditions': AnyRenditions(),
                 'first_name': f.first_name,
                 'last_name': f.last_name,
             }
@@ -500,3 +507,58 @@ class TestUserViewSet:
                 follows_to=who,
             ).exists()
         )
+
+    def test_subscription_counts(self, client, user1, user2_closed, user3):
+        def assert_counts(whom, nfollowers, nfollows):
+            whom.refresh_from_db()
+            assert whom.follower_count == nfollowers
+            assert whom.following_count == nfollows
+
+        client.force_authenticate(user3)
+        client.put(reverse('user-subscribe', args=[user1.username]))
+        client.put(reverse('user-subscribe', args=[user2_closed.username]))
+        assert_counts(user1, 1, 0)
+        assert_counts(user2_closed, 0, 0)
+        assert_counts(user3, 0, 1)
+
+        client.force_authenticate(user2_closed)
+        client.put(reverse('user-accept', args=[user3.username]))
+        client.put(reverse('user-accept', args=[user3.username]))
+        assert_counts(user2_closed, 1, 0)
+        assert_counts(user3, 0, 2)
+
+        client.delete(reverse('user-accept', args=[user3.username]))
+        assert_counts(user2_closed, 0, 0)
+        assert_counts(user3, 0, 1)
+
+        client.force_authenticate(user3)
+        client.delete(reverse('user-subscribe', args=[user1.username]))
+        client.delete(reverse('user-subscribe', args=[user1.username]))
+        assert_counts(user1, 0, 0)
+        assert_counts(user3, 0, 0)
+
+    def test_query_budget(
+        self,
+        client,
+        django_assert_num_queries,
+        user2_closed,
+        user3,
+        u2_accepted_follower,
+        u2_pending_follower
+    ):
+        # the users are fetched once per request,
+        # the rest are the subscription changes and their receivers
+        requests = (
+            (u2_accepted_follower, 'get', 'user-detail', user2_closed, 1),
+            (u2_accepted_follower, 'get', 'user-followers', user2_closed, 3),
+            (user3, 'put', 'user-subscribe', user2_closed, 7),
+            (user3, 'delete', 'user-subscribe', user2_closed, 5),
+            (user2_closed, 'put', 'user-accept', u2_pending_follower, 8),
+            (user2_closed, 'delete', 'user-accept', u2_pending_follower, 8),
+        )
+        for who, method, url_name, whom, nqueries in requests:
+            client.force_authenticate(who)
+            url = reverse(url_name, args=[whom.username])
+            with django_assert_num_queries(nqueries):
+                response = getattr(client, method)(url)
+            assert response.status_code == status.HTTP_200_OK
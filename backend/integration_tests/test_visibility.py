@@ -0,0 +1,71 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from speshalgram.accounts import visibility
+
+
+class TestVisibilityCache:
+
+    @pytest.fixture
+    def now(self):
+        return [0]
+
+    @pytest.fixture
+    def cache(self, now):
+        return visibility.VisibilityCache(
+            maxsize=2,
+            ttl=10,
+            timer=lambda: now[0]
+        )
+
+    def test_hits_and_misses(self, cache):
+        assert cache.get((1, 2)) is None
+        cache.set((1, 2), False)
+        assert cache.get((1, 2)) is False
+
+        assert cache.info() == visibility.CacheInfo(
+            hits=1, misses=1, maxsize=2, currsize=1
+        )
+
+    def test_ttl(self, cache, now):
+        cache.set((1, 2), True)
+        now[0] = 9
+        assert cache.get((1, 2)) is True
+        now[0] = 10
+        assert cache.get((1, 2)) is None
+
+    def test_lru_eviction(self, cache):
+        cache.set((1, 2), True)
+        cache.set((1, 3), True)
+        cache.get((1, 2))
+        cache.set((1, 4), True)
+
+        assert cache.get((1, 3)) is None
+        assert cache.get((1, 2)) is True
+        assert cache.get((1, 4)) is True
+
+    def test_invalidate(self, cache):
+        cache.set((1, 2), True)
+        cache.invalidate((1, 2))
+        assert cache.get((1, 2)) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_subscription_changes_invalidate_cache(
+    client,
+    user2_closed,
+    u2_accepted_follower
+):
+    url = reverse('post-list') + f'?username={user2_closed.username}'
+    client.force_authenticate(u2_accepted_follower)
+
+    assert client.get(url).status_code == status.HTTP_200_OK
+    assert client.get(url).status_code == status.HTTP_200_OK
+    assert visibility.cache.info().hits == 1
+
+    client.force_authenticate(user2_closed)
+    client.delete(reverse('user-accept', args=[u2_accepted_follower.username]))
+
+    client.force_authenticate(u2_accepted_follower)
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
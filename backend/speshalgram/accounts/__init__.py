@@ -0,0 +1 @@
+default_app_config = 'speshalgram.accounts.apps.AccountsConfig'
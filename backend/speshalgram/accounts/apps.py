@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class AccountsConfig(AppConfig):
-    name = 'accounts'
+    name = 'speshalgram.accounts'
+
+    def ready(self):
+        from speshalgram.accounts import signals  # noqa: F401
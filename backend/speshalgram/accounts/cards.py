@@ -0,0 +1,113 @@
+"""
+Cache of the cards of users, rendered as ShortUserSerializer renders them.
+
+The cards are kept in the shared cache of the host for CARD_CACHE_TTL
+seconds. The avatars and their renditions are cached as the urls relative
+to the host, they are made absolute with the request the card is read for.
+The renditions are null until they are rendered (see media.tasks).
+
+A change of the card fields deletes the card of the user (see signals),
+the other hosts are told by the invalidation bus.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from speshalgram.accounts.models import User
+from speshalgram.media import renditions
+from speshalgram.serializers import get_file_url
+from speshalgram.utils import build_absolute_uri
+
+CARD_FIELDS = ('username', 'first_name', 'last_name', 'avatar')
+
+# bumped whenever the cards are rendered differently
+CARD_VERSION = 3
+
+
+def get_cache():
+    return caches['shared']
+
+
+def get_key(user_id):
+    return f'card:{user_id}'
+
+
+def get_avatar_url(name):
+    """
+    returns the url of the avatar relative to the host
+    """
+    return get_file_url(User._meta.get_field('avatar').storage, name)
+
+
+def get_avatar_renditions(name):
+    """
+    returns rendition -> url of the avatar relative to the host
+    """
+    return renditions.get_urls(
+        User._meta.get_field('avatar').storage,
+        name,
+        'avatar'
+    )
+
+
+def render_avatar(card, name, status=User.READY):
+    """
+    sets the urls of the avatar of the name to the card
+    """
+    if name:
+        card['avatar'] = get_avatar_url(name)
+        card['avatar_renditions'] = (
+            get_avatar_renditions(name) if status == User.READY else None
+        )
+    else:
+        card['avatar'] = card['avatar_renditions'] = None
+
+    return card
+
+
+def render(user):
+    card = {field: getattr(user, field) for field in CARD_FIELDS}
+    return render_avatar(card, user.avatar.name, user.avatar_status)
+
+
+def get_cards(users):
+    """
+    returns user id -> card of the users with one multi-get,
+    the missing cards are rendered and cached
+    """
+    keys = {user.id: get_key(user.id) for user in users}
+    cached = get_cache().get_many(keys.values(), version=CARD_VERSION)
+
+    cards = {}
+    missing = {}
+    for user in users:
+        card = cached.get(keys[user.id])
+        if card is None:
+            card = missing[keys[user.id]] = render(user)
+        cards[user.id] = card
+
+    if missing:
+        get_cache().set_many(
+            missing,
+            timeout=settings.CARD_CACHE_TTL,
+            version=CARD_VERSION
+        )
+
+    return cards
+
+
+def to_representation(card, request=None):
+    if card['avatar'] is None or request is None:
+        return card
+
+    return {
+        **card,
+        'avatar': build_absolute_uri(request, card['avatar']),
+        'avatar_renditions': renditions.to_representation(
+            card['avatar_renditions'],
+            request
+        ),
+    }
+
+
+def invalidate(user_id):
+    get_cache().delete(get_key(user_id), version=CARD_VERSION)
@@ -0,0 +1,309 @@
+"""
+In-process index of the follow graph.
+
+Every accepted and pending subscription is kept as two edges: the follower
+id in the sorted ids of the followers of the followed user and the other
+way around. The ids are machine integers in flat arrays, so an edge takes
+about 8 bytes and the lookups are binary searches.
+
+The index is optional (FOLLOW_GRAPH_INDEX), it is loaded at worker start
+(see wsgi) and updated by the Subscription receivers once the changes are
+committed. Changes made by the other processes are seen through
+the invalidation bus (INVALIDATION_BUS), the index isn't loaded without it:
+the permissions would answer from the stale graph of the worker for good.
+"""
+import bisect
+import sys
+import threading
+from array import array
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from speshalgram.accounts.models import Subscription
+
+# user ids are 32 bit integers (AutoField), offsets might be 64 bit
+ID_TYPECODE = 'i'
+OFFSET_TYPECODE = 'q'
+
+STATUSES = (Subscription.ACCEPTED, Subscription.PENDING)
+
+
+def zeros(typecode, length):
+    return array(typecode, bytes(array(typecode).itemsize * length))
+
+
+class Adjacency:
+    """
+    user id -> sorted ids of the adjacent users
+
+    The ids of all the users are kept in one array in the order of
+    the user ids, offsets[user_id]:offsets[user_id + 1] is the slice of
+    the user (compressed sparse rows). The users changed since the build
+    get their own arrays.
+    """
+
+    def __init__(self, offsets=None, ids=None):
+        self.offsets = offsets if offsets is not None else array(
+            OFFSET_TYPECODE, [0]
+        )
+        self.ids = ids if ids is not None else array(ID_TYPECODE)
+        self.changed = {}
+
+    @classmethod
+    def build(cls, keys, values):
+        """
+        builds the adjacency of (keys[i], values[i]) edges,
+        values of every key must be sorted
+        """
+        size = max(keys) + 2 if keys else 1
+
+        offsets = zeros(OFFSET_TYPECODE, size)
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(1, size):
+            offsets[i] += offsets[i - 1]
+
+        # stable counting sort keeps the values of every key sorted
+        ids = zeros(ID_TYPECODE, len(values))
+        positions = array(OFFSET_TYPECODE, offsets)
+        for key, value in zip(keys, values):
+            ids[positions[key]] = value
+            positions[key] += 1
+
+        return cls(offsets, ids)
+
+    def _bounds(self, user_id):
+        if 0 <= user_id < len(self.offsets) - 1:
+            return self.offsets[user_id], self.offsets[user_id + 1]
+
+        return 0, 0
+
+    def __len__(self):
+        return len(self.ids) + sum(
+            len(ids) - self._base_count(user_id)
+            for user_id, ids in self.changed.items()
+        )
+
+    def _base_count(self, user_id):
+        lo, hi = self._bounds(user_id)
+        return hi - lo
+
+    def get(self, user_id):
+        if user_id in self.changed:
+            return self.changed[user_id]
+
+        lo, hi = self._bounds(user_id)
+        return self.ids[lo:hi]
+
+    def contains(self, user_id, other_id):
+        if user_id in self.changed:
+            ids = self.changed[user_id]
+            lo, hi = 0, len(ids)
+        else:
+            ids = self.ids
+            lo, hi = self._bounds(user_id)
+
+        i = bisect.bisect_left(ids, other_id, lo, hi)
+        return i < hi and ids[i] == other_id
+
+    def count(self, user_id):
+        if user_id in self.changed:
+            return len(self.changed[user_id])
+
+        return self._base_count(user_id)
+
+    def _changed_ids(self, user_id):
+        if user_id not in self.changed:
+            self.changed[user_id] = self.get(user_id)
+
+        return self.changed[user_id]
+
+    def add(self, user_id, other_id):
+        ids = self._changed_ids(user_id)
+
+        i = bisect.bisect_left(ids, other_id)
+        if i == len(ids) or ids[i] != other_id:
+            ids.insert(i, other_id)
+
+    def remove(self, user_id, other_id):
+        ids = self._changed_ids(user_id)
+
+        i = bisect.bisect_left(ids, other_id)
+        if i < len(ids) and ids[i] == other_id:
+            del ids[i]
+
+    def nbytes(self):
+        return (
+            sys.getsizeof(self.offsets)
+            + sys.getsizeof(self.ids)
+            + sys.getsizeof(self.changed)
+            + sum(
+                sys.getsizeof(user_id) + sys.getsizeof(ids)
+                for user_id, ids in self.changed.items()
+            )
+        )
+
+
+class FollowGraph:
+    """
+    accepted and pending subscriptions by the follower and by the followed
+    """
+
+    def __init__(self, followers=None, follows=None):
+        self.followers = followers or {
+            status: Adjacency() for status in STATUSES
+        }
+        self.follows = follows or {status: Adjacency() for status in STATUSES}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        builds the graph from (followed id, follower id, status) edges
+        sorted by (followed id, follower id)
+        """
+        followed_ids = {status: array(ID_TYPECODE) for status in STATUSES}
+        follower_ids = {status: array(ID_TYPECODE) for status in STATUSES}
+        for follows_to_id, follower_id, status in edges:
+            if status in STATUSES:
+                followed_ids[status].append(follows_to_id)
+                follower_ids[status].append(follower_id)
+
+        # the followed ids of every follower are in ascending order too
+        return cls(
+            followers={
+                status: Adjacency.build(
+                    followed_ids[status], 
+                    follower_ids[status]
+                )
+                for status in STATUSES
+            },
+            follows={
+                status: Adjacency.build(
+                    follower_ids[status], 
+                    followed_ids[status]
+                )
+                for status in STATUSES
+            }
+        )
+
+    @classmethod
+    def load(cls, chunk_size=10000):
+        """
+        builds the graph from the db
+        """
+        edges = (
+            Subscription.objects
+            .filter(status__in=STATUSES)
+            .order_by('follows_to_id', 'follower_id')
+            .values_list('follows_to_id', 'follower_id', 'status')
+            .iterator(chunk_size=chunk_size)
+        )
+        return cls.from_edges(edges)
+
+    def is_following(
+        self,
+        follower_id,
+        followed_id,
+        status=Subscription.ACCEPTED
+    ):
+        return self.follows[status].contains(follower_id, followed_id)
+
+    def get_followers(self, user_id, status=Subscription.ACCEPTED):
+        return self.followers[status].get(user_id)
+
+    def get_follows(self, user_id, status=Subscription.ACCEPTED):
+        return self.follows[status].get(user_id)
+
+    def follower_count(self, user_id, status=Subscription.ACCEPTED):
+        return self.followers[status].count(user_id)
+
+    def following_count(self, user_id, status=Subscription.ACCEPTED):
+        return self.follows[status].count(user_id)
+
+    def add(self, follower_id, followed_id, status):
+        if status not in STATUSES:
+            return
+
+        with self.lock:
+            self.followers[status].add(followed_id, follower_id)
+            self.follows[status].add(follower_id, followed_id)
+
+    def remove(self, follower_id, followed_id, status):
+        if status not in STATUSES:
+            return
+
+        with self.lock:
+            self.followers[status].remove(followed_id, follower_id)
+            self.follows[status].remove(follower_id, followed_id)
+
+    def nedges(self):
+        return sum(len(self.follows[status]) for status in STATUSES)
+
+    def nbytes(self):
+        """
+        memory taken by the graph
+        """
+        return sum(
+            adjacency.nbytes()
+            for adjacencies in (self.followers, self.follows)
+            for adjacency in adjacencies.values()
+        )
+
+
+_graph = None
+# changes committed while the graph is being loaded,
+# replayed over it once it is loaded
+_pending_changes = None
+_lock = threading.Lock()
+
+
+def get_graph():
+    """
+    returns the loaded graph or None
+    """
+    return _graph
+
+
+def check_settings():
+    """
+    raises ImproperlyConfigured if the index wouldn't see the changes
+    of the other workers
+    """
+    if settings.FOLLOW_GRAPH_INDEX and not settings.INVALIDATION_BUS:
+        raise ImproperlyConfigured(
+            'FOLLOW_GRAPH_INDEX requires INVALIDATION_BUS'
+        )
+
+
+def load():
+    """
+    loads the graph (again) from the db
+    """
+    global _graph, _pending_changes
+
+    with _lock:
+        _pending_changes = []
+
+    graph = FollowGraph.load()
+
+    with _lock:
+        for change in _pending_changes:
+            change(graph)
+        _graph = graph
+        _pending_changes = None
+
+    return graph
+
+
+def apply_change(change):
+    """
+    applies change(graph) to the loaded graph
+    and keeps it for the graph being loaded
+    """
+    with _lock:
+        if _graph is not None:
+            change(_graph)
+        if _pending_changes is not None:
+            _pending_changes.append(change)
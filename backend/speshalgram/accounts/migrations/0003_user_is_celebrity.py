@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20201212_1819'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_celebrity',
+            field=models.BooleanField(default=False),
+        ),
+    ]
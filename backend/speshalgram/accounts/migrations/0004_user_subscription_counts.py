@@ -0,0 +1,40 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_is_celebrity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql='''
+            UPDATE accounts_user u
+            SET
+                follower_count = (
+                    SELECT count(*)
+                    FROM accounts_subscription s
+                    WHERE s.follows_to_id = u.id AND s.status = 'a'
+                ),
+                following_count = (
+                    SELECT count(*)
+                    FROM accounts_subscription s
+                    WHERE s.follower_id = u.id AND s.status = 'a'
+                )
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_subscription_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['follows_to', 'status', 'follower'], name='subscription_followers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['follower', 'status', 'follows_to'], name='subscription_follows_idx'),
+        ),
+    ]
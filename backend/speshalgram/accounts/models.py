@@ -1,8 +1,10 @@
 from pathlib import Path
-from uuid import uuid4
 
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Subquery
+
+from speshalgram.utils import MaintainedFieldsMixin
 
 
 class Subscription(models.Model):
@@ -28,6 +30,10 @@ class Subscription(models.Model):
     )
     date_updated = models.DateTimeField(auto_now=True)
 
+    # status currently stored in the db, None for unsaved subscriptions.
+    # Lets post_save receivers detect status transitions
+    stored_status = None
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -35,6 +41,27 @@ class Subscription(models.Model):
                 name='unique_subscription'
             ),
         ]
+        indexes = [
+            # followers and follows pages, ordered by the user id
+            models.Index(
+                fields=['follows_to', 'status', 'follower'],
+                name='subscription_followers_idx'
+            ),
+            models.Index(
+                fields=['follower', 'status', 'follows_to'],
+                name='subscription_follows_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.stored_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.stored_status = self.status
 
     def __str__(self) -> str:
         follower = self.follower.username
@@ -44,10 +71,19 @@ class Subscription(models.Model):
 
 
 class CustomUserQuerySet(models.QuerySet):
+    def user_id(self, username):
+        """
+        id of the user as a subquery, unlike a join it is compared 
+        as a constant, so the pages are read in the order of indexes
+        """
+        return Subquery(
+            self.model.objects.filter(username=username).values('id')
+        )
+
     def filter_followers_of(self, user, status=Subscription.ACCEPTED):
         filters = {}
         if isinstance(user, str):
-            filters['sub_follows_to__follows_to__username'] = user
+            filters['sub_follows_to__follows_to'] = self.user_id(user)
         else:
             filters['sub_follows_to__follows_to'] = user
         
@@ -59,7 +95,7 @@ class CustomUserQuerySet(models.QuerySet):
     def filter_follows_of(self, user, status=Subscription.ACCEPTED):
         filters = {}
         if isinstance(user, str):
-            filters['sub_followers__follower__username'] = user
+            filters['sub_followers__follower'] = self.user_id(user)
         else:
             filters['sub_followers__follower'] = user
         
@@ -74,11 +110,23 @@ class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
 
 
 def avatar_path(user, filename):
-    extension = filename.split('.')[-1]
-    return str(Path(str(user.id), f'{uuid4()}.{extension}'))
-
+    # the file is named by the hash of its content
+    # (see speshalgram.media.storage)
+    return str(Path('avatars', filename))
+
+
+class User(MaintainedFieldsMixin, AbstractUser):
+    # renditions of the avatar are rendered by the job queue,
+    # see media.tasks
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    AVATAR_STATUSES = (
+        (PROCESSING, 'processing'),
+        (READY, 'ready'),
+        (FAILED, 'failed'),
+    )
 
-class User(AbstractUser):
     description = models.CharField(
         max_length=200, 
         null=True, 
@@ -88,6 +136,21 @@ class User(AbstractUser):
         upload_to=avatar_path, 
         default='default_avatar.png'
     )
+    # maintained by the renders of the job queue, see media.tasks
+    avatar_status = models.CharField(
+        max_length=10,
+        choices=AVATAR_STATUSES,
+        default=READY
+    )
     is_opened = models.BooleanField(default=True)
+    # posts of celebrities aren't pushed to the timelines of their followers,
+    # the feed pulls them at read time instead
+    is_celebrity = models.BooleanField(default=False)
+    # numbers of accepted subscriptions maintained along with them,
+    # see signals
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    maintained_fields = ('follower_count', 'following_count', 'avatar_status')
 
     objects = CustomUserManager()
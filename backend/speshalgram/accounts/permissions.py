@@ -1,8 +1,17 @@
-from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import BasePermission
 
-from speshalgram.accounts.models import Subscription, User
+from speshalgram.accounts import graph, visibility
+from speshalgram.accounts.models import User
+from speshalgram.utils import get_identity_map
+
+
+def is_accepted_follower(who, whom):
+    follow_graph = graph.get_graph()
+    if follow_graph is not None:
+        return follow_graph.is_following(who.id, whom.id)
+
+    return visibility.is_accepted_follower(who.id, whom.id)
 
 
 def can_view_profile(who, whom):
@@ -12,18 +21,14 @@ def can_view_profile(who, whom):
     return (
         whom.is_opened or 
         who.id == whom.id or
-        Subscription.objects.filter(
-            follower=who,
-            follows_to=whom,
-            status=Subscription.ACCEPTED
-        ).exists()
+        is_accepted_follower(who, whom)
     )
 
 
 class IsOpenOrSubcribedByMe(BasePermission):
     def has_permission(self, request, view):
-        requested_user = get_object_or_404(
-            User, 
+        requested_user = get_identity_map(request).get_or_404(
+            User.objects.all(), 
             username=view.kwargs['username']
         )
         return can_view_profile(
@@ -1,10 +1,17 @@
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.validators import ASCIIUsernameValidator
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
 from rest_framework import serializers
 from rest_framework.settings import api_settings
 
+from speshalgram.accounts import cards
 from speshalgram.accounts.models import Subscription, User
+from speshalgram.serializers import (
+    CompiledRepresentationMixin,
+    SparseFieldsetMixin,
+    get_fieldset,
+)
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -42,15 +49,85 @@ class CreateUserSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
+class CardsListSerializer(serializers.ListSerializer):
+    """
+    fetches the cards of the users of the page with one multi-get,
+    child.get_card_user(item) returns the user of the item or None
+    if the user isn't rendered
+    """
+
+    def to_representation(self, data):
+        items = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        users = [
+            user for user in map(self.child.get_card_user, items)
+            if user is not None
+        ]
+
+        self.context.setdefault('user_cards', {}).update(
+            cards.get_cards(users)
+        )
+        return super().to_representation(items)
+
+
 class ShortUserSerializer(serializers.ModelSerializer):
+    """
+    renders the cached cards (see accounts.cards), the sideloaded users
+    (see SideloadedUsersMixin) are rendered by username, the top level
+    cards are cut to the fieldset of the view
+    """
+
+    avatar_renditions = serializers.DictField(
+        child=serializers.URLField(),
+        read_only=True
+    )
+
     class Meta:
         model = User
-        fields = ['username', 'first_name', 'last_name', 'avatar']
+        fields = [*cards.CARD_FIELDS, 'avatar_renditions']
+        list_serializer_class = CardsListSerializer
+
+    def get_card_user(self, item):
+        return item
+
+    def to_representation(self, instance):
+        sideloaded_users = self.context.get('sideloaded_users')
+        if sideloaded_users is not None:
+            if instance.username not in sideloaded_users:
+                sideloaded_users[instance.username] = self.get_card(instance)
+            return instance.username
+
+        card = self.get_card(instance)
+
+        fieldset = get_fieldset(self)
+        if fieldset is not None:
+            card = {name: card[name] for name in fieldset.filter(card)}
+
+        return card
+
+    def get_card(self, instance):
+        user_cards = self.context.get('user_cards', {})
+        card = user_cards.get(instance.id)
+        if card is None:
+            card = cards.get_cards([instance])[instance.id]
+
+        return cards.to_representation(card, self.context.get('request'))
 
 
-class UserSerializer(serializers.ModelSerializer):
-    nfollowers = serializers.IntegerField(required=False, read_only=True)
-    nfollows = serializers.IntegerField(required=False, read_only=True)
+class UserSerializer(
+    SparseFieldsetMixin,
+    CompiledRepresentationMixin,
+    serializers.ModelSerializer
+):
+    nfollowers = serializers.IntegerField(
+        source='follower_count', 
+        read_only=True
+    )
+    nfollows = serializers.IntegerField(
+        source='following_count', 
+        read_only=True
+    )
     followed_by_me_status = serializers.SerializerMethodField()
 
     class Meta:
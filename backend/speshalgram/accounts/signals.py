@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from speshalgram import bus
+from speshalgram.accounts import cards, graph, visibility
+from speshalgram.accounts.models import Subscription, User
+
+
+def change_subscription_counts(subscription, delta):
+    User.objects.filter(id=subscription.follows_to_id).update(
+        follower_count=F('follower_count') + delta
+    )
+    User.objects.filter(id=subscription.follower_id).update(
+        following_count=F('following_count') + delta
+    )
+
+    # keep the users at hand up to date
+    if Subscription.follows_to.is_cached(subscription):
+        subscription.follows_to.follower_count += delta
+    if Subscription.follower.is_cached(subscription):
+        subscription.follower.following_count += delta
+
+
+def apply_subscription_change(
+    follower_id,
+    follows_to_id,
+    old_status,
+    new_status
+):
+    """
+    updates the caches of the process with the committed change,
+    the status is None for a deleted subscription
+    """
+    visibility.invalidate(follower_id, follows_to_id)
+
+    def change(follow_graph):
+        follow_graph.remove(follower_id, follows_to_id, old_status)
+        follow_graph.add(follower_id, follows_to_id, new_status)
+
+    graph.apply_change(change)
+
+
+def reload_graph():
+    if graph.get_graph() is not None:
+        graph.load()
+
+
+bus.subscribe('subscription', apply_subscription_change)
+bus.subscribe_reset(visibility.cache.clear)
+bus.subscribe_reset(reload_graph)
+
+
+def publish_subscription_change(subscription, old_status, new_status):
+    change = {
+        'follower_id': subscription.follower_id,
+        'follows_to_id': subscription.follows_to_id,
+        'old_status': old_status,
+        'new_status': new_status,
+    }
+    # the entry might be cached again before the change is committed
+    visibility.invalidate(change['follower_id'], change['follows_to_id'])
+    transaction.on_commit(lambda: apply_subscription_change(**change))
+    bus.publish('subscription', **change)
+
+
+@receiver(post_save, sender=Subscription)
+def publish_status_change(sender, instance, **kwargs):
+    if instance.stored_status != instance.status:
+        publish_subscription_change(
+            instance,
+            instance.stored_status,
+            instance.status
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def publish_subscription_delete(sender, instance, **kwargs):
+    publish_subscription_change(instance, instance.status, None)
+
+
+@receiver([post_save, post_delete], sender=User)
+def publish_user_change(sender, instance, **kwargs):
+    bus.publish('user', id=instance.id)
+
+
+def invalidate_card(user_id):
+    cards.invalidate(user_id)
+    # the card might be cached again before the change is committed
+    transaction.on_commit(lambda: cards.invalidate(user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_card_on_save(sender, instance, created, **kwargs):
+    update_fields = kwargs['update_fields']
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(cards.CARD_FIELDS)
+    ):
+        return
+
+    invalidate_card(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_card_on_delete(sender, instance, **kwargs):
+    invalidate_card(instance.id)
+
+
+bus.subscribe('user', lambda id: cards.invalidate(id))
+
+
+@receiver(post_save, sender=Subscription)
+def count_subscription_on_status_change(sender, instance, **kwargs):
+    was_accepted = instance.stored_status == Subscription.ACCEPTED
+    is_accepted = instance.status == Subscription.ACCEPTED
+
+    if is_accepted and not was_accepted:
+        change_subscription_counts(instance, 1)
+    elif was_accepted and not is_accepted:
+        change_subscription_counts(instance, -1)
+
+
+@receiver(post_delete, sender=Subscription)
+def uncount_subscription_on_delete(sender, instance, **kwargs):
+    if instance.status == Subscription.ACCEPTED:
+        change_subscription_counts(instance, -1)
@@ -1,6 +1,6 @@
 from django.conf import settings
+from django.db import transaction
 from django.db.models import OuterRef, Q
-from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ParseError
@@ -20,7 +20,7 @@ from speshalgram.accounts.serializers import (
     ShortUserSerializer,
     UserSerializer,
 )
-from speshalgram.utils import SubqueryCount
+from speshalgram.utils import SparseFieldsetViewMixin, get_identity_map
 
 
 class UserCursorPagination(CursorPagination):
@@ -28,7 +28,11 @@ class UserCursorPagination(CursorPagination):
     ordering = 'id'
 
 
-class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
+class UserViewSet(
+    SparseFieldsetViewMixin,
+    CreateModelMixin,
+    ReadOnlyModelViewSet
+):
     lookup_field = 'username'
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -38,15 +42,9 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
         queryset = super().get_queryset()
 
         if self.action in {
-            'retrieve', 'subscribe', 'cancel_subscribtion', 'accept', 'reject'
-        }:
+            'retrieve', 'subscribe', 'cancel_subscribtion'
+        } and self.is_requested('followed_by_me_status'):
             queryset = queryset.annotate(
-                nfollowers=SubqueryCount(
-                    User.objects.filter_followers_of(OuterRef('id'))
-                ),
-                nfollows=SubqueryCount(
-                    User.objects.filter_follows_of(OuterRef('id'))
-                ),
                 followed_by_me_status=(
                     Subscription.objects.filter(
                         follower_id=self.request.user.id,
@@ -88,6 +86,16 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
             )
 
         return queryset
+
+    def get_object(self):
+        # the user might be fetched by the permissions already
+        obj = get_identity_map(self.request).get_or_404(
+            self.filter_queryset(self.get_queryset()),
+            **{self.lookup_field: self.kwargs[self.lookup_field]}
+        )
+        self.check_object_permissions(self.request, obj)
+
+        return obj
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -145,7 +153,9 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    # the user is committed along with the render of the uploaded avatar
     @me.mapping.patch
+    @transaction.atomic
     def patch_me(self, request, **kwargs):
         user_was_opened = request.user.is_opened
 
@@ -165,13 +175,29 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
 
         return Response(serializer.data)
     
+    @transaction.atomic
+    def delete_subscription(self, follower, follows_to):
+        # locked first, so the subscription deleted concurrently
+        # isn't deleted (and uncounted) once again
+        subscription = (
+            Subscription.objects
+            .select_for_update()
+            .filter(follower=follower, follows_to=follows_to)
+            .first()
+        )
+        if subscription is not None:
+            # the receivers update the counts of the users at hand
+            subscription.follower = follower
+            subscription.follows_to = follows_to
+            subscription.delete()
+
     @action(
         detail=True,
         methods=['PUT'],
         permission_classes=[ObjectIsNotMe]
     )
     def subscribe(self, request, **kwargs):
-        whom = get_object_or_404(User, username=self.kwargs['username'])
+        whom = self.get_object()
         
         new_subscription_status = (
             Subscription.ACCEPTED 
@@ -179,34 +205,39 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
             else Subscription.PENDING
         )
 
-        subscription, created = (
-            Subscription.objects.get_or_create(
-                follower=request.user,
-                follows_to=whom,
-                defaults={'status': new_subscription_status}
+        # the subscriptions are locked while their status is changed,
+        # so the receivers see every transition once (see signals)
+        with transaction.atomic():
+            subscription, created = (
+                Subscription.objects
+                .select_for_update()
+                .get_or_create(
+                    follower=request.user,
+                    follows_to=whom,
+                    defaults={'status': new_subscription_status}
+                )
             )
-        )
 
-        if not created and subscription.status == Subscription.REJECTED:
-            subscription.status = new_subscription_status
-            subscription.save(update_fields=['status'])
+            if not created and subscription.status == Subscription.REJECTED:
+                # the receivers update the counts of the users at hand
+                subscription.follower = request.user
+                subscription.follows_to = whom
+                subscription.status = new_subscription_status
+                subscription.save(update_fields=['status'])
         
-        updated_whom = self.get_object()
-        serializer = self.get_serializer(updated_whom)
+        whom.followed_by_me_status = subscription.status
+        serializer = self.get_serializer(whom)
 
         return Response(serializer.data)
 
     @subscribe.mapping.delete
     def cancel_subscribtion(self, request, **kwargs):
-        whom = get_object_or_404(User, username=self.kwargs['username'])
+        whom = self.get_object()
 
-        Subscription.objects.filter(
-            follower=request.user, 
-            follows_to=whom
-        ).delete()
+        self.delete_subscription(follower=request.user, follows_to=whom)
 
-        updated_whom = self.get_object()
-        serializer = self.get_serializer(updated_whom)
+        whom.followed_by_me_status = None
+        serializer = self.get_serializer(whom)
 
         return Response(serializer.data)
 
@@ -216,35 +247,39 @@ class UserViewSet(CreateModelMixin, ReadOnlyModelViewSet):
         permission_classes=[ObjectIsNotMe]
     )
     def accept(self, request, **kwargs):
-        whom = get_object_or_404(User, username=self.kwargs['username'])
+        whom = self.get_object()
 
-        accepted = (
-            Subscription.objects
-            .filter(
-                (
-                    Q(status=Subscription.ACCEPTED) | 
-                    Q(status=Subscription.PENDING)
-                ),
-                follower=whom, 
-                follows_to=request.user,
+        with transaction.atomic():
+            subscription = (
+                Subscription.objects
+                .select_for_update()
+                .filter(
+                    (
+                        Q(status=Subscription.ACCEPTED) | 
+                        Q(status=Subscription.PENDING)
+                    ),
+                    follower=whom, 
+                    follows_to=request.user,
+                )
+                .first()
             )
-            .update(status=Subscription.ACCEPTED)
-        )
 
-        if not accepted:
-            raise NotFound({
-                'detail': 'This user didn\'t send you subscription request'
-            })
+            if subscription is None:
+                raise NotFound({
+                    'detail': 'This user didn\'t send you subscription request'
+                })
+
+            # save() instead of update() to let receivers see the transition
+            if subscription.status != Subscription.ACCEPTED:
+                subscription.status = Subscription.ACCEPTED
+                subscription.save(update_fields=['status'])
 
         return Response(status=status.HTTP_200_OK)
 
     @accept.mapping.delete
     def reject(self, request, **kwargs):
-        whom = get_object_or_404(User, username=self.kwargs['username'])
+        whom = self.get_object()
 
-        Subscription.objects.filter(
-            follower=whom, 
-            follows_to=request.user
-        ).delete()
+        self.delete_subscription(follower=whom, follows_to=request.user)
 
         return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,105 @@
+"""
+Cache of the accepted subscriptions checked by can_view_profile.
+
+Profiles of closed users are visible to their accepted followers only, so
+almost every read of their content checks the subscription. The answers
+are kept per process for VISIBILITY_CACHE_TTL seconds, the least recently
+used ones are evicted beyond VISIBILITY_CACHE_SIZE entries.
+
+Only the subscription is cached, the rest of the decision (is the profile
+opened, is it the viewer himself) is made with the users at hand. Every
+change of a subscription invalidates its entry (see signals), the other
+processes are told by the invalidation bus and the TTL bounds staleness
+of their entries when it's off.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from speshalgram.accounts.models import Subscription
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class VisibilityCache:
+    """
+    LRU cache of (follower id, followed id) -> is subscription accepted,
+    the entries expire after ttl seconds
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        returns the cached value or None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or entry[1] <= self.timer():
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, self.timer() + self.ttl)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.maxsize,
+                len(self.entries)
+            )
+
+
+cache = VisibilityCache(
+    settings.VISIBILITY_CACHE_SIZE,
+    settings.VISIBILITY_CACHE_TTL
+)
+
+
+def is_accepted_follower(follower_id, followed_id):
+    key = (follower_id, followed_id)
+
+    accepted = cache.get(key)
+    if accepted is None:
+        accepted = Subscription.objects.filter(
+            follower_id=follower_id,
+            follows_to_id=followed_id,
+            status=Subscription.ACCEPTED
+        ).exists()
+        cache.set(key, accepted)
+
+    return accepted
+
+
+def invalidate(follower_id, followed_id):
+    cache.invalidate((follower_id, followed_id))
@@ -0,0 +1,171 @@
+"""
+Invalidation bus of the per-process caches.
+
+Every worker keeps caches of its own (see accounts.visibility and
+accounts.graph), the changes made by the other workers reach them through
+Postgres NOTIFY. A message is sent in the transaction of the change, so it is
+delivered once the change is committed and dropped if it is rolled back.
+
+Workers started with INVALIDATION_BUS listen in a thread with a connection
+of their own (see wsgi) and pass the messages to the handlers subscribed to
+their topics. The messages of the worker itself are skipped, it updates its
+caches on commit. Notifications sent while the listener is disconnected
+are lost, so the reset handlers are called after reconnecting.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from collections import defaultdict
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+CHANNEL = 'speshalgram_invalidation'
+
+logger = logging.getLogger(__name__)
+
+# pids repeat on different hosts, the token is inherited by forked workers
+_token = uuid.uuid4().hex[:8]
+
+_handlers = defaultdict(list)
+_reset_handlers = []
+
+
+def get_origin():
+    """
+    returns the id of the current process in the messages
+    """
+    return f'{_token}:{os.getpid()}'
+
+
+def subscribe(topic, handler):
+    """
+    handler(**data) is called with the data of the messages of the topic
+    published by the other processes
+    """
+    _handlers[topic].append(handler)
+
+
+def subscribe_reset(handler):
+    """
+    handler() is called when the messages might have been lost
+    """
+    _reset_handlers.append(handler)
+
+
+def publish(topic, **data):
+    """
+    sends the message once the current transaction is committed
+    """
+    if not settings.INVALIDATION_BUS:
+        return
+
+    payload = json.dumps(
+        {'o': get_origin(), 't': topic, 'd': data},
+        separators=(',', ':')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+def dispatch(payload, origin=None):
+    """
+    calls the handlers of the message unless it was sent by the origin
+    """
+    message = json.loads(payload)
+    if message['o'] == origin:
+        return
+
+    for handler in _handlers.get(message['t'], ()):
+        try:
+            handler(**message['d'])
+        except Exception:
+            logger.exception('invalidation handler %r failed', handler)
+
+
+def reset():
+    for handler in _reset_handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception('reset handler %r failed', handler)
+
+
+class Listener(threading.Thread):
+    """
+    receives the messages of the other processes and dispatches them
+    """
+
+    def __init__(self, origin=None, timeout=5, retry_delay=1):
+        super().__init__(name='invalidation-bus', daemon=True)
+        self.origin = origin or get_origin()
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.listening = threading.Event()
+        self.stopped = threading.Event()
+
+    def connect(self):
+        params = connections['default'].get_connection_params()
+        listen_connection = psycopg2.connect(**params)
+        listen_connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with listen_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+
+        return listen_connection
+
+    def listen(self, listen_connection):
+        while not self.stopped.is_set():
+            readable, _, _ = select.select(
+                [listen_connection], [], [], self.timeout
+            )
+            if not readable:
+                continue
+
+            listen_connection.poll()
+            while listen_connection.notifies:
+                notify = listen_connection.notifies.pop(0)
+                dispatch(notify.payload, self.origin)
+
+    def run(self):
+        connected_before = False
+
+        while not self.stopped.is_set():
+            try:
+                listen_connection = self.connect()
+            except psycopg2.Error:
+                logger.exception('invalidation bus failed to connect')
+                self.stopped.wait(self.retry_delay)
+                continue
+
+            try:
+                if connected_before:
+                    reset()
+                connected_before = True
+
+                self.listening.set()
+                self.listen(listen_connection)
+            except (psycopg2.Error, OSError):
+                logger.exception('invalidation bus lost the connection')
+                self.stopped.wait(self.retry_delay)
+            finally:
+                self.listening.clear()
+                listen_connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_listener(timeout=10):
+    """
+    starts listening in a thread,
+    waits up to timeout seconds until it listens
+    """
+    listener = Listener()
+    listener.start()
+    listener.listening.wait(timeout)
+    return listener
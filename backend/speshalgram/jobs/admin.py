@@ -0,0 +1,22 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from speshalgram.jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_by', 'last_error', 'date_created')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        queryset.filter(status=Job.DEAD).update(
+            status=Job.PENDING,
+            attempts=0,
+            run_at=timezone.now()
+        )
+    retry.short_description = 'Retry the dead jobs'
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,59 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from speshalgram.jobs import queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the jobs of the queue as they are due. '
+        'Stops after the current job on SIGTERM or SIGINT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--task',
+            action='append',
+            dest='tasks',
+            help='runs the jobs of the task only, can be repeated'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='seconds to wait for new jobs once the queue is empty'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='exits once the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+
+        while not self.stopping:
+            close_old_connections()
+
+            job = queue.claim(options['tasks'])
+            if job is not None:
+                succeeded = queue.run(job)
+                self.stdout.write(
+                    f'job {job.id} {job.name} '
+                    f'{"done" if succeeded else "failed"} '
+                    f'in attempt {job.attempts}'
+                )
+                continue
+
+            if options['burst']:
+                break
+            time.sleep(options['poll_interval'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
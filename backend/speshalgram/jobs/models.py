@@ -0,0 +1,44 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    # failed max_attempts times, kept for inspection and retried by hand
+    DEAD = 'dead'
+    STATUSES = (
+        (PENDING, 'pending'),
+        (RUNNING, 'running'),
+        (DEAD, 'dead'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    # pending jobs are claimed once it has come,
+    # the running ones are claimed again once it has passed (see queue)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # the queue, dead jobs aren't claimed
+            models.Index(
+                fields=['run_at', 'id'],
+                name='job_queue_idx',
+                condition=~Q(status='dead')
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'job {self.id} {self.name} ({self.status})'
@@ -0,0 +1,180 @@
+"""
+Job queue in Postgres.
+
+A job is enqueued in the transaction of the change it belongs to, so it is
+run only once the change is committed. Workers (see the run_jobs command)
+claim the due jobs with SELECT ... FOR UPDATE SKIP LOCKED, concurrent
+workers skip the rows locked by each other instead of waiting for them.
+A claimed job is leased to the worker for JOBS_LEASE_TIMEOUT seconds: it
+is marked running with run_at set to the end of the lease and claimed again
+after that if the worker died meanwhile.
+
+A succeeded job is deleted. A failed one is retried with an exponential
+backoff, after max_attempts attempts it is left dead and its task's on_dead
+handler is called. So is a job whose last attempt ran out of its lease, the
+worker might have been killed by the job itself.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from speshalgram.jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+# name -> (func, on_dead)
+_tasks = {}
+
+
+def task(name, on_dead=None):
+    """
+    registers the decorated function as the task of the name,
+    the function is called with the payload of the job as keywords,
+    on_dead too once the job is dead
+    """
+    def register(func):
+        _tasks[name] = (func, on_dead)
+        return func
+
+    return register
+
+
+def enqueue(name, /, delay=0, max_attempts=None, **payload):
+    """
+    adds the job of the task to the queue, the payload is its keywords
+    """
+    assert name in _tasks, f'unknown task {name}'
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS
+    )
+
+
+def get_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def get_backoff(attempts):
+    """
+    returns seconds to wait before the next attempt
+    """
+    return min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_BACKOFF_MAX
+    )
+
+
+@transaction.atomic
+def claim(names=None):
+    """
+    returns the due job leased to the worker or None
+    """
+    now = timezone.now()
+    jobs = Job.objects.filter(~Q(status=Job.DEAD), run_at__lte=now)
+    if names is not None:
+        jobs = jobs.filter(name__in=names)
+
+    while True:
+        job = (
+            jobs
+            .select_for_update(skip_locked=True)
+            .order_by('run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status != Job.RUNNING or job.attempts < job.max_attempts:
+            break
+
+        job.status = Job.DEAD
+        job.locked_by = ''
+        job.last_error = f'the lease of attempt {job.attempts} ran out'
+        job.save(update_fields=['status', 'locked_by', 'last_error'])
+        bury(job, job.last_error)
+
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.run_at = now + timedelta(seconds=settings.JOBS_LEASE_TIMEOUT)
+    job.locked_by = get_worker_name()
+    job.save(update_fields=['status', 'attempts', 'run_at', 'locked_by'])
+
+    return job
+
+
+def get_lease(job):
+    """
+    returns the job as long as it is leased to the claim of the job,
+    the lease might have run out and the job claimed again meanwhile
+    """
+    return Job.objects.filter(
+        id=job.id,
+        status=Job.RUNNING,
+        attempts=job.attempts,
+        locked_by=job.locked_by
+    )
+
+
+def fail(job, error):
+    if job.attempts >= job.max_attempts:
+        status, run_at = Job.DEAD, job.run_at
+    else:
+        status = Job.PENDING
+        run_at = timezone.now() + timedelta(
+            seconds=get_backoff(job.attempts)
+        )
+
+    if not get_lease(job).update(
+        status=status,
+        run_at=run_at,
+        locked_by='',
+        last_error=error
+    ):
+        return
+
+    if status == Job.DEAD:
+        bury(job, error)
+
+
+def bury(job, error):
+    """
+    calls the on_dead handler of the dead job, its failures are logged only
+    """
+    logger.error('%s is dead: %s', job, error)
+    on_dead = _tasks.get(job.name, (None, None))[1]
+    if on_dead is None:
+        return
+
+    try:
+        on_dead(**job.payload)
+    except Exception:
+        logger.exception('on_dead of %s failed', job)
+
+
+def run(job):
+    """
+    runs the claimed job, returns if it succeeded
+    """
+    if job.name not in _tasks:
+        fail(job, f'unknown task {job.name}')
+        return False
+
+    func, _ = _tasks[job.name]
+    try:
+        func(**job.payload)
+    except Exception:
+        logger.exception('%s failed', job)
+        fail(job, traceback.format_exc())
+        return False
+
+    get_lease(job).delete()
+    return True
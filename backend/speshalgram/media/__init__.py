@@ -0,0 +1 @@
+default_app_config = 'speshalgram.media.apps.MediaConfig'
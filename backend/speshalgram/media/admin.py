@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from speshalgram.media.models import Blob
+
+
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refcount', 'size', 'date_created')
+    # the references are counted by the storage and the models
+    readonly_fields = ('name', 'refcount', 'size', 'date_created')
+
+
+admin.site.register(Blob, BlobAdmin)
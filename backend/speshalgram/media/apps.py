@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class MediaConfig(AppConfig):
+    name = 'speshalgram.media'
+
+    def ready(self):
+        from speshalgram.media import signals  # noqa: F401
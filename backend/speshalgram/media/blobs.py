@@ -0,0 +1,91 @@
+"""
+Reference counts of the files of ContentAddressedStorage.
+
+The references are taken by the storage when the files are saved and are
+released by the models (see signals). A blob without references is collected
+by the job queue: its file and the files derived from it are deleted with
+the row locked, a concurrent upload of the same content waits for the lock
+and writes the file again.
+"""
+from pathlib import PurePosixPath
+
+from django.db import connection, transaction
+
+from speshalgram.jobs import queue
+from speshalgram.media.models import Blob
+
+
+def acquire(name, size):
+    """
+    takes a reference to the blob, the row stays locked until the end
+    of the transaction
+    """
+    blobs_table = Blob._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {blobs_table} (name, refcount, size, date_created)
+            VALUES (%s, 1, %s, now())
+            ON CONFLICT (name) DO UPDATE
+            SET refcount = {blobs_table}.refcount + 1
+            ''',
+            [name, size]
+        )
+
+
+def release(name):
+    """
+    releases a reference to the blob, the files of other storages and
+    the ones stored before the blobs are ignored
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            UPDATE {Blob._meta.db_table}
+            SET refcount = refcount - 1
+            WHERE name = %s
+            RETURNING refcount
+            ''',
+            [name]
+        )
+        row = cursor.fetchone()
+
+    if row is not None and row[0] <= 0:
+        queue.enqueue('media.collect', name=name)
+
+
+def get_derived_names(storage, name):
+    """
+    returns the names of the files named after the blob (see renditions)
+    """
+    path = PurePosixPath(name)
+    try:
+        _, files = storage.listdir(str(path.parent))
+    except FileNotFoundError:
+        return []
+
+    return [
+        str(path.parent / file) for file in files
+        if file != path.name and file.startswith(f'{path.stem}.')
+    ]
+
+
+@transaction.atomic
+def collect(storage, name):
+    """
+    deletes the blob and its files unless it is referenced again
+    """
+    blob = (
+        Blob.objects
+        .select_for_update()
+        .filter(name=name, refcount__lte=0)
+        .first()
+    )
+    if blob is None:
+        return
+
+    for derived_name in get_derived_names(storage, name):
+        storage.delete(derived_name)
+    storage.delete(name)
+    blob.delete()
@@ -0,0 +1,232 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from speshalgram.media import renditions, tasks
+from speshalgram.media.signals import IMAGE_FIELDS
+
+
+def get_cpu_count():
+    # the cores the process may run on, containers might get fewer
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def render(model, field_name, name):
+    """
+    renders the renditions in a worker process,
+    returns the error or None
+    """
+    field = apps.get_model(model)._meta.get_field(field_name)
+    try:
+        renditions.render(field.storage, name, field_name)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+    return None
+
+
+class Checkpoint:
+    """
+    the last ids of the rows of the fields rendered along with all the
+    previous ones, kept in a json file
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.last_ids = {}
+        if self.path.exists():
+            self.last_ids = json.loads(self.path.read_text())
+
+    def get(self, key):
+        return self.last_ids.get(key, 0)
+
+    def set(self, key, last_id):
+        self.last_ids[key] = last_id
+
+        # replaced at once, so an interrupted write doesn't lose it
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        temp_path.write_text(json.dumps(self.last_ids))
+        os.replace(temp_path, self.path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the renditions of all the post pictures and avatars again, '
+        'e.g. after MEDIA_RENDITIONS or the encodings are changed. '
+        'Resumes from the checkpoint of the interrupted run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--field',
+            action='append',
+            dest='fields',
+            choices=[
+                f'{model._meta.label_lower}.{field_name}'
+                for model, field_names in IMAGE_FIELDS.items()
+                for field_name in field_names
+            ],
+            help='renders the images of the field only, can be repeated'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=get_cpu_count(),
+            help='number of the processes rendering the images'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='number of the rows read at once'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='rerender_media.checkpoint.json',
+            help='file the progress is kept in'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='ignores the checkpoint and renders everything again'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+
+        if options['restart']:
+            Path(options['checkpoint']).unlink(missing_ok=True)
+        checkpoint = Checkpoint(options['checkpoint'])
+
+        # forked, the workers get the settings of the command,
+        # they don't touch the database
+        with ProcessPoolExecutor(
+            options['workers'],
+            mp_context=multiprocessing.get_context('fork')
+        ) as executor:
+            for model, field_names in IMAGE_FIELDS.items():
+                for field_name in field_names:
+                    key = f'{model._meta.label_lower}.{field_name}'
+                    if options['fields'] and key not in options['fields']:
+                        continue
+
+                    self.render_field(
+                        executor,
+                        checkpoint,
+                        model,
+                        field_name,
+                        options
+                    )
+
+    def get_chunks(self, model, field_name, last_id, chunk_size):
+        """
+        yields the (id, name) chunks of the rows after last_id,
+        a chunk is read by the index of the primary key
+        """
+        while True:
+            chunk = list(
+                model.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', field_name)[:chunk_size]
+            )
+            if not chunk:
+                return
+
+            yield chunk
+            last_id = chunk[-1][0]
+
+    def render_field(self, executor, checkpoint, model, field_name, options):
+        key = f'{model._meta.label_lower}.{field_name}'
+        last_id = checkpoint.get(key)
+        total = model.objects.filter(id__gt=last_id).count()
+        self.stdout.write(f'{key}: {total} images after id {last_id}')
+
+        # the images shared by the rows (the default avatar) are rendered
+        # once a run, the rest are rendered once a chunk
+        field_default = model._meta.get_field(field_name).get_default()
+        rendered_defaults = set()
+
+        # the next chunks are submitted while the previous ones are
+        # rendered, so the workers aren't idle between the chunks
+        pending = []
+        done = failed = 0
+        start = time.perf_counter()
+
+        def finish_chunk():
+            nonlocal done, failed
+            chunk_last_id, chunk_size, ids_by_name, futures = pending.pop(0)
+
+            # the pictures replaced meanwhile aren't rendered yet
+            rendered = Q(pk__in=[])
+            for name, future in futures.items():
+                error = future.result()
+                if error is None:
+                    rendered |= Q(
+                        id__in=ids_by_name[name],
+                        **{field_name: name}
+                    )
+                else:
+                    failed += len(ids_by_name[name])
+                    self.stderr.write(f'{key} {name}: {error}')
+            done += chunk_size
+
+            # the images uploaded meanwhile are ready before their jobs,
+            # they are few, so they are set one by one along with the cards
+            # of the avatars (see tasks.set_status)
+            not_ready = model.objects.filter(rendered).exclude(
+                **{tasks.get_status_field(field_name): model.READY}
+            )
+            for pk, name in not_ready.values_list('pk', field_name):
+                tasks.set_status(
+                    model._meta.label_lower, pk, field_name, name, model.READY
+                )
+
+            checkpoint.set(key, chunk_last_id)
+
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{key}: {done}/{total} images, '
+                f'{done / elapsed:.1f} images/s, {failed} failed, '
+                f'last id {chunk_last_id}'
+            )
+
+        for chunk in self.get_chunks(
+            model, field_name, last_id, options['chunk_size']
+        ):
+            ids_by_name = {}
+            for row_id, name in chunk:
+                if name:
+                    ids_by_name.setdefault(name, []).append(row_id)
+
+            futures = {}
+            for name in ids_by_name:
+                if name == field_default:
+                    if name in rendered_defaults:
+                        continue
+                    rendered_defaults.add(name)
+
+                futures[name] = executor.submit(
+                    render,
+                    model._meta.label_lower,
+                    field_name,
+                    name
+                )
+            pending.append((chunk[-1][0], len(chunk), ids_by_name, futures))
+
+            while len(pending) > 1:
+                finish_chunk()
+
+        while pending:
+            finish_chunk()
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('refcount', models.IntegerField()),
+                ('size', models.PositiveIntegerField()),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """
+    file of ContentAddressedStorage, stored once for all of its references
+    """
+    # the name in the storage, sha256 of the content (see storage)
+    name = models.CharField(max_length=100, primary_key=True)
+    # the image fields referring to the file, the file is collected
+    # once it drops to 0 (see blobs)
+    refcount = models.IntegerField()
+    size = models.PositiveIntegerField()
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.refcount} references)'
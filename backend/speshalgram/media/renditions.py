@@ -0,0 +1,218 @@
+"""
+Sized renditions of the uploaded pictures and avatars.
+
+Every image is rendered in the widths of MEDIA_RENDITIONS[kind] by the job
+queue once it is uploaded (see tasks), smaller images aren't upscaled. The
+renditions are stored next to the original under names derived from its
+name, so their urls are known without looking anything up and they are
+shared by the identical uploads (see storage). JPEGs are rendered as JPEGs,
+the other images as PNGs. The metadata isn't copied, the orientation of
+the photo is applied to the pixels.
+
+Every rendition is also encoded as AVIF and WebP where Pillow can encode
+them (AVIF with pillow-avif-plugin installed), the encodings are stored
+under the name of the rendition with the suffix appended. An encoding is
+stored only if it is smaller than the ones after it in ENCODINGS and the
+rendition itself, so the first one the client accepts is the smallest
+(see views and the nginx config).
+"""
+import io
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from speshalgram.serializers import get_file_url
+from speshalgram.utils import build_absolute_uri
+
+try:
+    # registers AVIF with Pillow
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+}
+
+DEFAULT_SUFFIX = '.png'
+
+# suffix -> (format, media type) of the encodings in the order they are
+# served in
+ENCODINGS = {
+    '.avif': ('AVIF', 'image/avif'),
+    '.webp': ('WEBP', 'image/webp'),
+}
+
+
+def get_name(name, rendition):
+    """
+    returns the name of the rendition of the image
+    """
+    path = PurePosixPath(name)
+    suffix = path.suffix.lower()
+    if suffix not in FORMATS:
+        suffix = DEFAULT_SUFFIX
+
+    return str(path.with_name(f'{path.stem}.{rendition}{suffix}'))
+
+
+def get_names(name, kind):
+    """
+    returns rendition -> name of the renditions of the image
+    """
+    return {
+        rendition: get_name(name, rendition)
+        for rendition in settings.MEDIA_RENDITIONS[kind]
+    }
+
+
+def exist(storage, name, kind):
+    """
+    returns if the renditions of the image are stored
+    """
+    return all(
+        storage.exists(rendition_name)
+        for rendition_name in get_names(name, kind).values()
+    )
+
+
+def get_encodings():
+    """
+    returns the suffixes of the encodings Pillow can encode
+    """
+    Image.init()
+    return [
+        suffix for suffix, (image_format, _) in ENCODINGS.items()
+        if image_format in Image.SAVE
+    ]
+
+
+def open_image(storage, name, width):
+    """
+    returns the decoded image turned as it is shot, JPEGs are decoded
+    at the smallest scale still wider than width
+    """
+    with storage.open(name) as file:
+        image = Image.open(file)
+        if image.format == 'JPEG':
+            image.draft('RGB', (width, width))
+        image.load()
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in {'RGB', 'RGBA', 'L'}:
+        has_alpha = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    return image
+
+
+def resize(image, width):
+    if image.width <= width:
+        return image
+
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer,
+            'JPEG',
+            quality=settings.MEDIA_JPEG_QUALITY,
+            optimize=True,
+            progressive=True
+        )
+    elif image_format == 'WEBP':
+        image.convert('RGBA' if image.mode == 'RGBA' else 'RGB').save(
+            buffer,
+            'WEBP',
+            quality=settings.MEDIA_WEBP_QUALITY,
+            method=6
+        )
+    elif image_format == 'AVIF':
+        image.convert('RGBA' if image.mode == 'RGBA' else 'RGB').save(
+            buffer,
+            'AVIF',
+            quality=settings.MEDIA_AVIF_QUALITY
+        )
+    else:
+        image.save(buffer, image_format, optimize=True)
+
+    return buffer.getvalue()
+
+
+def save(storage, name, content):
+    if hasattr(storage, 'save_derived'):
+        storage.save_derived(name, ContentFile(content))
+        return
+
+    # saved under the same name, storages rename the taken ones
+    storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def render_encodings(storage, name, image, size):
+    """
+    stores the encodings of the rendition smaller than the ones served
+    after them, size is the size of the rendition
+    """
+    for suffix in reversed(get_encodings()):
+        content = encode(image, ENCODINGS[suffix][0])
+        if len(content) < size:
+            save(storage, name + suffix, content)
+            size = len(content)
+        else:
+            storage.delete(name + suffix)
+
+
+def render(storage, name, kind):
+    """
+    renders the renditions of the image, the existing ones are replaced,
+    returns rendition -> name
+    """
+    widths = settings.MEDIA_RENDITIONS[kind]
+    names = get_names(name, kind)
+
+    # the widest rendition first, the narrower ones are resized from it
+    image = open_image(storage, name, max(widths.values()))
+    for rendition, width in sorted(
+        widths.items(), key=lambda item: item[1], reverse=True
+    ):
+        image = resize(image, width)
+        content = encode(
+            image,
+            FORMATS[PurePosixPath(names[rendition]).suffix]
+        )
+        save(storage, names[rendition], content)
+        render_encodings(storage, names[rendition], image, len(content))
+
+    return names
+
+
+def get_urls(storage, name, kind):
+    """
+    returns rendition -> url of the rendition relative to the host
+    """
+    return {
+        rendition: get_file_url(storage, rendition_name)
+        for rendition, rendition_name in get_names(name, kind).items()
+    }
+
+
+def to_representation(urls, request=None):
+    """
+    returns the urls of get_urls made absolute by the request
+    """
+    if request is None:
+        return urls
+
+    return {
+        rendition: build_absolute_uri(request, url)
+        for rendition, url in urls.items()
+    }
@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from speshalgram.accounts.models import User
+from speshalgram.media import blobs, tasks
+from speshalgram.posts.models import Post
+
+# model -> its image fields, the names of the fields are the kinds
+# of the renditions (see MEDIA_RENDITIONS), every field has the status
+# of its renditions next to it (see tasks.get_status_field)
+IMAGE_FIELDS = {
+    Post: ('picture',),
+    User: ('avatar',),
+}
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=User)
+def find_uploaded_images(sender, instance, update_fields=None, **kwargs):
+    # the uploaded files are saved to the storage by save() itself
+    instance._uploaded_images = [
+        field_name for field_name in IMAGE_FIELDS[sender]
+        if (update_fields is None or field_name in update_fields)
+        and getattr(instance, field_name)
+        and not getattr(instance, field_name)._committed
+    ]
+
+    statuses = {
+        tasks.get_status_field(field_name): sender.PROCESSING
+        for field_name in instance._uploaded_images
+    }
+    for status_field, status in statuses.items():
+        setattr(instance, status_field, status)
+    # the status is maintained, full saves of the existing rows don't write
+    # it, it is written ahead of the receivers of post_save rendering
+    # the card of the user with it (the upload is saved in a transaction,
+    # see storage)
+    if statuses and instance.pk is not None:
+        sender.objects.filter(pk=instance.pk).update(**statuses)
+
+    # the references to the replaced images are released once they are
+    # replaced in the database
+    instance._replaced_images = []
+    if instance._uploaded_images and instance.pk is not None:
+        replaced = (
+            sender.objects
+            .filter(pk=instance.pk)
+            .values_list(*instance._uploaded_images)
+            .first()
+        )
+        instance._replaced_images = [name for name in replaced or () if name]
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=User)
+def render_uploaded_images(sender, instance, created, **kwargs):
+    # enqueued in the transaction of the upload
+    for field_name in instance.__dict__.pop('_uploaded_images', ()):
+        tasks.enqueue(instance, field_name)
+    for name in instance.__dict__.pop('_replaced_images', ()):
+        blobs.release(name)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=User)
+def release_images(sender, instance, **kwargs):
+    for field_name in IMAGE_FIELDS[sender]:
+        if getattr(instance, field_name):
+            blobs.release(getattr(instance, field_name).name)
@@ -0,0 +1,98 @@
+"""
+Storage naming the files by the sha256 of their content.
+
+Identical uploads are stored once: the name of a file is
+<directory of upload_to>/ab/cd/<sha256>.<extension>, so its url never
+changes its content and is cached as immutable (see nginx.conf.template).
+Every save takes a reference to the Blob of the file, the models release it
+once they are deleted or their image is replaced (see blobs and signals).
+The reference is taken in the transaction saving the model, so it is
+rolled back along with the model (see the upload views).
+
+The files derived from a blob (renditions) are named after it and are saved
+as is with save_derived.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from speshalgram.media import blobs
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # the name is replaced by the hash of the content in _save
+        return name
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        path = PurePosixPath(name)
+        return str(
+            path.parent / digest[:2] / digest[2:4]
+            / f'{digest}{path.suffix.lower()}'
+        )
+
+    def _save(self, name, content):
+        if not transaction.get_connection().in_atomic_block:
+            raise transaction.TransactionManagementError(
+                'the files are saved in the transaction of their model only'
+            )
+
+        name = self.get_hashed_name(name, content)
+
+        # the blob is locked until the transaction ends, so it isn't
+        # collected meanwhile and the same content is written once
+        blobs.acquire(name, content.size)
+        if not self.exists(name):
+            self.write(name, content)
+
+        return name
+
+    def save_derived(self, name, content):
+        """
+        saves the file under the name, replacing the existing one
+        """
+        name = self.generate_filename(name)
+        self.write(name, content)
+        return name
+
+    def write(self, name, content):
+        """
+        writes the file to a temporary one and moves it in place, so the file
+        is never read half written and the concurrent writes don't fail
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory,
+                    self.directory_permissions_mode,
+                    exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
@@ -0,0 +1,70 @@
+"""
+Renditions of the uploaded images rendered by the job queue, so the
+uploads don't wait for them. The posts and the users are in the processing
+status of their images until they are rendered, the renditions aren't
+served meanwhile. The images uploaded before are rendered once.
+
+The blobs without references are collected by the queue too (see blobs).
+"""
+import functools
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from speshalgram import bus
+from speshalgram.accounts import cards
+from speshalgram.accounts.models import User
+from speshalgram.jobs import queue
+from speshalgram.media import blobs, renditions
+from speshalgram.posts import comments
+from speshalgram.posts.models import Post
+
+
+def get_status_field(field_name):
+    return f'{field_name}_status'
+
+
+def set_status(model, pk, field_name, name, status):
+    """
+    sets the status of the image unless it is replaced,
+    the statuses of the models have the same values
+    """
+    model = apps.get_model(model)
+    updated = model.objects.filter(pk=pk, **{field_name: name}).update(
+        **{get_status_field(field_name): status}
+    )
+
+    # the cards and the snapshots of the comments are rendered
+    # with the status of the avatar
+    if updated and model is User:
+        cards.invalidate(pk)
+        transaction.on_commit(lambda: cards.invalidate(pk))
+        bus.publish('user', id=pk)
+        comments.refresh_of_owner(pk)
+
+
+@queue.task(
+    'media.render',
+    on_dead=functools.partial(set_status, status=Post.FAILED)
+)
+def render(model, pk, field_name, name):
+    field = apps.get_model(model)._meta.get_field(field_name)
+    if not renditions.exist(field.storage, name, field_name):
+        renditions.render(field.storage, name, field_name)
+    set_status(model, pk, field_name, name, Post.READY)
+
+
+@queue.task('media.collect')
+def collect(name):
+    blobs.collect(default_storage, name)
+
+
+def enqueue(instance, field_name):
+    queue.enqueue(
+        'media.render',
+        model=instance._meta.label_lower,
+        pk=instance.pk,
+        field_name=field_name,
+        name=getattr(instance, field_name).name
+    )
@@ -0,0 +1,69 @@
+"""
+Media files served in the encoding the client accepts, for the development
+server. nginx serves them the same way in production (see its config).
+
+A rendition is served as the first of its encodings (see
+renditions.ENCODINGS) listed by the Accept header of the request, that is
+the smallest one stored. Clients accepting only */* or image/* get the
+rendition itself.
+"""
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views import static
+
+from speshalgram.media import renditions
+
+
+def get_accepted_types(accept):
+    """
+    returns the media types of the Accept header except the ones with q=0
+    """
+    accepted_types = set()
+    for media_range in accept.split(','):
+        media_type, *params = media_range.split(';')
+
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if quality > 0:
+            accepted_types.add(media_type.strip().lower())
+
+    return accepted_types
+
+
+def exists(path):
+    try:
+        return Path(safe_join(settings.MEDIA_ROOT, path)).is_file()
+    except SuspiciousFileOperation:
+        return False
+
+
+def serve(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    accepted_types = get_accepted_types(request.headers.get('Accept', ''))
+
+    content_type = None
+    for suffix, (_, media_type) in renditions.ENCODINGS.items():
+        if media_type in accepted_types and exists(path + suffix):
+            path += suffix
+            content_type = media_type
+            break
+
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    # mimetypes of the older Pythons don't know AVIF
+    if content_type is not None and response.status_code == 200:
+        response['Content-Type'] = content_type
+    patch_vary_headers(response, ['Accept'])
+
+    return response
@@ -0,0 +1,40 @@
+"""
+JSON parser on orjson, the data and the errors are the same as DRF's
+JSONParser gives.
+
+orjson parses UTF-8 only and rejects NaN and Infinity as the strict parser
+does, the rest is parsed by DRF: without orjson, for the other encodings,
+when the JSON isn't strict and when orjson fails, so the errors are DRF's.
+"""
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+
+from speshalgram.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if (
+            orjson is None
+            or not self.strict
+            or codecs.lookup(encoding).name != 'utf-8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(content),
+                media_type,
+                parser_context
+            )
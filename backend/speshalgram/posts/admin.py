@@ -27,6 +27,7 @@ class CommentForm(forms.ModelForm):
 class PostAdmin(admin.ModelAdmin):
     form = PostForm
     search_fields = ('owner__username',)
+    readonly_fields = ('like_count', 'like_shards', 'preview_comments')
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('owner')
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class PostsConfig(AppConfig):
-    name = 'posts'
+    name = 'speshalgram.posts'
+
+    def ready(self):
+        from speshalgram.posts import signals  # noqa: F401
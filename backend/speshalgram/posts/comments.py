@@ -0,0 +1,156 @@
+"""
+Snapshots of the preview comments of posts.
+
+Every post keeps its last NUM_OF_PREVIEW_COMMENTS comments with the cards of
+their owners in post.preview_comments, so serializing a page of posts doesn't
+read the comments at all. The snapshot is rebuilt with the post row locked
+whenever a comment is added, a comment from the snapshot is removed or
+the owner of a comment from the snapshot changes his card.
+
+Avatars are stored as the names of the files with their statuses, they are
+turned into urls at read time (see to_representation).
+"""
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from speshalgram.accounts import cards
+from speshalgram.accounts.cards import CARD_FIELDS
+from speshalgram.accounts.models import User
+from speshalgram.posts.models import Comment, Post
+
+
+def get_card(user):
+    card = {'id': user.id, 'avatar_status': user.avatar_status}
+    card.update(
+        (field, str(getattr(user, field))) for field in CARD_FIELDS
+    )
+    return card
+
+
+def build_snapshot(post_id):
+    comments = (
+        Comment.objects
+        .filter_latest_of_posts([post_id], settings.NUM_OF_PREVIEW_COMMENTS)
+        .select_related('owner')
+        .order_by('date_created', 'id')
+    )
+    return [
+        {
+            'id': comment.id,
+            'owner': get_card(comment.owner),
+            'text': comment.text,
+        }
+        for comment in comments
+    ]
+
+
+@transaction.atomic
+def refresh(post_id, removed_comment_id=None):
+    """
+    rebuilds the snapshot of the post,
+    if removed_comment_id is given only when the comment is in the snapshot
+    """
+    # the lock serializes the rebuilds of the post, the snapshot is built
+    # by the next statement, so it sees the comments of the previous ones.
+    # The check of the foreign key of an inserted comment takes FOR KEY SHARE
+    # on the post, FOR UPDATE would conflict with it and deadlock
+    # the concurrent comments (select_for_update has no no_key in Django 3.1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT preview_comments
+            FROM {Post._meta.db_table}
+            WHERE id = %s
+            FOR NO KEY UPDATE
+            ''',
+            [post_id]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return
+
+    snapshot = json.loads(row[0])
+
+    if removed_comment_id is not None and all(
+        comment['id'] != removed_comment_id for comment in snapshot
+    ):
+        return
+
+    Post.objects.filter(id=post_id).update(
+        preview_comments=build_snapshot(post_id)
+    )
+
+
+def get_posts_of_owner(user_id):
+    """
+    returns the posts with the comments of the user in the snapshot
+    """
+    return Post.objects.filter(
+        id__in=Comment.objects.filter(owner_id=user_id).values('post_id'),
+        preview_comments__contains=[{'owner': {'id': user_id}}]
+    )
+
+
+def refresh_of_owner(user_id):
+    """
+    rebuilds the snapshots with the card of the user
+    """
+    for post_id in get_posts_of_owner(user_id).values_list('id', flat=True):
+        refresh(post_id)
+
+
+@transaction.atomic
+def remove_of_owner(user_id):
+    """
+    deletes the comments of the user at once and rebuilds each snapshot
+    they were in, the posts of the user are deleted along with it
+    """
+    post_ids = list(
+        get_posts_of_owner(user_id)
+        .exclude(owner_id=user_id)
+        .values_list('id', flat=True)
+    )
+    Comment.objects.filter(owner_id=user_id).delete()
+    for post_id in post_ids:
+        refresh(post_id)
+
+
+def to_representation(snapshot, request=None, sideloaded_users=None):
+    """
+    returns the snapshot as CommentSerializer returns the comments,
+    the owners are put to sideloaded_users by username if it is given
+    """
+    comments = []
+    for comment in snapshot:
+        username = comment['owner']['username']
+        if sideloaded_users is not None and username in sideloaded_users:
+            comments.append({
+                'id': comment['id'],
+                'owner': username,
+                'text': comment['text'],
+            })
+            continue
+
+        card = cards.to_representation(
+            cards.render_avatar(
+                {field: comment['owner'][field] for field in CARD_FIELDS},
+                comment['owner']['avatar'],
+                # the snapshots taken before the avatars had statuses
+                comment['owner'].get('avatar_status', User.READY)
+            ),
+            request
+        )
+
+        if sideloaded_users is not None:
+            sideloaded_users[username] = card
+            card = username
+
+        comments.append({
+            'id': comment['id'],
+            'owner': card,
+            'text': comment['text'],
+        })
+
+    return comments
@@ -0,0 +1,178 @@
+"""
+Like counters of posts.
+
+Likes of ordinary posts are counted right in post.like_count. Every like of
+a viral post would wait for the lock of the same post row, so likes of posts
+liked more often than LIKE_SHARDING_RATE times a minute are spread among
+post.like_shards LikeCounterShard rows. The shard is picked by the user id,
+so the like and the unlike of a user hit the same row.
+
+The shards are periodically rolled up into post.like_count and the number
+of shards is tuned by the tune_like_counters command.
+"""
+from math import ceil
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from speshalgram.posts.models import Like, LikeCounterShard, Post
+
+
+def change_like_count(post_id, user_id, delta):
+    """
+    adds delta to the like counter of the post
+    """
+    updated = (
+        Post.objects
+        .filter(id=post_id, like_shards=1)
+        .update(like_count=F('like_count') + delta)
+    )
+    if updated:
+        return
+
+    shards_table = LikeCounterShard._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {shards_table} (post_id, shard, count)
+            SELECT id, %s %% like_shards, %s
+            FROM {Post._meta.db_table}
+            WHERE id = %s
+            ON CONFLICT (post_id, shard) DO UPDATE
+            SET count = {shards_table}.count + EXCLUDED.count
+            ''',
+            [user_id, delta, post_id]
+        )
+
+
+def uncount_likes_of(user_id):
+    """
+    subtracts the likes of the user from the counters of the liked posts,
+    the likes themselves are deleted by the cascade of the user. Posts of
+    the user are deleted along with it and are skipped
+    """
+    likes_table = Like._meta.db_table
+    posts_table = Post._meta.db_table
+    shards_table = LikeCounterShard._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH liked AS (
+                SELECT p.id, p.like_shards
+                FROM {likes_table} l
+                JOIN {posts_table} p ON p.id = l.post_id
+                WHERE l.owner_id = %(user_id)s
+                    AND p.owner_id != %(user_id)s
+            ), counted AS (
+                UPDATE {posts_table} p
+                SET like_count = p.like_count - 1
+                FROM liked
+                WHERE p.id = liked.id AND liked.like_shards = 1
+            )
+            INSERT INTO {shards_table} (post_id, shard, count)
+            SELECT id, %(user_id)s %% like_shards, -1
+            FROM liked
+            WHERE like_shards > 1
+            ON CONFLICT (post_id, shard) DO UPDATE
+            SET count = {shards_table}.count + EXCLUDED.count
+            ''',
+            {'user_id': user_id}
+        )
+
+
+def sharded_like_count():
+    """
+    expression of the number of likes of the post kept in the shards,
+    the shards of the posts tuned down to a single one are counted
+    until they are rolled up
+    """
+    return Coalesce(
+        Subquery(
+            LikeCounterShard.objects
+            .filter(post_id=OuterRef('id'))
+            .values('post_id')
+            .annotate(total=Sum('count'))
+            .values('total')
+        ),
+        0,
+        output_field=IntegerField()
+    )
+
+
+def get_like_count(post_id):
+    """
+    returns exact number of likes of the post
+    """
+    like_count, sharded = (
+        Post.objects
+        .annotate(sharded=sharded_like_count())
+        .values_list('like_count', 'sharded')
+        .get(id=post_id)
+    )
+    return like_count + sharded
+
+
+def get_shards_number(likes_per_minute):
+    if likes_per_minute < settings.LIKE_SHARDING_RATE:
+        return 1
+
+    return min(
+        settings.LIKE_MAX_SHARDS,
+        ceil(likes_per_minute / settings.LIKE_SHARDING_RATE)
+    )
+
+
+@transaction.atomic
+def tune_like_shards(likes_per_minute):
+    """
+    sets the number of shards of each post by its like rate,
+    posts missing in likes_per_minute get a single shard
+
+    returns {post_id: number of shards} of the changed posts
+    """
+    current = (
+        Post.objects
+        .filter(Q(like_shards__gt=1) | Q(id__in=likes_per_minute))
+        .values_list('id', 'like_shards')
+    )
+
+    changed = {}
+    for post_id, like_shards in current:
+        new_like_shards = get_shards_number(likes_per_minute.get(post_id, 0))
+        if new_like_shards != like_shards:
+            changed[post_id] = new_like_shards
+
+    for post_id, like_shards in changed.items():
+        Post.objects.filter(id=post_id).update(like_shards=like_shards)
+
+    return changed
+
+
+def roll_up_like_shards():
+    """
+    moves the counts of all the shards into post.like_count
+
+    returns number of the rolled up posts
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH moved AS (
+                DELETE FROM {LikeCounterShard._meta.db_table}
+                RETURNING post_id, count
+            ), totals AS (
+                SELECT post_id, sum(count) AS total
+                FROM moved
+                GROUP BY post_id
+            )
+            UPDATE {Post._meta.db_table} p
+            SET like_count = p.like_count + totals.total
+            FROM totals
+            WHERE p.id = totals.post_id
+            '''
+        )
+        return cursor.rowcount
@@ -0,0 +1,110 @@
+"""
+Single statement like and unlike of a post.
+
+Checking if the user is able to view the post, inserting (deleting) the like,
+updating the like counter (see counters) and reading the new number of likes
+are done in one round trip to the db.
+"""
+from django.db import connection
+
+from speshalgram.accounts.models import Subscription, User
+from speshalgram.posts.models import Like, LikeCounterShard, Post
+
+# the visibility rules duplicate accounts.permissions.can_view_profile,
+# they must be changed along with it
+TOGGLE_LIKE_SQL = f'''
+WITH post AS (
+    SELECT
+        p.id,
+        p.like_count,
+        p.like_shards,
+        (
+            u.is_opened
+            OR u.id = %(user_id)s
+            OR EXISTS (
+                SELECT 1
+                FROM {Subscription._meta.db_table} s
+                WHERE s.follower_id = %(user_id)s
+                    AND s.follows_to_id = u.id
+                    AND s.status = %(accepted)s
+            )
+        ) AS visible
+    FROM {Post._meta.db_table} p
+    JOIN {User._meta.db_table} u ON u.id = p.owner_id
+    WHERE p.id = %(post_id)s
+), changed AS (
+    {{changed}}
+), counted AS (
+    UPDATE {Post._meta.db_table} p
+    SET like_count = p.like_count + %(delta)s
+    FROM changed
+    WHERE p.id = changed.post_id AND p.like_shards = 1
+    RETURNING p.like_count
+), sharded AS (
+    INSERT INTO {LikeCounterShard._meta.db_table} (post_id, shard, count)
+    SELECT post.id, %(user_id)s %% post.like_shards, %(delta)s
+    FROM changed
+    JOIN post ON post.id = changed.post_id
+    WHERE post.like_shards > 1
+    ON CONFLICT (post_id, shard) DO UPDATE
+    SET count = {LikeCounterShard._meta.db_table}.count + EXCLUDED.count
+    RETURNING 1
+)
+SELECT
+    post.visible,
+    COALESCE((SELECT like_count FROM counted), post.like_count)
+    + (
+        SELECT COALESCE(sum(count), 0)
+        FROM {LikeCounterShard._meta.db_table}
+        WHERE post_id = post.id
+    )
+    + (SELECT count(*) FROM sharded) * %(delta)s
+FROM post
+'''
+
+LIKE_SQL = TOGGLE_LIKE_SQL.format(changed=f'''
+    INSERT INTO {Like._meta.db_table} (owner_id, post_id, date_created)
+    SELECT %(user_id)s, id, now()
+    FROM post
+    WHERE visible
+    ON CONFLICT DO NOTHING
+    RETURNING post_id
+''')
+
+UNLIKE_SQL = TOGGLE_LIKE_SQL.format(changed=f'''
+    DELETE FROM {Like._meta.db_table}
+    WHERE owner_id = %(user_id)s
+        AND post_id IN (SELECT id FROM post WHERE visible)
+    RETURNING post_id
+''')
+
+
+def _toggle_like(sql, post_id, user_id, delta):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'post_id': post_id,
+            'user_id': user_id,
+            'accepted': Subscription.ACCEPTED,
+            'delta': delta,
+        })
+        return cursor.fetchone()
+
+
+def like(post_id, user_id):
+    """
+    likes the post if the user is able to view it
+
+    returns (is the post visible to the user, number of likes)
+    or None if the post doesn't exist
+    """
+    return _toggle_like(LIKE_SQL, post_id, user_id, 1)
+
+
+def unlike(post_id, user_id):
+    """
+    removes the like of the post if the user is able to view it
+
+    returns (is the post visible to the user, number of likes)
+    or None if the post doesn't exist
+    """
+    return _toggle_like(UNLIKE_SQL, post_id, user_id, -1)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from speshalgram.posts import counters
+from speshalgram.posts.models import Like
+
+
+class Command(BaseCommand):
+    help = (
+        'Tunes the number of like counter shards of posts by their like rate '
+        'and rolls up the shards into post like counts. '
+        'Supposed to be run periodically'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=60,
+            help='number of last seconds the like rate is measured over'
+        )
+
+    def handle(self, *args, **options):
+        window = options['window']
+        since = timezone.now() - timedelta(seconds=window)
+
+        likes_per_minute = {
+            post_id: nlikes * 60 / window
+            for post_id, nlikes in (
+                Like.objects
+                .filter(date_created__gte=since)
+                .values('post_id')
+                .annotate(nlikes=Count('id'))
+                .values_list('post_id', 'nlikes')
+            )
+        }
+
+        changed = counters.tune_like_shards(likes_per_minute)
+        for post_id, like_shards in changed.items():
+            self.stdout.write(f'post {post_id} has {like_shards} shards now')
+
+        rolled_up = counters.roll_up_like_shards()
+        self.stdout.write(f'{rolled_up} posts rolled up')
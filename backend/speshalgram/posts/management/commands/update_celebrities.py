@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from speshalgram.accounts.models import User
+from speshalgram.posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Switches users with more than FEED_PUSH_MAX_FOLLOWERS followers '
+        'to pulled feed delivery and the rest back to pushed one'
+    )
+
+    def handle(self, *args, **options):
+        threshold = settings.FEED_PUSH_MAX_FOLLOWERS
+        users = User.objects.all()
+
+        to_pull = users.filter(
+            is_celebrity=False, 
+            follower_count__gt=threshold
+        )
+        for user_id in to_pull.values_list('id', flat=True):
+            timeline.switch_to_pull(user_id)
+            self.stdout.write(f'user {user_id} switched to pull')
+
+        to_push = users.filter(
+            is_celebrity=True, 
+            follower_count__lte=threshold
+        )
+        for user_id in to_push.values_list('id', flat=True):
+            timeline.switch_to_push(user_id)
+            self.stdout.write(f'user {user_id} switched to push')
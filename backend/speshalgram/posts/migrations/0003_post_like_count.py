@@ -0,0 +1,27 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql='''
+            UPDATE posts_post p
+            SET like_count = (
+                SELECT count(*) FROM posts_like l WHERE l.post_id = p.id
+            )
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='date_created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        # the existing likes get the date of their post, with now() the first
+        # tune_like_counters would take the whole history of the likes for
+        # the last minute and shard every post liked often enough
+        migrations.RunSQL(
+            sql='''
+            UPDATE posts_like l
+            SET date_created = p.date_created
+            FROM posts_post p
+            WHERE p.id = l.post_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_shards',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='LikeCounterShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_counter_shards', to='posts.post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='likecountershard',
+            constraint=models.UniqueConstraint(fields=('post', 'shard'), name='unique_like_counter_shard'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_like_counter_shards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'date_created', 'id'], name='comment_post_date_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_comment_post_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='preview_comments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunSQL(
+            sql=[(
+                '''
+                UPDATE posts_post p
+                SET preview_comments = (
+                    SELECT COALESCE(
+                        jsonb_agg(
+                            jsonb_build_object(
+                                'id', c.id,
+                                'owner', jsonb_build_object(
+                                    'id', u.id,
+                                    'username', u.username,
+                                    'first_name', u.first_name,
+                                    'last_name', u.last_name,
+                                    'avatar', u.avatar
+                                ),
+                                'text', c.text
+                            )
+                            ORDER BY c.date_created, c.id
+                        ),
+                        '[]'
+                    )
+                    FROM (
+                        SELECT *
+                        FROM posts_comment
+                        WHERE post_id = p.id
+                        ORDER BY date_created DESC, id DESC
+                        LIMIT %s
+                    ) c
+                    JOIN accounts_user u ON u.id = c.owner_id
+                )
+                ''',
+                [settings.NUM_OF_PREVIEW_COMMENTS]
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
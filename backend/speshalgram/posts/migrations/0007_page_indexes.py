@@ -0,0 +1,21 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_preview_comments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'owner'], name='like_post_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['owner', 'date_created', 'id'], name='post_owner_date_idx'),
+        ),
+    ]
@@ -1,15 +1,16 @@
 from pathlib import Path
-from uuid import uuid4
 
 from django.db import models
-from django_cte import CTEManager
+from django.db.models.expressions import RawSQL
 
 from speshalgram.accounts.models import User
+from speshalgram.utils import MaintainedFieldsMixin
 
 
 def picture_path(post, filename):
-    extension = filename.split('.')[-1]
-    return str(Path(str(post.owner.id), f'{uuid4()}.{extension}'))
+    # the file is named by the hash of its content
+    # (see speshalgram.media.storage)
+    return str(Path('pictures', filename))
 
 
 class DateTimeMixin(models.Model):
@@ -19,24 +20,87 @@ class DateTimeMixin(models.Model):
     class Meta:
         abstract = True
 
-# TODO date_created db_index?
-class Post(DateTimeMixin, models.Model):
+class Post(MaintainedFieldsMixin, DateTimeMixin, models.Model):
+    # renditions of the picture are rendered by the job queue,
+    # see media.tasks
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    PICTURE_STATUSES = (
+        (PROCESSING, 'processing'),
+        (READY, 'ready'),
+        (FAILED, 'failed'),
+    )
+
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts'
     )
     picture = models.ImageField(upload_to=picture_path)
+    # maintained by the renders of the job queue, see media.tasks
+    picture_status = models.CharField(
+        max_length=10,
+        choices=PICTURE_STATUSES,
+        default=READY
+    )
     description = models.CharField(
         max_length=500, 
         null=True, 
         blank=True
     )
+    # maintained along with likes, see counters
+    like_count = models.PositiveIntegerField(default=0)
+    # number of LikeCounterShard rows likes of the post are spread among,
+    # posts with a single shard are counted right in like_count
+    like_shards = models.PositiveSmallIntegerField(default=1)
+    # snapshot of the last comments maintained along with them,
+    # see comments
+    preview_comments = models.JSONField(default=list, blank=True)
+
+    maintained_fields = (
+        'like_count',
+        'like_shards',
+        'preview_comments',
+        'picture_status',
+    )
+
+    class Meta:
+        indexes = [
+            # posts of a user page
+            models.Index(
+                fields=['owner', 'date_created', 'id'],
+                name='post_owner_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'post {self.id} of {self.owner.username}'
 
-# TODO date_created db_inex?
+class CommentQuerySet(models.QuerySet):
+    def filter_latest_of_posts(self, post_ids, number):
+        """
+        leaves last `number` comments of each post,
+        reads only the comments of the given posts
+        """
+        return self.filter(
+            id__in=RawSQL(
+                f'''
+                SELECT c.id
+                FROM unnest(%s::integer[]) AS p(id)
+                CROSS JOIN LATERAL (
+                    SELECT id
+                    FROM {self.model._meta.db_table}
+                    WHERE post_id = p.id
+                    ORDER BY date_created DESC, id DESC
+                    LIMIT %s
+                ) c
+                ''',
+                (list(post_ids), number)
+            )
+        )
+
+
 class Comment(DateTimeMixin, models.Model):
     owner = models.ForeignKey(
         User,
@@ -50,7 +114,17 @@ class Comment(DateTimeMixin, models.Model):
     )
     text = models.CharField(max_length=200)
 
-    objects = CTEManager()
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # comments of a post page and its last comments,
+            # see filter_latest_of_posts
+            models.Index(
+                fields=['post', 'date_created', 'id'],
+                name='comment_post_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'comment of {self.owner.username} to post {self.post_id}'
@@ -67,6 +141,7 @@ class Like(models.Model):
         on_delete=models.CASCADE,
         related_name='likes'
     )
+    date_created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -75,6 +150,75 @@ class Like(models.Model):
                 name='only_like_constraint'
             ),
         ]
+        indexes = [
+            # users who liked a post page, ordered by the user id
+            models.Index(
+                fields=['post', 'owner'],
+                name='like_post_owner_idx'
+            ),
+        ]
     
     def __str__(self) -> str:
         return f'like of {self.owner.username} to {self.post_id}'
+
+
+class LikeCounterShard(models.Model):
+    """
+    part of the like counter of a frequently liked post.
+    Spreads concurrent likes among several rows instead of a single post row,
+    the count is rolled up into post.like_count periodically
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counter_shards'
+    )
+    shard = models.PositiveSmallIntegerField()
+    # might be negative if likes counted in like_count are removed
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'shard'],
+                name='unique_like_counter_shard'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'like counter shard {self.shard} of post {self.post_id}'
+
+
+class TimelineEntry(models.Model):
+    """
+    post pushed to the home timeline (feed) of the user
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # copy of post.date_created, so the feed page is read from the index
+    post_date_created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'post_date_created', 'post'],
+                name='timeline_entry_page_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'post {self.post_id} in timeline of {self.user_id}'
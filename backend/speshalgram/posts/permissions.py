@@ -1,9 +1,9 @@
-from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ParseError
 from rest_framework.permissions import BasePermission
 
 from speshalgram.accounts.permissions import User, can_view_profile
 from speshalgram.posts.models import Post
+from speshalgram.utils import get_identity_map
 
 
 class IsAbleToViewPostObject(BasePermission):
@@ -21,7 +21,10 @@ class IsAbleToViewPostsList(BasePermission):
         except KeyError:
             raise ParseError("you must provide 'username' parameter")
         
-        owner = get_object_or_404(User, username=username)
+        owner = get_identity_map(request).get_or_404(
+            User.objects.all(), 
+            username=username
+        )
 
         return can_view_profile(
             who=request.user,
@@ -29,19 +32,28 @@ class IsAbleToViewPostsList(BasePermission):
         )
 
 
+def get_post_id(request):
+    try:
+        return int(request.query_params["post_id"])
+    except KeyError:
+        raise ParseError("you must provide 'post_id' parameter")
+    except ValueError:
+        raise ParseError("'post_id' must be an integer")
+
+
+def get_post(request):
+    """
+    returns the post of post_id parameter with its owner
+    """
+    return get_identity_map(request).get_or_404(
+        Post.objects.select_related('owner'), 
+        id=get_post_id(request)
+    )
+
+
 class IsAbleToViewPostContent(BasePermission):
     def has_permission(self, request, view):
-        try:
-            post_id = int(view.request.query_params["post_id"])
-        except KeyError:
-            raise ParseError("you must provide 'post_id' parameter")
-        except ValueError:
-            raise ParseError("'post_id' must be an integer")
-
-        post = get_object_or_404(
-            Post.objects.select_related('owner'), 
-            id=post_id
-        )
+        post = get_post(view.request)
 
         return can_view_profile(
             who=request.user,
@@ -69,10 +81,6 @@ class IsAbleToAlterPostComments(IsAbleToAlterPostContent):
     pass
 
 
-class IsAbleToAlterPostLikes(IsAbleToAlterPostContent):
-    pass
-
-
 class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
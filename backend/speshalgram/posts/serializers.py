@@ -1,20 +1,42 @@
-from django.conf import settings
 from rest_framework import serializers
 
-from speshalgram.accounts.serializers import ShortUserSerializer
+from speshalgram.accounts.serializers import (
+    CardsListSerializer,
+    ShortUserSerializer,
+)
+from speshalgram.media import renditions
+from speshalgram.posts import comments
 from speshalgram.posts.models import Comment, Post
+from speshalgram.serializers import (
+    CompiledRepresentationMixin,
+    SparseFieldsetMixin,
+)
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(
+    SparseFieldsetMixin,
+    CompiledRepresentationMixin,
+    serializers.ModelSerializer
+):
     owner = ShortUserSerializer(read_only=True)
 
     class Meta:
         model = Comment
         fields = ('id', 'owner', 'text')
+        list_serializer_class = CardsListSerializer
 
+    def get_card_user(self, item):
+        # the owners are neither fetched nor rendered if not asked for
+        return item.owner if 'owner' in self.fields else None
 
-class PostSerializer(serializers.ModelSerializer):
+
+class PostSerializer(
+    SparseFieldsetMixin,
+    CompiledRepresentationMixin,
+    serializers.ModelSerializer
+):
     owner = ShortUserSerializer(read_only=True)
+    picture_renditions = serializers.SerializerMethodField()
     nlikes = serializers.SerializerMethodField()
     preview_comments = serializers.SerializerMethodField()
     is_liked_by_me = serializers.BooleanField(read_only=True)
@@ -25,44 +47,39 @@ class PostSerializer(serializers.ModelSerializer):
             'id', 
             'owner', 
             'picture', 
+            'picture_status',
+            'picture_renditions',
             'description', 
             'nlikes', 
             'preview_comments',
             'is_liked_by_me'
         )
-        
-    def get_fields(self):
-        fields = super().get_fields()
+        read_only_fields = ('picture_status',)
+        list_serializer_class = CardsListSerializer
 
-        if self.context.get('hide_comments'):
-            fields.pop('preview_comments')
-        
-        return fields
+    def get_card_user(self, item):
+        # the owners are neither fetched nor rendered if not asked for
+        return item.owner if 'owner' in self.fields else None
     
+    def get_picture_renditions(self, obj):
+        if not obj.picture or obj.picture_status != Post.READY:
+            return None
+
+        return renditions.to_representation(
+            renditions.get_urls(
+                obj.picture.storage,
+                obj.picture.name,
+                'picture'
+            ),
+            self.context.get('request')
+        )
+
     def get_nlikes(self, obj):
-        if hasattr(obj, 'nlikes'):
-            nlikes = obj.nlikes
-        else:
-            nlikes = obj.likes.count()
-        
-        return nlikes
+        return obj.like_count + getattr(obj, 'sharded_like_count', 0)
 
     def get_preview_comments(self, obj):
-        if hasattr(obj, 'preview_comments'):
-            comments = obj.preview_comments
-        else:
-            comments = (
-                obj.comments
-                .select_related('owner')
-                .order_by('date_created')[
-                    0:settings.NUM_OF_PREVIEW_COMMENTS
-                ]
-            )
-        
-        serializer = CommentSerializer(
-            comments, 
-            many=True, 
-            context=self.context
+        return comments.to_representation(
+            obj.preview_comments,
+            self.context.get('request'),
+            self.context.get('sideloaded_users')
         )
-
-        return serializer.data
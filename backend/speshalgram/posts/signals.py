@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from speshalgram.accounts.models import Subscription, User
+from speshalgram.posts import comments, counters, timeline
+from speshalgram.posts.models import Comment, Like, Post
+
+
+@receiver(post_save, sender=Post)
+def push_created_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.push_post(instance)
+
+
+# likes are removed by likes.unlike and by the cascades only, a delete
+# receiver would make the cascades delete them one by one, each of them
+# counted for a post being deleted (see counters)
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        counters.change_like_count(instance.post_id, instance.owner_id, 1)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_likes_of_deleted_user(sender, instance, **kwargs):
+    counters.uncount_likes_of(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def add_comment_to_snapshot(sender, instance, created, **kwargs):
+    if created:
+        comments.refresh(instance.post_id)
+
+
+# removed comments are taken out of the snapshots by CommentViewSet and
+# remove_deleted_user_comments, a delete receiver would make the cascades
+# delete the comments one by one and rebuild the snapshots of the posts
+# being deleted
+@receiver(pre_delete, sender=User)
+def remove_deleted_user_comments(sender, instance, **kwargs):
+    comments.remove_of_owner(instance.id)
+
+
+@receiver(post_save, sender=User)
+def refresh_snapshots_with_card(sender, instance, created, **kwargs):
+    update_fields = kwargs['update_fields']
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(comments.CARD_FIELDS)
+    ):
+        return
+
+    comments.refresh_of_owner(instance.id)
+
+
+@receiver(post_save, sender=Subscription)
+def sync_timeline_on_status_change(sender, instance, **kwargs):
+    was_accepted = instance.stored_status == Subscription.ACCEPTED
+    is_accepted = instance.status == Subscription.ACCEPTED
+
+    if is_accepted and not was_accepted:
+        timeline.backfill(instance.follower_id, instance.follows_to_id)
+    elif was_accepted and not is_accepted:
+        timeline.prune(instance.follower_id, instance.follows_to_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_timeline_on_delete(sender, instance, **kwargs):
+    if instance.status == Subscription.ACCEPTED:
+        timeline.prune(instance.follower_id, instance.follows_to_id)
@@ -0,0 +1,257 @@
+"""
+Hybrid push/pull home timelines.
+
+Every accepted follower of a user gets a TimelineEntry for each of his posts,
+so the feed is a range read over the entries of one user instead of
+a join over all the subscriptions of the requester.
+
+Pushing doesn't scale for users with a huge number of followers
+(celebrities), so their posts aren't pushed. The feed pulls them at read
+time and merges them with the pushed ones (see MergedFeed).
+"""
+import heapq
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import IntegerField, Value
+
+from speshalgram.accounts.models import Subscription, User
+from speshalgram.posts.models import Post, TimelineEntry
+
+
+def push_post(post):
+    """
+    adds new post to the timelines of all accepted followers of its owner
+    unless the owner is a celebrity
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {TimelineEntry._meta.db_table}
+                (user_id, post_id, post_date_created)
+            SELECT s.follower_id, %s, %s
+            FROM {Subscription._meta.db_table} s
+            JOIN {User._meta.db_table} u ON u.id = s.follows_to_id
+            WHERE s.follows_to_id = %s
+                AND s.status = %s
+                AND NOT u.is_celebrity
+            ON CONFLICT DO NOTHING
+            ''',
+            [
+                post.id,
+                post.date_created,
+                post.owner_id,
+                Subscription.ACCEPTED,
+            ]
+        )
+
+
+def backfill(follower_id, follows_to_id):
+    """
+    adds all posts of the followed user to the timeline of the follower
+    unless the followed user is a celebrity
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {TimelineEntry._meta.db_table}
+                (user_id, post_id, post_date_created)
+            SELECT %s, p.id, p.date_created
+            FROM {Post._meta.db_table} p
+            JOIN {User._meta.db_table} u ON u.id = p.owner_id
+            WHERE p.owner_id = %s AND NOT u.is_celebrity
+            ON CONFLICT DO NOTHING
+            ''',
+            [follower_id, follows_to_id]
+        )
+
+
+def prune(follower_id, follows_to_id):
+    """
+    removes all posts of the followed user from the timeline of the follower
+    """
+    TimelineEntry.objects.filter(
+        user_id=follower_id,
+        post__owner_id=follows_to_id
+    ).delete()
+
+
+@transaction.atomic
+def switch_to_pull(user_id):
+    """
+    makes the user a celebrity and removes his posts from all timelines
+    """
+    User.objects.filter(id=user_id).update(is_celebrity=True)
+    TimelineEntry.objects.filter(post__owner_id=user_id).delete()
+
+
+@transaction.atomic
+def switch_to_push(user_id):
+    """
+    makes the user an ordinary one and pushes all his posts
+    to the timelines of his accepted followers
+    """
+    User.objects.filter(id=user_id).update(is_celebrity=False)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {TimelineEntry._meta.db_table}
+                (user_id, post_id, post_date_created)
+            SELECT s.follower_id, p.id, p.date_created
+            FROM {Post._meta.db_table} p
+            JOIN {Subscription._meta.db_table} s
+                ON s.follows_to_id = p.owner_id
+            WHERE p.owner_id = %s AND s.status = %s
+            ON CONFLICT DO NOTHING
+            ''',
+            [user_id, Subscription.ACCEPTED]
+        )
+
+
+def get_feed_streams(user, celebrity_ids):
+    """
+    returns disjoint sorted streams of post keys making up the feed
+    of the user: his timeline and the posts of every followed celebrity
+    """
+    # the entries pushed while their owner was switched to pull are left
+    # in the timeline, they are pulled along with the other posts instead
+    streams = [
+        FeedStream(
+            TimelineEntry.objects
+            .filter(user=user)
+            .exclude(post__owner_id__in=celebrity_ids),
+            'post_date_created',
+            'post_id'
+        )
+    ]
+    streams += [
+        FeedStream(
+            Post.objects.filter(owner_id=celebrity_id),
+            'date_created',
+            'id'
+        )
+        for celebrity_id in celebrity_ids
+    ]
+    return streams
+
+
+class FeedStream:
+    """
+    queryset of posts keys, sorted by (date_field, id_field)
+    """
+
+    def __init__(self, queryset, date_field, id_field):
+        self.queryset = queryset
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def filter_position(self, lookup, position):
+        return FeedStream(
+            self.queryset.filter(**{f'{self.date_field}__{lookup}': position}),
+            self.date_field,
+            self.id_field
+        )
+
+    def keys(self, number, descending, limit=None):
+        """
+        returns queryset of (number, date, id) tuples
+        """
+        prefix = '-' if descending else ''
+        keys = (
+            self.queryset
+            .annotate(stream=Value(number, output_field=IntegerField()))
+            .order_by(f'{prefix}{self.date_field}', f'{prefix}{self.id_field}')
+            .values_list('stream', self.date_field, self.id_field)
+        )
+        return keys if limit is None else keys[:limit]
+
+
+class MergedFeed:
+    """
+    k-way merge of the sorted feed streams by (date_created, id)
+
+    Quacks like a queryset for CursorPagination: supports order_by(),
+    filter() by the cursor position and slicing. The keys of all the streams
+    are read in one query, merged and then only the posts of the page are
+    loaded from the queryset. The positions (the first ordering field) and
+    the ids (the second one) are set as attributes on the loaded posts.
+    """
+
+    LOOKUPS = ('lt', 'gt')
+
+    def __init__(self, queryset, streams, ordering=('-date_created', '-id')):
+        self.queryset = queryset
+        self.streams = streams
+        self.ordering = ordering
+
+    def _clone(self, **kwargs):
+        return MergedFeed(
+            kwargs.get('queryset', self.queryset),
+            kwargs.get('streams', self.streams),
+            kwargs.get('ordering', self.ordering)
+        )
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    def order_by(self, *ordering):
+        assert len(ordering) == 2, 'ordering must be (position, id) fields'
+        return self._clone(ordering=ordering)
+
+    def filter(self, **kwargs):
+        (lookup_name, position), = kwargs.items()
+        field_name, lookup = lookup_name.rsplit('__', 1)
+
+        assert field_name == self.ordering[0].lstrip('-'), (
+            'only filtering by the position is supported'
+        )
+        assert lookup in self.LOOKUPS, f'unsupported lookup {lookup}'
+
+        return self._clone(streams=[
+            stream.filter_position(lookup, position)
+            for stream in self.streams
+        ])
+
+    def _merged_keys(self, limit):
+        keys = [
+            stream.keys(number, self.descending, limit)
+            for number, stream in enumerate(self.streams)
+        ]
+        streams_keys = [[] for _ in self.streams]
+        for number, date, id in keys[0].union(*keys[1:], all=True):
+            streams_keys[number].append((date, id))
+
+        # union doesn't guarantee the order of the rows
+        for stream_keys in streams_keys:
+            stream_keys.sort(reverse=self.descending)
+
+        # the streams are disjoint, so every key counts towards the limit
+        return heapq.merge(*streams_keys, reverse=self.descending)
+
+    def _load(self, start, stop):
+        keys = list(islice(self._merged_keys(stop), start, stop))
+        posts = self.queryset.in_bulk([id for _, id in keys])
+
+        position_attr, id_attr = (
+            field.lstrip('-') for field in self.ordering
+        )
+        page = []
+        for date, id in keys:
+            # the post might have been deleted in between
+            if post := posts.get(id):
+                setattr(post, position_attr, date)
+                setattr(post, id_attr, id)
+                page.append(post)
+
+        return page
+
+    def __getitem__(self, key):
+        assert isinstance(key, slice) and not key.step, (
+            'only slicing without step is supported'
+        )
+        return self._load(key.start or 0, key.stop)
+
+    def __iter__(self):
+        return iter(self._load(0, None))
@@ -1,10 +1,8 @@
 from django.conf import settings
-from django.db.models import Count, F, OuterRef, Prefetch, Window
-from django.db.models.expressions import Exists
-from django.db.models.functions import RowNumber
-from django_cte import With
+from django.db import transaction
+from django.db.models import F
 from rest_framework.decorators import action
-from rest_framework.exceptions import MethodNotAllowed, ParseError
+from rest_framework.exceptions import MethodNotAllowed, NotFound, ParseError
 from rest_framework.generics import GenericAPIView
 from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
@@ -12,29 +10,51 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK
 from rest_framework.viewsets import ModelViewSet
 
-from speshalgram.accounts.models import Subscription, User
+from speshalgram.accounts.models import User
 from speshalgram.accounts.serializers import ShortUserSerializer
+from speshalgram.posts import comments, counters, likes, timeline
 from speshalgram.posts.models import Comment, Like, Post
 from speshalgram.posts.permissions import (
     IsAbleToAlterPostComments,
-    IsAbleToAlterPostLikes,
     IsAbleToViewPostComments,
     IsAbleToViewPostLikes,
     IsAbleToViewPostObject,
     IsAbleToViewPostsList,
     IsCommentOwner,
     IsPostOwner,
+    get_post,
+    get_post_id,
 )
 from speshalgram.posts.serializers import CommentSerializer, PostSerializer
-from speshalgram.utils import PermissionsByActionsMixin
+from speshalgram.utils import (
+    PermissionsByActionsMixin,
+    SideloadedUsersMixin,
+    SparseFieldsetViewMixin,
+    get_identity_map,
+)
 
 
 class PostCursorPagination(CursorPagination):
     page_size = settings.POSTS_PER_PAGE
     ordering = ('-date_created', '-id')
 
+    # feed is ordered by the timeline copies of date_created and id,
+    # positions stay the same, so the cursors are interchangeable
+    timeline_ordering = ('-timeline_date_created', '-timeline_post_id')
+
+    def get_ordering(self, request, queryset, view):
+        if getattr(view, 'action', None) == 'feed':
+            return self.timeline_ordering
+
+        return super().get_ordering(request, queryset, view)
+
 
-class PostViewSet(PermissionsByActionsMixin, ModelViewSet):
+class PostViewSet(
+    SideloadedUsersMixin,
+    SparseFieldsetViewMixin,
+    PermissionsByActionsMixin,
+    ModelViewSet
+):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
 
@@ -47,67 +67,68 @@ class PostViewSet(PermissionsByActionsMixin, ModelViewSet):
         'list': [IsAbleToViewPostsList],
         'retrieve': [IsAbleToViewPostObject],
     }
+
+    sideloaded_users_actions = {'list', 'feed'}
+
+    excluded_fields_by_actions = {
+        'retrieve': {'preview_comments'},
+    }
     
     PARTIAL_UPDATE_FIELDS = {'description'}
     
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-
-        if self.action == 'retrieve':
-            context['hide_comments'] = True
-        
-        return context
-    
-    def extend_queryset(self, queryset, preview_comments=False):
+    def extend_queryset(self, queryset):
         """
         adds post owner
-        annotates number of likes and if post is liked by the user
-        prefetches first N comments if required
+        annotates likes kept in the counter shards
+        both only if they are asked for (see SparseFieldsetViewMixin),
+        the snapshot of the preview comments isn't read if it isn't
         """
-        queryset = (
-            queryset
-            .select_related('owner')
-            .annotate(
-                nlikes=Count('likes'),
-                is_liked_by_me=Exists(
-                    Like.objects.filter(
-                        post_id=OuterRef('id'),
-                        owner_id=self.request.user.id,
-                    )
-                )
+        if self.is_requested('owner'):
+            queryset = queryset.select_related('owner')
+        if self.is_requested('nlikes'):
+            queryset = queryset.annotate(
+                sharded_like_count=counters.sharded_like_count()
             )
-        )
+        if not self.is_requested('preview_comments'):
+            queryset = queryset.defer('preview_comments')
+        
+        return queryset
 
-        if preview_comments:
-            enumerated_comments_cte = With(
-                Comment.objects.annotate(
-                    row_number=Window(
-                        expression=RowNumber(),
-                        partition_by=[F('post_id')],
-                        order_by=[F('date_created').desc(), F('id').desc()]
-                    )
-                )
-            )
+    def set_liked_by_me(self, posts):
+        """
+        sets if post is liked by the user,
+        likes of all the posts are looked up at once
+        """
+        if not self.is_requested('is_liked_by_me'):
+            return
 
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    'comments',
-                    queryset=(
-                        enumerated_comments_cte.queryset()
-                        .with_cte(enumerated_comments_cte)
-                        .select_related('owner')
-                        .filter(
-                            row_number__lte=settings.NUM_OF_PREVIEW_COMMENTS
-                        )
-                        .order_by('date_created', 'id')
-                    ),
-                    to_attr='preview_comments'
+        liked_post_ids = set()
+        if self.request.user.is_authenticated and posts:
+            liked_post_ids = set(
+                Like.objects
+                .filter(
+                    owner_id=self.request.user.id,
+                    post_id__in=[post.id for post in posts]
                 )
+                .values_list('post_id', flat=True)
             )
         
-        return queryset
+        for post in posts:
+            post.is_liked_by_me = post.id in liked_post_ids
+
+    def get_serializer(self, *args, **kwargs):
+        # resolved for the serialized posts only, i.e. after the pagination
+        if args and args[0] is not None:
+            instance, *args = args
+            if kwargs.get('many'):
+                instance = list(instance)
+                self.set_liked_by_me(instance)
+            else:
+                self.set_liked_by_me([instance])
+            args = (instance, *args)
+
+        return super().get_serializer(*args, **kwargs)
 
-    
     def get_queryset(self):
         orig_queryset = super().get_queryset()
 
@@ -116,35 +137,59 @@ class PostViewSet(PermissionsByActionsMixin, ModelViewSet):
         
         elif self.action == 'list':
             return (
-                self.extend_queryset(
-                    orig_queryset, 
-                    preview_comments=True
-                )
+                self.extend_queryset(orig_queryset)
                 .filter(
-                    owner__username=self.request.query_params['username']
+                    # fetched by the permission already
+                    owner=get_identity_map(self.request).get_or_404(
+                        User.objects.all(),
+                        username=self.request.query_params['username']
+                    )
                 )
                 .order_by('-date_created', '-id')
             )
 
         elif self.action == 'feed':
-            return (
-                self.extend_queryset(
-                    orig_queryset, 
-                    preview_comments=True
+            queryset = self.extend_queryset(orig_queryset)
+
+            # posts of celebrities aren't pushed to the timeline
+            celebrity_ids = list(
+                User.objects
+                .filter_follows_of(self.request.user)
+                .filter(is_celebrity=True)
+                .values_list('id', flat=True)
+            )
+            if celebrity_ids:
+                return timeline.MergedFeed(
+                    queryset,
+                    timeline.get_feed_streams(
+                        self.request.user, 
+                        celebrity_ids
+                    ),
+                    ordering=PostCursorPagination.timeline_ordering
                 )
-                .filter(
-                    owner__sub_followers__follower=self.request.user,
-                    owner__sub_followers__status=Subscription.ACCEPTED,
+
+            # posts are ordered by the timeline entry columns
+            # (copies of date_created and id of the post)
+            # to read the page right from the timeline index
+            return (
+                queryset
+                .filter(timeline_entries__user=self.request.user)
+                .annotate(
+                    timeline_date_created=F(
+                        'timeline_entries__post_date_created'
+                    ),
+                    timeline_post_id=F('timeline_entries__post_id'),
                 )
-                .order_by('-date_created', '-id')
+                .order_by('-timeline_date_created', '-timeline_post_id')
             )
         
         return orig_queryset
     
+    # the post, its timeline entries and the render of its picture
+    # are committed together
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
-        serializer.instance.nlikes = 0
-        serializer.instance.preview_comments = []
     
     def update(self, request, *args, **kwargs):
         if self.action == 'update':
@@ -175,7 +220,12 @@ class CommentCursorPagination(CursorPagination):
     ordering = ('-date_created', '-id')
 
 
-class CommentViewSet(PermissionsByActionsMixin, ModelViewSet):
+class CommentViewSet(
+    SideloadedUsersMixin,
+    SparseFieldsetViewMixin,
+    PermissionsByActionsMixin,
+    ModelViewSet
+):
     queryset = Comment.objects.select_related('owner')
     serializer_class = CommentSerializer
 
@@ -191,6 +241,9 @@ class CommentViewSet(PermissionsByActionsMixin, ModelViewSet):
         queryset = super().get_queryset()
 
         if self.action == 'list':
+            if not self.is_requested('owner'):
+                queryset = queryset.select_related(None)
+
             queryset = (
                 queryset
                 .filter(post_id=self.request.query_params['post_id'])
@@ -202,57 +255,67 @@ class CommentViewSet(PermissionsByActionsMixin, ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
        raise MethodNotAllowed(request.method)
     
+    # the snapshot of the post is changed along with the comment
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             owner=self.request.user,
-            post_id=self.request.query_params['post_id']
+            # fetched by the permission already
+            post=get_post(self.request)
         )
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        comment_id = instance.id
+        super().perform_destroy(instance)
+        comments.refresh(instance.post_id, removed_comment_id=comment_id)
+
 
 class LikeCursorPagination(CursorPagination):
     page_size = settings.LIKES_PER_PAGE
     ordering = 'id'
 
 
-class LikeAPIView(GenericAPIView):
+class LikeAPIView(SparseFieldsetViewMixin, GenericAPIView):
+    serializer_class = ShortUserSerializer
     pagination_class = LikeCursorPagination
 
     def get_permissions(self):
         if self.request.method == 'GET':
             return [IsAbleToViewPostLikes()]
         elif self.request.method in {'PUT', 'DELETE'}:
-            return [IsAbleToAlterPostLikes()]
+            # the visibility of the post is checked
+            # by the like/unlike statement itself (see likes)
+            return [IsAuthenticated()]
 
         return super().get_permissions()
 
+    def toggle_like(self, request, toggle):
+        post_id = get_post_id(request)
+        result = toggle(post_id, request.user.id)
+
+        if result is None:
+            raise NotFound()
+
+        visible, nlikes = result
+        if not visible:
+            self.permission_denied(request)
+
+        return Response(
+            data={'nlikes': nlikes},
+            status=HTTP_200_OK
+        )
+
     def get(self, request, *args, **kwargs):
         post_id = request.query_params['post_id']
         queryset = User.objects.filter(likes__post_id=post_id).order_by('id')
         page = self.paginate_queryset(queryset)
-        serializer = ShortUserSerializer(
-            page, 
-            many=True, 
-            context={'request': request}
-        )
+        serializer = self.get_serializer(page, many=True)
 
         return self.get_paginated_response(serializer.data)
 
     def put(self, request, *args, **kwargs):
-        post_id = request.query_params['post_id']
-        Like.objects.get_or_create(owner=request.user, post_id=post_id)
-        nlikes = Like.objects.filter(post_id=post_id).count()
-
-        return Response(
-            data={'nlikes': nlikes},
-            status=HTTP_200_OK
-        )
+        return self.toggle_like(request, likes.like)
     
     def delete(self, request, *args, **kwargs):
-        post_id = request.query_params['post_id']
-        Like.objects.filter(owner=request.user, post_id=post_id).delete()
-        nlikes = Like.objects.filter(post_id=post_id).count()
-
-        return Response(
-            data={'nlikes': nlikes},
-            status=HTTP_200_OK
-        )
+        return self.toggle_like(request, likes.unlike)
@@ -0,0 +1,51 @@
+"""
+JSON renderer on orjson, the output is the same as DRF's JSONRenderer gives.
+
+orjson encodes the types DRF's encoder handles itself, datetimes are passed
+to the encoder too, so they are spelled the same ("Z" for UTC). The rest is
+rendered by DRF: without orjson, when the settings ask for ASCII, spaced or
+indented output, and when orjson can't encode the data (integers beyond
+64 bits, keys other than strings, which orjson encodes much slower).
+
+Unlike DRF's, floats in the exponent notation are spelled differently
+(1e-7 instead of 1e-07) and non-finite floats are rendered as null instead
+of failing the response.
+"""
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # escaped by DRF, see JSONRenderer.render. The first byte of the
+        # characters is looked up first, searching for it is much faster
+        if b'\xe2' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+            ret = ret.replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
@@ -0,0 +1,173 @@
+"""
+Read path of the serializers without the field machinery of DRF.
+
+Serializer.to_representation asks every field for the attribute and for its
+representation, so serializing a page calls a few methods per field and row.
+CompiledRepresentationMixin turns the readable fields into one function per
+field once per serializer instance (once per page for many=True), most of
+them read the attribute and convert it directly. The urls of the files are
+memoized. The output is the same as DRF's, the fields it can't read this way
+(missing attributes, callables, nested sources, relations) go through DRF.
+"""
+import functools
+from operator import attrgetter
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.fields.files import FieldFile
+from rest_framework import fields, serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+from speshalgram.utils import build_absolute_uri
+
+# exact field types, their subclasses might represent the values differently
+CONVERTERS = {
+    fields.CharField: str,
+    fields.IntegerField: int,
+}
+
+
+@functools.lru_cache(maxsize=10000)
+def get_file_url(storage, name):
+    """
+    returns storage.url(name), the storages are configured once
+    """
+    return storage.url(name)
+
+
+def compile_file_field(field):
+    """
+    returns the representation as FileField.to_representation does
+    """
+    request = field.context.get('request')
+
+    def convert(value):
+        if not isinstance(value, FieldFile):
+            return field.to_representation(value)
+        if not value:
+            return None
+
+        url = get_file_url(value.storage, value.name)
+        if request is not None:
+            return build_absolute_uri(request, url)
+        return url
+
+    return convert
+
+
+def compile_generic(field):
+    """
+    returns the representation of the field as Serializer.to_representation
+    does, raises SkipField if it is omitted
+    """
+    def represent(instance):
+        attribute = field.get_attribute(instance)
+
+        if isinstance(attribute, PKOnlyObject):
+            check_for_none = attribute.pk
+        else:
+            check_for_none = attribute
+        if check_for_none is None:
+            return None
+
+        return field.to_representation(attribute)
+
+    return represent
+
+
+def compile_field(serializer, field):
+    if isinstance(field, fields.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+
+    if (
+        type(field).get_attribute is not fields.Field.get_attribute
+        or len(field.source_attrs) != 1
+    ):
+        return compile_generic(field)
+
+    getter = attrgetter(field.source_attrs[0])
+    if type(field) in {fields.FileField, fields.ImageField} and getattr(
+        field, 'use_url', api_settings.UPLOADED_FILES_USE_URL
+    ):
+        convert = compile_file_field(field)
+    else:
+        convert = CONVERTERS.get(type(field), field.to_representation)
+    generic = compile_generic(field)
+
+    def represent(instance):
+        try:
+            value = getter(instance)
+        except (AttributeError, KeyError, ObjectDoesNotExist):
+            return generic(instance)
+
+        if value is None:
+            return None
+        if callable(value):
+            return generic(instance)
+
+        return convert(value)
+
+    return represent
+
+
+def is_top_level(serializer):
+    """
+    returns if the serializer is the root one or the child of the root list
+    """
+    parent = serializer.parent
+    return parent is None or (
+        isinstance(parent, serializers.ListSerializer)
+        and parent.parent is None
+    )
+
+
+def get_fieldset(serializer):
+    """
+    returns the fieldset of the view (see SparseFieldsetViewMixin),
+    None for the nested serializers, they render all of their fields
+    """
+    fieldset = serializer.context.get('fieldset')
+    if fieldset is None or not is_top_level(serializer):
+        return None
+
+    return fieldset
+
+
+class SparseFieldsetMixin:
+    """
+    drops the fields not asked for by the fieldset of the view
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        fieldset = get_fieldset(self)
+        if fieldset is not None:
+            fields = {name: fields[name] for name in fieldset.filter(fields)}
+
+        return fields
+
+
+class CompiledRepresentationMixin:
+    """
+    serializes with the fields compiled by compile_field
+    """
+
+    def get_compiled_fields(self):
+        if getattr(self, '_compiled_fields', None) is None:
+            self._compiled_fields = [
+                (field.field_name, compile_field(self, field))
+                for field in self._readable_fields
+            ]
+
+        return self._compiled_fields
+
+    def to_representation(self, instance):
+        ret = {}
+        for field_name, represent in self.get_compiled_fields():
+            try:
+                ret[field_name] = represent(instance)
+            except fields.SkipField:
+                continue
+
+        return ret
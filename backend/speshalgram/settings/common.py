@@ -22,7 +22,9 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'speshalgram.accounts',
-    'speshalgram.posts'
+    'speshalgram.posts',
+    'speshalgram.media',
+    'speshalgram.jobs',
 ]
 
 MIDDLEWARE = [
@@ -44,7 +46,17 @@ AUTH_USER_MODEL = 'accounts.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # JSON on orjson, the same as DRF's (see renderers and parsers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'speshalgram.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'speshalgram.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 USE_X_FORWARDED_HOST = True # correct urls if app works behind reverse proxy
@@ -64,6 +76,26 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # hot serialized objects, shared by the workers of the host
+    'shared': {
+        'BACKEND': 'speshalgram.shared_cache.SharedMemoryCache',
+        'LOCATION': os.environ.get(
+            'SHARED_CACHE_PATH',
+            '/dev/shm/speshalgram-cache'
+        ),
+        'OPTIONS': {
+            'SIZE': int(os.environ.get('SHARED_CACHE_SIZE', 32 * 2 ** 20)),
+        },
+    },
+}
+
+
 # Templates
 
 TEMPLATES = [
@@ -124,6 +156,23 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/resources/media/'
 
+# the uploads are named by the hash of their content and stored once,
+# see media.storage
+DEFAULT_FILE_STORAGE = 'speshalgram.media.storage.ContentAddressedStorage'
+
+# widths of the renditions of the uploaded images by the image field,
+# see media.renditions
+MEDIA_RENDITIONS = {
+    'picture': {'thumbnail': 320, 'feed': 640, 'full': 1080},
+    'avatar': {'thumbnail': 48, 'feed': 150, 'full': 320},
+}
+
+MEDIA_JPEG_QUALITY = int(os.environ.get('MEDIA_JPEG_QUALITY', 85))
+
+MEDIA_WEBP_QUALITY = int(os.environ.get('MEDIA_WEBP_QUALITY', 80))
+
+MEDIA_AVIF_QUALITY = int(os.environ.get('MEDIA_AVIF_QUALITY', 60))
+
 
 # App constants
 
@@ -140,3 +189,46 @@ NUM_OF_PREVIEW_COMMENTS = os.environ.get('NUM_OF_PREVIEW_COMMENTS', 3)
 SEARCH_NUM_OF_SUGGESTED_USERS = os.environ.get(
     'SEARCH_NUM_OF_SUGGESTED_USERS', 5
 )
+
+# users with more followers are switched from pushed to pulled feed delivery
+# by the update_celebrities command
+FEED_PUSH_MAX_FOLLOWERS = int(
+    os.environ.get('FEED_PUSH_MAX_FOLLOWERS', 10000)
+)
+
+# like counters of posts liked more than LIKE_SHARDING_RATE times a minute
+# are spread among up to LIKE_MAX_SHARDS rows by the tune_like_counters command
+LIKE_SHARDING_RATE = int(os.environ.get('LIKE_SHARDING_RATE', 600))
+
+LIKE_MAX_SHARDS = int(os.environ.get('LIKE_MAX_SHARDS', 16))
+
+# accepted subscriptions checked on profile reads are cached by every process
+# for up to VISIBILITY_CACHE_TTL seconds, see accounts.visibility
+VISIBILITY_CACHE_SIZE = int(os.environ.get('VISIBILITY_CACHE_SIZE', 10000))
+
+VISIBILITY_CACHE_TTL = int(os.environ.get('VISIBILITY_CACHE_TTL', 60))
+
+# cards of users rendered by ShortUserSerializer are cached by the host
+# for up to CARD_CACHE_TTL seconds, see accounts.cards
+CARD_CACHE_TTL = int(os.environ.get('CARD_CACHE_TTL', 300))
+
+# keep the follow graph in memory of every worker, requires INVALIDATION_BUS,
+# see accounts.graph
+FOLLOW_GRAPH_INDEX = os.environ.get('FOLLOW_GRAPH_INDEX', '') == 'true'
+
+# publish the changes of models to the caches of the other workers
+# through Postgres NOTIFY, see bus
+INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', '') == 'true'
+
+# jobs failed max attempts times are left dead, the attempts are spaced by
+# JOBS_RETRY_BACKOFF seconds doubled on every attempt, see jobs.queue
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+
+JOBS_RETRY_BACKOFF = int(os.environ.get('JOBS_RETRY_BACKOFF', 10))
+
+JOBS_RETRY_BACKOFF_MAX = int(os.environ.get('JOBS_RETRY_BACKOFF_MAX', 3600))
+
+# running jobs not finished in JOBS_LEASE_TIMEOUT seconds are run again
+JOBS_LEASE_TIMEOUT = int(os.environ.get('JOBS_LEASE_TIMEOUT', 600))
+
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
@@ -0,0 +1,442 @@
+"""
+Cache backend shared by the processes of a host.
+
+The entries are kept in a file mapped to the memory of every process (put it
+on tmpfs, e.g. /dev/shm), so the workers share one copy of the hot payloads
+instead of caching them each.
+
+The file is divided into sets of slots of a few fixed sizes (SLOTS option,
+pairs of the slot size and the number of such slots in a set). A key always
+goes to the same set and takes the smallest slot its entry fits, so it is
+found by scanning the tags of one set. Entries bigger than the largest slot
+aren't cached. When all the slots of the size are taken, one of them is
+evicted with CLOCK: the hand skips the slots read since it passed them last.
+
+Writers lock the set with a fcntl record lock, released by the system if
+the process dies, and make the version of the set odd while they write.
+Readers don't lock, they read again if the version was odd or has changed
+meanwhile (seqlock).
+"""
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'SPSHCACHE1'
+HEADER_SIZE = 4096
+
+VERSION = struct.Struct('<Q')
+# expiration time, length of the value, length of the key
+SLOT_HEADER = struct.Struct('<dIH')
+
+# reads retried before the set is locked
+READ_ATTEMPTS = 100
+
+DEFAULT_SIZE = 32 * 2 ** 20
+# sized for the user cards and profiles
+DEFAULT_SLOTS = ((256, 12), (1024, 4), (4096, 1))
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+class Segment:
+    """
+    the mapped file, shared by the cache instances of the process
+
+    A set starts with its version, the tags of the slots (0 if free),
+    the referenced bits of the slots and the hands of the sizes.
+    """
+
+    def __init__(self, path, size, slots):
+        if any(count > 255 for _, count in slots):
+            raise ValueError('hands of the slots are bytes, use fewer slots')
+
+        self.slot_sizes = [slot_size for slot_size, _ in slots]
+        # index of the first slot of every size in the set, and the end
+        self.bounds = [0]
+        for _, count in slots:
+            self.bounds.append(self.bounds[-1] + count)
+        nslots = self.bounds[-1]
+
+        self.tags = struct.Struct(f'<{nslots}Q')
+        self.tags_offset = VERSION.size
+        self.referenced_offset = self.tags_offset + self.tags.size
+        self.hands_offset = self.referenced_offset + nslots
+        self.set_header_size = -(-(self.hands_offset + len(slots)) // 8) * 8
+
+        self.slot_offsets = []
+        offset = self.set_header_size
+        for slot_size, count in slots:
+            for _ in range(count):
+                self.slot_offsets.append(offset)
+                offset += slot_size
+        self.set_size = offset
+
+        self.nsets = (size - HEADER_SIZE) // self.set_size
+        if self.nsets < 1:
+            raise ValueError(f'{size} bytes are too few for a set of slots')
+        self.size = HEADER_SIZE + self.nsets * self.set_size
+
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self.lock_range(fcntl.LOCK_EX, 0, HEADER_SIZE)
+            try:
+                self.mmap = self.attach(slots)
+            finally:
+                self.lock_range(fcntl.LOCK_UN, 0, HEADER_SIZE)
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def attach(self, slots):
+        """
+        maps the file, initializes it if its layout differs
+        """
+        header = MAGIC + json.dumps(
+            {'nsets': self.nsets, 'slots': slots}
+        ).encode()
+        header = header.ljust(HEADER_SIZE, b'\0')
+
+        # the processes using another layout must be restarted
+        if os.fstat(self.fd).st_size != self.size:
+            os.ftruncate(self.fd, self.size)
+
+        segment = mmap.mmap(self.fd, self.size)
+        if segment[:HEADER_SIZE] != header:
+            for set_index in range(self.nsets):
+                offset = self.set_offset(set_index)
+                segment[offset:offset + self.set_header_size] = bytes(
+                    self.set_header_size
+                )
+            segment[:HEADER_SIZE] = header
+
+        return segment
+
+    def lock_range(self, command, start, length):
+        fcntl.lockf(self.fd, command, length, start)
+
+    def set_offset(self, set_index):
+        return HEADER_SIZE + set_index * self.set_size
+
+    def get_version(self, set_offset):
+        return VERSION.unpack_from(self.mmap, set_offset)[0]
+
+    def set_version(self, set_offset, version):
+        VERSION.pack_into(self.mmap, set_offset, version)
+
+    def clear_set(self, set_offset):
+        """
+        frees the slots of the locked set
+        """
+        start = set_offset + self.tags_offset
+        end = set_offset + self.set_header_size
+        self.mmap[start:end] = bytes(end - start)
+
+
+class _SetLock:
+    """
+    locks the set for the threads of the process and for the other processes
+    """
+
+    def __init__(self, segment, set_index):
+        self.segment = segment
+        self.offset = segment.set_offset(set_index)
+
+    def __enter__(self):
+        segment = self.segment
+        segment.lock.acquire()
+        try:
+            segment.lock_range(fcntl.LOCK_EX, self.offset, segment.set_size)
+        except BaseException:
+            segment.lock.release()
+            raise
+
+        version = segment.get_version(self.offset)
+        if version % 2:
+            # the last writer died while writing
+            segment.clear_set(self.offset)
+        else:
+            segment.set_version(self.offset, version + 1)
+
+        return self.offset
+
+    def __exit__(self, *exc_info):
+        segment = self.segment
+        try:
+            version = segment.get_version(self.offset)
+            segment.set_version(self.offset, version + 1)
+            segment.lock_range(fcntl.LOCK_UN, self.offset, segment.set_size)
+        finally:
+            segment.lock.release()
+
+
+def get_segment(path, size, slots):
+    with _segments_lock:
+        if path not in _segments:
+            _segments[path] = Segment(path, size, slots)
+
+        return _segments[path]
+
+
+def hash_key(key):
+    """
+    returns the tag of the key, the same in every process
+    """
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SharedMemoryCache(BaseCache):
+    """
+    LOCATION is the path of the file, OPTIONS are SIZE in bytes and SLOTS
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        slots = tuple(
+            tuple(slot) for slot in options.get('SLOTS', DEFAULT_SLOTS)
+        )
+        self.segment = get_segment(
+            location,
+            options.get('SIZE', DEFAULT_SIZE),
+            slots
+        )
+
+    def _locate(self, key, version):
+        # any key fits, so they aren't validated for memcached
+        key = self.make_key(key, version=version).encode()
+        tag = hash_key(key)
+        return key, tag, tag % self.segment.nsets
+
+    def _locked(self, set_index):
+        return _SetLock(self.segment, set_index)
+
+    def _find(self, set_offset, key, tag):
+        """
+        returns the index of the slot of the key in the set or None
+        """
+        segment = self.segment
+        tags = segment.tags.unpack_from(
+            segment.mmap,
+            set_offset + segment.tags_offset
+        )
+
+        start = 0
+        while True:
+            try:
+                index = tags.index(tag, start)
+            except ValueError:
+                return None
+
+            slot_offset = set_offset + segment.slot_offsets[index]
+            _, _, key_length = SLOT_HEADER.unpack_from(
+                segment.mmap,
+                slot_offset
+            )
+            key_offset = slot_offset + SLOT_HEADER.size
+            if segment.mmap[key_offset:key_offset + key_length] == key:
+                return index
+
+            start = index + 1
+
+    def _read(self, set_offset, index):
+        """
+        returns (expiration time, pickled value) of the slot
+        """
+        segment = self.segment
+        slot_offset = set_offset + segment.slot_offsets[index]
+        expires, value_length, key_length = SLOT_HEADER.unpack_from(
+            segment.mmap,
+            slot_offset
+        )
+        value_offset = slot_offset + SLOT_HEADER.size + key_length
+        return expires, segment.mmap[value_offset:value_offset + value_length]
+
+    def _set_tag(self, set_offset, index, tag):
+        struct.pack_into(
+            '<Q',
+            self.segment.mmap,
+            set_offset + self.segment.tags_offset + index * 8,
+            tag
+        )
+
+    def _set_referenced(self, set_offset, index, referenced):
+        offset = set_offset + self.segment.referenced_offset + index
+        self.segment.mmap[offset] = referenced
+
+    def _evict(self, set_offset, size_index):
+        """
+        returns the index of a free or evicted slot of the size
+        """
+        segment = self.segment
+        tags = segment.tags.unpack_from(
+            segment.mmap,
+            set_offset + segment.tags_offset
+        )
+        start, end = segment.bounds[size_index], segment.bounds[size_index + 1]
+        hand_offset = set_offset + segment.hands_offset + size_index
+        referenced_offset = set_offset + segment.referenced_offset
+
+        hand = segment.mmap[hand_offset]
+        # the second round finds the slots unreferenced by the first one
+        for step in range(2 * (end - start)):
+            index = start + (hand + step) % (end - start)
+            if tags[index] and segment.mmap[referenced_offset + index]:
+                segment.mmap[referenced_offset + index] = 0
+                continue
+
+            segment.mmap[hand_offset] = (index - start + 1) % (end - start)
+            return index
+
+    def _store(self, key, tag, set_offset, pickled, expires, only_new):
+        segment = self.segment
+        entry_size = SLOT_HEADER.size + len(key) + len(pickled)
+
+        index = self._find(set_offset, key, tag)
+        if index is not None:
+            if only_new and self._read(set_offset, index)[0] > time.time():
+                return False
+            self._set_tag(set_offset, index, 0)
+
+        for size_index, slot_size in enumerate(segment.slot_sizes):
+            if entry_size <= slot_size:
+                break
+        else:
+            # too big, the stale value is removed above
+            return False
+
+        if index is None or not (
+            segment.bounds[size_index] <= index
+            < segment.bounds[size_index + 1]
+        ):
+            index = self._evict(set_offset, size_index)
+
+        slot_offset = set_offset + segment.slot_offsets[index]
+        SLOT_HEADER.pack_into(
+            segment.mmap,
+            slot_offset,
+            expires,
+            len(pickled),
+            len(key)
+        )
+        data_offset = slot_offset + SLOT_HEADER.size
+        segment.mmap[data_offset:data_offset + len(key)] = key
+        data_offset += len(key)
+        segment.mmap[data_offset:data_offset + len(pickled)] = pickled
+
+        self._set_referenced(set_offset, index, 0)
+        self._set_tag(set_offset, index, tag)
+        return True
+
+    def _lookup(self, set_offset, key, tag):
+        """
+        returns (slot index, expiration time, pickled value) of the key
+        or None
+        """
+        index = self._find(set_offset, key, tag)
+        if index is None:
+            return None
+
+        return (index, *self._read(set_offset, index))
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return float('inf') if expires is None else expires
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, tag, set_index = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._locked(set_index) as set_offset:
+            return self._store(
+                key,
+                tag,
+                set_offset,
+                pickled,
+                self._expires(timeout),
+                only_new=True
+            )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, tag, set_index = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._locked(set_index) as set_offset:
+            self._store(
+                key,
+                tag,
+                set_offset,
+                pickled,
+                self._expires(timeout),
+                only_new=False
+            )
+
+    def get(self, key, default=None, version=None):
+        key, tag, set_index = self._locate(key, version)
+        segment = self.segment
+        set_offset = segment.set_offset(set_index)
+
+        for _ in range(READ_ATTEMPTS):
+            set_version = segment.get_version(set_offset)
+            if set_version % 2:
+                continue
+
+            entry = self._lookup(set_offset, key, tag)
+            if segment.get_version(set_offset) == set_version:
+                break
+        else:
+            # the writer is slow or dead
+            with self._locked(set_index):
+                entry = self._lookup(set_offset, key, tag)
+
+        if entry is None:
+            return default
+
+        index, expires, pickled = entry
+        if expires <= time.time():
+            return default
+
+        # the bit might be set for another entry of the slot, it's harmless
+        self._set_referenced(set_offset, index, 1)
+        return pickle.loads(pickled)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, tag, set_index = self._locate(key, version)
+        with self._locked(set_index) as set_offset:
+            entry = self._lookup(set_offset, key, tag)
+            if entry is None or entry[1] <= time.time():
+                return False
+
+            slot_offset = set_offset + self.segment.slot_offsets[entry[0]]
+            struct.pack_into(
+                '<d',
+                self.segment.mmap,
+                slot_offset,
+                self._expires(timeout)
+            )
+            return True
+
+    def delete(self, key, version=None):
+        key, tag, set_index = self._locate(key, version)
+        with self._locked(set_index) as set_offset:
+            index = self._find(set_offset, key, tag)
+            if index is None:
+                return False
+
+            self._set_tag(set_offset, index, 0)
+            return True
+
+    def clear(self):
+        for set_index in range(self.segment.nsets):
+            with self._locked(set_index) as set_offset:
+                self.segment.clear_set(set_offset)
@@ -1,9 +1,209 @@
-from django.db.models import PositiveIntegerField, Subquery
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import SAFE_METHODS
 
 
-class SubqueryCount(Subquery):
-    template = "(SELECT count(*) FROM (%(subquery)s) as sq)"
-    output_field = PositiveIntegerField()
+class IdentityMap:
+    """
+    objects fetched during the request, each of them is fetched once
+
+    The objects are kept by the model, the annotations of the queryset
+    and the lookup. Querysets sharing an entry must load the same
+    relations. Filtered and locking querysets are fetched every time,
+    an object fetched without their restriction isn't theirs to return.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_or_404(self, queryset, **lookup):
+        if queryset.query.where or queryset.query.select_for_update:
+            return get_object_or_404(queryset, **lookup)
+
+        key = (
+            queryset.model,
+            tuple(sorted(queryset.query.annotations)),
+            tuple(sorted(lookup.items())),
+        )
+        if key not in self.objects:
+            self.objects[key] = get_object_or_404(queryset, **lookup)
+
+        return self.objects[key]
+
+
+def get_identity_map(request):
+    """
+    returns identity map of the request, the permissions and the view
+    get the same one (DRF request keeps it in the wrapped django request)
+    """
+    request = getattr(request, '_request', request)
+
+    if not hasattr(request, 'identity_map'):
+        request.identity_map = IdentityMap()
+
+    return request.identity_map
+
+
+def build_absolute_uri(request, location):
+    """
+    request.build_absolute_uri memoized for the request,
+    the same avatars are repeated all over the pages
+    """
+    request = getattr(request, '_request', request)
+
+    if not hasattr(request, 'absolute_uris'):
+        request.absolute_uris = {}
+    if location not in request.absolute_uris:
+        request.absolute_uris[location] = request.build_absolute_uri(location)
+
+    return request.absolute_uris[location]
+
+
+class MaintainedFieldsMixin:
+    """
+    full save of an existing instance doesn't write maintained_fields,
+    they are changed in the db only (counters, snapshots) and the values
+    loaded with the instance might be outdated already
+    """
+    maintained_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding 
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class Fieldset:
+    """
+    top level fields of the representation asked for by ?fields= and
+    ?exclude= (comma separated names), all of them by default
+    """
+
+    def __init__(self, fields=None, exclude=()):
+        self.fields = None if fields is None else set(fields)
+        self.exclude = set(exclude)
+
+    @classmethod
+    def from_query_params(cls, query_params, exclude=()):
+        def parse(param):
+            return [
+                name for name in query_params.get(param, '').split(',')
+                if name
+            ]
+
+        return cls(
+            parse('fields') if 'fields' in query_params else None,
+            [*exclude, *parse('exclude')]
+        )
+
+    def __contains__(self, name):
+        return (
+            (self.fields is None or name in self.fields)
+            and name not in self.exclude
+        )
+
+    def filter(self, names):
+        """
+        returns the names asked for, the asked ones must be among them
+        """
+        unknown = ((self.fields or set()) | self.exclude).difference(names)
+        if unknown:
+            raise ParseError(f'unknown fields: {", ".join(sorted(unknown))}')
+
+        return [name for name in names if name in self]
+
+
+class SparseFieldsetViewMixin:
+    """
+    ?fields= and ?exclude= choose the top level fields of the representation
+    of the safe methods (see Fieldset), the serializers get it in
+    context['fieldset'], the querysets skip the fields not asked for
+    """
+    excluded_fields_by_actions = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        # the unknown fields fail before the queryset runs,
+        # the empty pages serialize no rows to find them
+        if request.method in SAFE_METHODS and (
+            'fields' in request.query_params
+            or 'exclude' in request.query_params
+        ):
+            serializer = self.get_serializer_class()(
+                context=super().get_serializer_context()
+            )
+            self.get_fieldset().filter(serializer.fields)
+
+    def get_fieldset(self):
+        if getattr(self, '_fieldset', None) is None:
+            query_params = {}
+            if self.request.method in SAFE_METHODS:
+                query_params = self.request.query_params
+
+            self._fieldset = Fieldset.from_query_params(
+                query_params,
+                exclude=self.excluded_fields_by_actions.get(
+                    getattr(self, 'action', None), ()
+                )
+            )
+
+        return self._fieldset
+
+    def is_requested(self, name):
+        return name in self.get_fieldset()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+
+class SideloadedUsersMixin:
+    """
+    ?shape=normalized renders the users of the listed objects by username,
+    their cards are sent once per page in the users map of the response
+
+    The serializers put the cards to context['sideloaded_users']
+    (see ShortUserSerializer). ?format= is taken by DRF for the renderers.
+    """
+    shape_query_param = 'shape'
+    sideloaded_users_actions = {'list'}
+
+    def is_normalized(self):
+        # the users map is sent along with the page
+        return (
+            self.paginator is not None
+            and self.action in self.sideloaded_users_actions
+            and self.request.query_params.get(self.shape_query_param)
+            == 'normalized'
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+
+        if self.is_normalized():
+            self.sideloaded_users = context['sideloaded_users'] = {}
+
+        return context
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+
+        if self.is_normalized():
+            response.data['users'] = self.sideloaded_users
+
+        return response
 
 
 class PermissionsByActionsMixin:
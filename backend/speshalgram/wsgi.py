@@ -9,8 +9,21 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speshalgram.settings.dev')
 
 application = get_wsgi_application()
+
+# listen before loading, so the changes committed meanwhile aren't missed
+if settings.INVALIDATION_BUS:
+    from speshalgram import bus
+
+    bus.start_listener()
+
+if settings.FOLLOW_GRAPH_INDEX:
+    from speshalgram.accounts import graph
+
+    graph.check_settings()
+    graph.load()